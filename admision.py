@@ -0,0 +1,222 @@
+"""
+Control de admisión de callbacks
+================================
+En día de partido un usuario que pulsa las franjas de hostelería o abre y
+cierra el modal INDIVIDUAL sin parar puede ocupar todos los threads de un
+worker. Cada petición a `/_dash-update-component` pasa antes por aquí:
+
+    - Prioridad según las salidas del callback (`PRIORIDADES`): autenticación
+      y navegación (`URGENTE`) entran siempre y sin esperar; los renders de
+      página (`PESADA`) son los últimos de la cola; el resto, `NORMAL`.
+    - Como mucho `ADMISION_GLOBAL` callbacks no urgentes a la vez por worker
+      y `ADMISION_POR_USUARIO` por usuario. Los que no caben esperan por
+      orden de prioridad y de llegada, hasta `ADMISION_ESPERA_SEGUNDOS`
+      (después 503 con Retry-After).
+    - Gana la última petición: si llega otra de la misma pestaña para la
+      misma salida, la que esperaba se descarta (204, Dash no actualiza
+      nada). Las que ya se están ejecutando terminan.
+    - Si un usuario ya tiene `ADMISION_POR_USUARIO` peticiones en cola para
+      otras salidas, la nueva se rechaza en el acto (503 con Retry-After):
+      las que esperaban son de otros componentes y no se pierden.
+
+El usuario y la pestaña llegan en las cabeceras `X-Dash-Usuario` y
+`X-Dash-Pestana`, que añade `assets/admision.js` a partir del
+`session-store`; sin ellas se usa la IP del cliente. Son datos del
+navegador: sirven para repartir la capacidad, no para autorizar nada.
+
+Las esperas quedan en la fase `cola` de `metricas` y los descartes en
+`dash_admission_total` de `/metrics`. Los threads que esperan no consumen
+CPU: gunicorn arranca con más threads que plazas de ejecución para que las
+peticiones urgentes y la cola no se queden sin thread. `ADMISION=0` lo
+desactiva.
+"""
+
+import itertools
+import os
+import threading
+import time
+
+import flask
+
+from metricas import medir_fase
+
+ACTIVO = os.environ.get("ADMISION", "1") != "0"
+GLOBAL = int(os.environ.get("ADMISION_GLOBAL", "4"))
+POR_USUARIO = int(os.environ.get("ADMISION_POR_USUARIO", "2"))
+ESPERA_SEGUNDOS = float(os.environ.get("ADMISION_ESPERA_SEGUNDOS", "20"))
+RUTA = "/_dash-update-component"
+
+URGENTE, NORMAL, PESADA = 0, 1, 2
+
+# Prefijos de id de las salidas → prioridad (gana la más urgente)
+PRIORIDADES = (
+    (URGENTE, ("session-store", "login-", "_pages_")),
+    (PESADA, ("content-", "ficha-content", "admin-consultas-content", "modal-checklist")),
+)
+
+_cond = threading.Condition()
+_orden = itertools.count()
+_estado = {"activos": 0}
+_por_usuario = {}
+_esperando = []
+_contadores = {"admitida": 0, "urgente": 0, "sustituida": 0, "rechazada": 0}
+_prioridades = {}
+
+
+class _Turno:
+    """Petición en cola o en ejecución."""
+
+    __slots__ = ("usuario", "clave", "prioridad", "orden", "descartada")
+
+    def __init__(self, usuario, clave, prioridad):
+        self.usuario = usuario
+        self.clave = clave
+        self.prioridad = prioridad
+        self.orden = next(_orden)
+        self.descartada = False
+
+
+# =============================================================================
+# PRIORIDADES
+# =============================================================================
+
+def _ids_salida(salida):
+    """Ids de componente de la salida de Dash (`a.prop` o `..a.prop...b.prop..`)."""
+    partes = salida[2:-2].split("...") if salida.startswith("..") else [salida]
+    return [p.rsplit(".", 1)[0] for p in partes]
+
+
+def prioridad(salida):
+    """Prioridad del callback con salida `salida` (el `output` de la petición)."""
+    if salida not in _prioridades:
+        ids = _ids_salida(salida)
+        _prioridades[salida] = min(
+            (nivel for nivel, prefijos in PRIORIDADES
+             if any(i.startswith(prefijos) for i in ids)),
+            default=NORMAL)
+    return _prioridades[salida]
+
+
+# =============================================================================
+# COLA
+# =============================================================================
+
+def _puede_entrar(turno):
+    if _estado["activos"] >= GLOBAL or _por_usuario.get(turno.usuario, 0) >= POR_USUARIO:
+        return False
+    # Nadie con preferencia que también pudiera entrar ya
+    return not any((o.prioridad, o.orden) < (turno.prioridad, turno.orden)
+                   and _por_usuario.get(o.usuario, 0) < POR_USUARIO
+                   for o in _esperando)
+
+
+def _encolar(turno):
+    """Registra `turno` como la última petición de su clave, o devuelve False
+    si su usuario ya tiene la cola llena con otras salidas."""
+    propios = sum(1 for o in _esperando
+                  if o.usuario == turno.usuario and o.clave != turno.clave and not o.descartada)
+    if propios >= POR_USUARIO:
+        return False
+    for otro in _esperando:
+        if otro.clave == turno.clave:
+            otro.descartada = True
+    _esperando.append(turno)
+    _cond.notify_all()
+    return True
+
+
+@medir_fase("cola")
+def _esperar(turno):
+    """Espera el turno; devuelve 'admitida', 'sustituida' o 'rechazada'."""
+    limite = time.monotonic() + ESPERA_SEGUNDOS
+    with _cond:
+        if not _encolar(turno):
+            return "rechazada"
+        try:
+            while True:
+                if turno.descartada:
+                    return "sustituida"
+                if _puede_entrar(turno):
+                    _estado["activos"] += 1
+                    _por_usuario[turno.usuario] = _por_usuario.get(turno.usuario, 0) + 1
+                    return "admitida"
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return "rechazada"
+                _cond.wait(restante)
+        finally:
+            _esperando.remove(turno)
+            _cond.notify_all()
+
+
+def _liberar(turno, admitida):
+    with _cond:
+        if admitida:
+            _estado["activos"] -= 1
+            restantes = _por_usuario.get(turno.usuario, 1) - 1
+            if restantes > 0:
+                _por_usuario[turno.usuario] = restantes
+            else:
+                _por_usuario.pop(turno.usuario, None)
+        _cond.notify_all()
+
+
+def _contar(resultado):
+    with _cond:
+        _contadores[resultado] += 1
+
+
+def estadisticas():
+    """Contadores del proceso por resultado y estado actual de la cola."""
+    with _cond:
+        return dict(_contadores, en_cola=len(_esperando), activos=_estado["activos"])
+
+
+# =============================================================================
+# ENGANCHES
+# =============================================================================
+
+def _identidad(request):
+    usuario = request.headers.get("X-Dash-Usuario") or (request.access_route or ["?"])[0]
+    return usuario, request.headers.get("X-Dash-Pestana") or usuario
+
+
+def _admitir():
+    request = flask.request
+    # Las consultas de resultado de background callbacks son baratas
+    if not request.path.endswith(RUTA) or request.method != "POST" or "cacheKey" in request.args:
+        return None
+    salida = str((request.get_json(silent=True) or {}).get("output", ""))
+    nivel = prioridad(salida)
+    if nivel == URGENTE:
+        _contar("urgente")
+        return None
+
+    usuario, pestana = _identidad(request)
+    turno = _Turno(usuario, (pestana, salida), nivel)
+    resultado = _esperar(turno)
+    _contar(resultado)
+    if resultado == "sustituida":
+        _liberar(turno, admitida=False)
+        return flask.Response(status=204)
+    if resultado == "rechazada":
+        _liberar(turno, admitida=False)
+        return flask.Response("Servidor ocupado, reintenta en unos segundos\n", status=503,
+                              mimetype="text/plain", headers={"Retry-After": "2"})
+    flask.g.turno_admision = turno
+    return None
+
+
+def _fin(exc):
+    turno = flask.g.pop("turno_admision", None)
+    if turno is not None:
+        _liberar(turno, admitida=True)
+
+
+def registrar(server):
+    """Activa el control de admisión en `server` (después de `metricas.instrumentar`,
+    para que la espera cuente en la fase `cola`)."""
+    if not ACTIVO:
+        return
+    server.before_request(_admitir)
+    server.teardown_request(_fin)
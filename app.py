@@ -7,13 +7,13 @@ RC Deportivo de La Coruña
 import dash
 from dash import html, dcc, callback, Output, Input, State, no_update
 import dash_bootstrap_components as dbc
-from database import init_users_table, validate_user
-
-# Inicializar tabla de usuarios al arrancar
-try:
-    init_users_table()
-except Exception as e:
-    print(f"Aviso: No se pudo inicializar tabla de usuarios: {e}")
+from metricas import instrumentar, instrumentar_consultas
+import admision
+import arranque
+import compresion
+import escudos
+import estaticos
+import fuentes
 
 # Inicializar la aplicación
 app = dash.Dash(
@@ -21,12 +21,34 @@ app = dash.Dash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     suppress_callback_exceptions=True,
     use_pages=True,
-    pages_folder="pages"
+    # En arranque diferido las páginas se registran en arranque.registrar()
+    pages_folder=arranque.carpeta_paginas(),
 )
 
 app.title = "Panel MatchDay - RC Deportivo"
 server = app.server
 
+# Métricas por callback (latencia por fases y bytes) en /metrics; en arranque
+# diferido la medición de consultas se engancha en segundo plano
+instrumentar(app, consultas=not arranque.DIFERIDO)
+
+# Control de admisión: prioridades y límites por usuario antes de ejecutar
+# cada callback (la espera cuenta como fase `cola` de las métricas)
+admision.registrar(server)
+
+# Respuestas de callbacks comprimidas (gzip/brotli); se registra después de
+# las métricas para que estas vean los bytes enviados
+compresion.registrar(server)
+
+# /assets/* con hash de contenido, precompresión y caché inmutable
+estaticos.registrar(server)
+
+# Escudos optimizados con URL por hash en /escudos/<nombre>
+escudos.registrar(server)
+
+# Tipografías en subconjuntos WOFF2 (/fuentes/<nombre>) con preload en el <head>
+fuentes.registrar(app)
+
 # =============================================================================
 # MAPA DE SECCIONES → PERMISOS
 # =============================================================================
@@ -38,16 +60,16 @@ server = app.server
 
 SECCIONES = {
     "estadio":      {"permiso": 1, "label": "ABANCA-RIAZOR",
-                     "icon": "/assets/Indice/Estadio ABANCA-RIAZOR.png",
+                     "icon": estaticos.url("Indice/Estadio ABANCA-RIAZOR.png"),
                      "href": "/estadio/entradas", "id": "nav-estadio"},
     "museo":        {"permiso": 2, "label": "MUSEO RCD",
-                     "icon": "/assets/Indice/Museo.png",
+                     "icon": estaticos.url("Indice/Museo.png"),
                      "href": "/museo", "id": "nav-museo"},
     "deportiendas": {"permiso": 3, "label": "DÉPOR TIENDAS",
-                     "icon": "/assets/Indice/DeporTienda.png",
+                     "icon": estaticos.url("Indice/DeporTienda.png"),
                      "href": "/deportiendas", "id": "nav-deportiendas"},
     "hosteleria":   {"permiso": 4, "label": "DÉPOR HOSTELERIA",
-                     "icon": "/assets/Indice/Depor_Hosteleria.png",
+                     "icon": estaticos.url("Indice/Depor_Hosteleria.png"),
                      "href": "/hosteleria", "id": "nav-hosteleria"},
 }
 
@@ -65,7 +87,7 @@ def create_login():
             html.Div(
                 className="login-box",
                 children=[
-                    html.Img(src="/assets/MATERIAL/ESCUDO-DÉPOR/ESCUDO-AZUL_RGB.svg",
+                    html.Img(src=estaticos.url("MATERIAL/ESCUDO-DÉPOR/ESCUDO-AZUL_RGB.svg"),
                              className="login-shield"),
                     html.H2("Iniciar Sesión", className="login-title"),
                     dcc.Input(
@@ -98,7 +120,7 @@ def create_header():
             html.Div(
                 className="header-content",
                 children=[
-                    html.Img(src="/assets/MATERIAL/ESCUDO-DÉPOR/ESCUDO-BLANCO_RGB.svg",
+                    html.Img(src=estaticos.url("MATERIAL/ESCUDO-DÉPOR/ESCUDO-BLANCO_RGB.svg"),
                              className="header-logo"),
                     html.Div([
                         html.H1("Panel MatchDay", className="header-title"),
@@ -134,7 +156,7 @@ app.layout = html.Div([
                     html.Div(
                         className="sidebar-header",
                         children=[
-                            html.Img(src="/assets/MATERIAL/Banner-RCDEPORTIVO/RCDEPORTIVO-BLANCO-RGB.svg",
+                            html.Img(src=estaticos.url("MATERIAL/Banner-RCDEPORTIVO/RCDEPORTIVO-BLANCO-RGB.svg"),
                                      className="sidebar-banner", alt="RC Deportivo"),
                         ]
                     ),
@@ -184,6 +206,7 @@ def do_login(n_clicks, n_submit, usuario, contrasena, current_session):
     if not usuario or not contrasena:
         return no_update, "Introduce usuario y contraseña"
 
+    from database import validate_user
     user = validate_user(usuario, contrasena)
     if user:
         return {
@@ -285,6 +308,34 @@ def toggle_login(session, pathname):
     )
 
 
+# =============================================================================
+# ARRANQUE
+# =============================================================================
+
+def inicializar_usuarios():
+    """Crea la tabla de usuarios si no existe (en segundo plano al arrancar)."""
+    from database import asegurar_tabla_usuarios
+    try:
+        asegurar_tabla_usuarios()
+    except Exception as e:
+        print(f"Aviso: No se pudo inicializar tabla de usuarios: {e}")
+
+
+def precalentar_figuras():
+    """Crea el pool de procesos de figuras (con las páginas ya importadas y
+    antes de atender peticiones: los `fork` no salen de hilos de petición)."""
+    import procesos
+    procesos.precalentar()
+
+
+# Páginas registradas desde sus metadatos; sus módulos (pandas, Plotly...) se
+# importan en segundo plano, el pool de figuras se crea justo después (antes
+# de atender) y la tabla de usuarios sin bloquear
+arranque.registrar(app, preparar=[instrumentar_consultas],
+                   antes_de_atender=[precalentar_figuras],
+                   segundo_plano=[inicializar_usuarios])
+
+
 # =============================================================================
 # EJECUCIÓN
 # =============================================================================
@@ -0,0 +1,297 @@
+"""
+Arranque rápido
+===============
+Con `use_pages=True` Dash importa todos los módulos de `pages/` al crear la
+app, y con ellos pandas, Plotly, SQLAlchemy y los helpers de cada página.
+Con `ARRANQUE_DIFERIDO=1` (por defecto):
+
+    - Las páginas se registran desde sus metadatos: los argumentos literales
+      de `dash.register_page(...)` se leen del código fuente con `ast`, sin
+      importar el módulo.
+    - Los módulos de página y sus dependencias se importan en un hilo en
+      segundo plano nada más arrancar. Las peticiones a Dash esperan a que
+      termine (como mucho `ARRANQUE_ESPERA_SEGUNDOS`): Dash copia los
+      callbacks registrados en la primera petición y los de las páginas
+      tienen que estar ya. Estáticos, escudos, fuentes y `/metrics` se
+      sirven desde el primer momento.
+    - Las tareas que necesitan las páginas y deben terminar antes de
+      atender (el pool de procesos de figuras, que hace `fork`) corren justo
+      después de importarlas, antes de dar el proceso por listo.
+    - Las tareas lentas que no hacen falta para atender (la tabla de
+      usuarios en MySQL) corren después, también en segundo plano.
+
+`/_arranque` devuelve el informe de tiempos (importación de la app, de cada
+página y total hasta estar lista) en JSON; sirve de health check porque
+responde antes de que las páginas estén cargadas.
+
+Uso (informe de importación con `python -X importtime`):
+    python arranque.py
+    python arranque.py --top 25
+"""
+
+import argparse
+import ast
+import contextvars
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import dash
+import flask
+
+T0 = time.perf_counter()
+
+DIFERIDO = os.environ.get("ARRANQUE_DIFERIDO", "1") != "0"
+ESPERA_SEGUNDOS = float(os.environ.get("ARRANQUE_ESPERA_SEGUNDOS", "60"))
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+CARPETA_PAGINAS = "pages"
+RUTA_INFORME = "/_arranque"
+LIBRES = ("/assets/", "/escudos/", "/fuentes/", "/metrics", RUTA_INFORME)
+
+_listo = threading.Event()
+_estado = {"pid": None, "preparar": (), "antes_de_atender": (), "segundo_plano": (), "modulos": []}
+_informe = {"diferido": DIFERIDO, "app_ms": None, "listo_ms": None, "preparar_ms": {},
+            "paginas_ms": {}, "antes_de_atender_ms": {}, "segundo_plano_ms": {}, "errores": {}}
+
+
+def _ms(t0):
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def carpeta_paginas():
+    """`pages_folder` para `dash.Dash`: vacío en modo diferido (Dash no importa nada)."""
+    return "" if DIFERIDO else CARPETA_PAGINAS
+
+
+# =============================================================================
+# METADATOS DE PÁGINAS
+# =============================================================================
+
+def metadatos_paginas(carpeta=CARPETA_PAGINAS):
+    """[(módulo, kwargs de register_page o None)] de los ficheros de `carpeta`.
+
+    Sigue las reglas de Dash (ignora `_*`, `.*` y ficheros sin
+    `register_page`). kwargs es None si la llamada no es literal y hay que
+    importar el módulo para registrarlo.
+    """
+    paginas = []
+    raiz = os.path.join(DIR_BASE, carpeta)
+    for archivo in sorted(os.listdir(raiz)):
+        if archivo.startswith(("_", ".")) or not archivo.endswith(".py"):
+            continue
+        with open(os.path.join(raiz, archivo), encoding="utf-8") as f:
+            fuente = f.read()
+        if "register_page" not in fuente:
+            continue
+        modulo = f"{carpeta}.{archivo[:-3]}"
+        paginas.append((modulo, _kwargs_register_page(ast.parse(fuente))))
+    return paginas
+
+
+def _kwargs_register_page(arbol):
+    for nodo in ast.walk(arbol):
+        if not isinstance(nodo, ast.Call):
+            continue
+        func = nodo.func
+        nombre = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        if nombre != "register_page":
+            continue
+        try:
+            return {k.arg: ast.literal_eval(k.value) for k in nodo.keywords if k.arg}
+        except ValueError:
+            return None
+    return None
+
+
+def _layout_diferido(modulo):
+    """Layout provisional: espera a que el módulo esté importado y delega en él."""
+    def layout(**kwargs):
+        esperar()
+        real = getattr(sys.modules[modulo], "layout")
+        return real(**kwargs) if callable(real) else real
+    return layout
+
+
+def _importar_pagina(modulo):
+    """Importa `modulo` y fija su layout en el registro, como hace Dash."""
+    t0 = time.perf_counter()
+    try:
+        mod = importlib.import_module(modulo)
+        pagina = dash.page_registry.get(modulo)
+        if pagina is not None and not pagina.get("supplied_layout"):
+            pagina["layout"] = getattr(mod, "layout")
+    except Exception as e:
+        _informe["errores"][modulo] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    _informe["paginas_ms"][modulo] = _ms(t0)
+
+
+# =============================================================================
+# CALENTAMIENTO EN SEGUNDO PLANO
+# =============================================================================
+
+def _ejecutar(tareas, destino):
+    for tarea in tareas:
+        t0 = time.perf_counter()
+        try:
+            tarea()
+        except Exception as e:
+            _informe["errores"][tarea.__name__] = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        _informe[destino][tarea.__name__] = _ms(t0)
+
+
+def _calentar():
+    _ejecutar(_estado["preparar"], "preparar_ms")
+    for modulo in _estado["modulos"]:
+        _importar_pagina(modulo)
+    _ejecutar(_estado["antes_de_atender"], "antes_de_atender_ms")
+    _informe["listo_ms"] = _ms(T0)
+    _listo.set()
+    print(f"Arranque: app importada en {_informe['app_ms']} ms, "
+          f"páginas listas en {_informe['listo_ms']} ms"
+          + (f" ({len(_informe['errores'])} errores)" if _informe["errores"] else ""))
+    _ejecutar(_estado["segundo_plano"], "segundo_plano_ms")
+
+
+def _iniciar():
+    """Lanza el calentamiento en este proceso (también tras un fork con --preload)."""
+    if _estado["pid"] == os.getpid():
+        return
+    _estado["pid"] = os.getpid()
+    if not _listo.is_set():
+        # Con el contexto actual: `register_page` lee el ContextVar de Dash
+        contexto = contextvars.copy_context()
+        threading.Thread(target=contexto.run, args=(_calentar,), name="arranque",
+                         daemon=True).start()
+
+
+def esperar(timeout=ESPERA_SEGUNDOS):
+    """Bloquea hasta que las páginas estén importadas. Devuelve si lo están."""
+    _iniciar()
+    return _listo.wait(timeout)
+
+
+def informe():
+    """Tiempos del arranque de este proceso."""
+    return dict(_informe, listo=_listo.is_set(), pid=os.getpid())
+
+
+# =============================================================================
+# REGISTRO
+# =============================================================================
+
+def registrar(app, preparar=(), antes_de_atender=(), segundo_plano=()):
+    """Registra las páginas de la app y lanza su importación.
+
+    `preparar`: tareas que deben terminar antes de atender (se ejecutan antes
+    de importar las páginas). `antes_de_atender`: tareas que necesitan las
+    páginas importadas y deben terminar antes de atender. `segundo_plano`:
+    tareas que no bloquean.
+    Llamar al final de la definición de la app. Con `ARRANQUE_DIFERIDO=0`
+    Dash ya ha importado las páginas y todo se ejecuta aquí, en línea.
+    """
+    server = app.server
+    _informe["app_ms"] = _ms(T0)
+
+    @server.route(RUTA_INFORME)
+    def _informe_arranque():
+        return flask.jsonify(informe())
+
+    if not DIFERIDO:
+        _ejecutar(preparar, "preparar_ms")
+        _ejecutar(antes_de_atender, "antes_de_atender_ms")
+        _ejecutar(segundo_plano, "segundo_plano_ms")
+        _informe["listo_ms"] = _ms(T0)
+        _listo.set()
+        return
+
+    for modulo, kwargs in metadatos_paginas():
+        if kwargs is None:
+            _importar_pagina(modulo)  # sin metadatos literales: se importa ya
+        else:
+            dash.register_page(modulo, layout=_layout_diferido(modulo), **kwargs)
+            _estado["modulos"].append(modulo)
+    _estado["preparar"], _estado["segundo_plano"] = tuple(preparar), tuple(segundo_plano)
+    _estado["antes_de_atender"] = tuple(antes_de_atender)
+
+    def esperar_paginas():
+        if _listo.is_set() or flask.request.path.startswith(LIBRES):
+            return None
+        if not esperar():
+            return flask.Response("Arrancando, reintenta en unos segundos\n", status=503,
+                                  mimetype="text/plain", headers={"Retry-After": "5"})
+        return None
+
+    def tras_calentar(hook):
+        return lambda: hook() if _listo.is_set() else None
+
+    # `_setup_server` copia los callbacks globales en la primera petición que
+    # llegue, sea cual sea: no debe correr hasta tener los de las páginas
+    hooks = server.before_request_funcs.setdefault(None, [])
+    hooks[:] = [tras_calentar(h) if h == app._setup_server else h for h in hooks]
+    hooks.insert(0, esperar_paginas)
+    _iniciar()
+
+
+# =============================================================================
+# INFORME DE IMPORTACIÓN
+# =============================================================================
+
+def _importtime(salida_stderr):
+    """{módulo: (propio_us, acumulado_us)} de la salida de `-X importtime`."""
+    tiempos = {}
+    for linea in salida_stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        tiempos.setdefault(nombre.strip(), (int(propio), int(acumulado)))
+    return tiempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Informe de tiempos de arranque de la app")
+    parser.add_argument("--top", type=int, default=15, help="Paquetes más lentos a mostrar")
+    args = parser.parse_args(argv)
+
+    codigo = ("import time; t = time.perf_counter(); import app; "
+              "print('APP_MS', round((time.perf_counter() - t) * 1000, 1)); "
+              "import arranque, json; arranque.esperar(); "
+              "print('INFORME', json.dumps(arranque.informe()))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=DIR_BASE,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return 1
+    salida = dict(linea.split(" ", 1) for linea in proc.stdout.splitlines()
+                  if linea.startswith(("APP_MS ", "INFORME ")))
+    datos = json.loads(salida["INFORME"])
+
+    print(f"Modo: {'diferido' if datos['diferido'] else 'completo'}")
+    print(f"import app:        {float(salida['APP_MS']):>8.1f} ms")
+    print(f"páginas listas en: {datos['listo_ms']:>8.1f} ms (desde la importación de arranque)")
+    for modulo, ms in datos["paginas_ms"].items():
+        print(f"  {modulo:<28} {ms:>8.1f} ms")
+    for tarea, ms in {**datos["preparar_ms"], **datos["antes_de_atender_ms"],
+                      **datos["segundo_plano_ms"]}.items():
+        print(f"  {tarea:<28} {ms:>8.1f} ms")
+    for nombre, error in datos["errores"].items():
+        print(f"  ERROR {nombre}: {error}")
+
+    por_paquete = {}
+    for modulo, (propio, _) in _importtime(proc.stderr).items():
+        paquete = modulo.split(".")[0]
+        por_paquete[paquete] = por_paquete.get(paquete, 0) + propio
+    print("\nPaquetes con más tiempo de importación (todos los hilos):")
+    for paquete, us in sorted(por_paquete.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"  {paquete:<28} {us / 1000:>8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
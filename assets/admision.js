@@ -0,0 +1,32 @@
+/*
+ * Identidad para el control de admisión (admision.py): cada petición de
+ * callback lleva el usuario del session-store y un id de esta pestaña.
+ */
+(function () {
+    var PESTANA = Math.random().toString(36).slice(2) + Date.now().toString(36);
+
+    function usuario() {
+        try {
+            var sesion = JSON.parse(window.sessionStorage.getItem("session-store"));
+            return (sesion && sesion.authenticated && sesion.usuario) || "";
+        } catch (e) {
+            return "";
+        }
+    }
+
+    var fetchOriginal = window.fetch;
+    window.fetch = function (recurso, opciones) {
+        var url = typeof recurso === "string" ? recurso : (recurso && recurso.url) || "";
+        if (url.indexOf("_dash-update-component") !== -1) {
+            opciones = Object.assign({}, opciones);
+            var cabeceras = new Headers(opciones.headers || {});
+            cabeceras.set("X-Dash-Pestana", PESTANA);
+            var u = usuario();
+            if (u) {
+                cabeceras.set("X-Dash-Usuario", encodeURIComponent(u));
+            }
+            opciones.headers = cabeceras;
+        }
+        return fetchOriginal.call(this, recurso, opciones);
+    };
+})();
@@ -0,0 +1,577 @@
+"""
+Benchmark de callbacks de página
+================================
+Invoca directamente los callbacks `update_page` de hostelería, asistencia,
+museo y entradas con datos sintéticos a distintas escalas (1×, 10×, 100×) y
+mide latencia p50/p95, pico de memoria y bytes de la respuesta serializada.
+
+Uso:
+    python benchmark.py                              # escalas 1, 10 y 100
+    python benchmark.py --escalas 1 10 --repeticiones 3
+    python benchmark.py --guardar-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --tolerancia 0.25
+    python benchmark.py --decodificador --escalas 1 10 # read_sql vs decodificador
+    python benchmark.py --figuras --escalas 1 10       # bytes sin/con figuras.py
+    python benchmark.py --presupuestos --escalas 1     # falla si se excede un presupuesto
+
+Con `--baseline` el proceso termina con código 1 si algún caso empeora su
+p95 o su tamaño de respuesta más allá de la tolerancia indicada.
+
+Con `--decodificador` se compara, sobre una copia SQLite en memoria de
+`pre_hosteleria_producto_cantina` y `pre_cuenta_productos_partido`, el
+tiempo de CPU y el pico de memoria de `pd.read_sql` frente a
+`decodificador.decodificar`.
+
+Con `--presupuestos` el proceso termina con código 1 si la respuesta de algún
+caso supera el presupuesto de bytes de su callback (`metricas.presupuesto`).
+Los presupuestos están pensados para el volumen real (escala 1×).
+
+Con `--figuras` se mide, para cada caso, el tamaño de la respuesta sin
+compactar, compactada (`figuras.py`) y compactada con typed arrays base64.
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import database
+import decodificador
+import figuras
+import llegadas
+
+# Partidos como local por temporada a escala 1× (liga regular ≈ 21 jornadas)
+PARTIDOS_POR_TEMPORADA = 21
+# Entradas por torno sintéticas por partido (muestra: solo alimentan los histogramas)
+ENTRADAS_POR_PARTIDO = 300
+HORAS_PARTIDO = ['14:00', '16:15', '17:00', '18:30', '19:00', '20:30', '21:00']
+RIVALES = [
+    'Albacete BP', 'Burgos CF', 'CD Castellón', 'CD Leganés', 'CD Mirandés',
+    'AD Ceuta FC', 'Cultural Leonesa', 'Cádiz CF', 'Córdoba CF', 'FC Andorra',
+    'Granada CF', 'Málaga CF', 'Real Racing Club', 'Real Sociedad B',
+    'Real Sporting', 'Real Valladolid CF', 'Real Zaragoza', 'SD Eibar',
+    'SD Huesca', 'UD Almería', 'UD Las Palmas',
+]
+PRODUCTOS = [
+    'Agua Cabreiroá', 'Aquarius', 'Café con leche', 'Caña Estrella Galicia',
+    'Coca-Cola', 'Coca-Cola Zero', 'Fanta Naranja', 'Nestea', 'Bocadillo Jamón',
+    'Bocadillo Tortilla', 'Hot Dog', 'Palomitas', 'Patatas', 'Pizza',
+    'Empanada', 'Gintonic', 'Copa vino', 'Vaso Depor solidario', 'Bufanda',
+]
+CANTINAS = ([f"Barra {n}" for n in range(1, 13)]
+            + [f"Palco {n}" for n in range(1, 7)]
+            + ['Ambigú Tribuna', 'Ambigú Marathon'])
+GRADAS = ['FONDO MARATHON', 'PREFERENCIA', 'FONDO PABELLON', 'TRIBUNA']
+METODOS_PAGO = ['cash', 'credit_card', 'club_card', 'accumulated']
+GRUPOS_EDAD = ['<16 años', '16-30 años', '31-45 años', '46-60 años', '>60 años']
+DIAS_EN = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+# =============================================================================
+# DATOS SINTÉTICOS
+# =============================================================================
+
+def _partidos(escala, rng):
+    """Calendario sintético de partidos como local para 'actual' y 'anterior'."""
+    n = PARTIDOS_POR_TEMPORADA * escala
+    filas = []
+    id_partido = 1
+    for temporada, inicio in (('anterior', datetime(2024, 8, 17)), ('actual', datetime(2025, 8, 16))):
+        for i in range(n):
+            hora = HORAS_PARTIDO[rng.integers(len(HORAS_PARTIDO))]
+            hh, mm = (int(x) for x in hora.split(':'))
+            fecha = inicio + timedelta(days=(i * 14) // escala)
+            schedule = fecha.replace(hour=hh, minute=mm)
+            filas.append({
+                'id_partido': id_partido,
+                'temporada': temporada,
+                'schedule': schedule,
+                't2_name': RIVALES[i % len(RIVALES)],
+                'result': f"{rng.integers(0, 4)}-{rng.integers(0, 4)}",
+                'dia_semana': DIAS_EN[schedule.weekday()],
+                'hora_exacta': hora,
+            })
+            id_partido += 1
+    return pd.DataFrame(filas)
+
+
+def generar_datos(escala=1, semilla=42):
+    """Genera todas las tablas `pre_*`/`agg_museo_*` que leen las páginas medidas.
+
+    `escala` multiplica el nº de partidos por temporada y el nº de días del
+    museo; los catálogos (productos, cantinas, gradas) se mantienen fijos.
+    Devuelve un dict {nombre_tabla: DataFrame}.
+    """
+    rng = np.random.default_rng(semilla)
+    partidos = _partidos(escala, rng)
+    n_part = len(partidos)
+    base = partidos[['id_partido', 'temporada', 'schedule', 't2_name', 'result',
+                     'dia_semana', 'hora_exacta']]
+    tablas = {}
+
+    # ---- Hostelería ----
+    host = base.copy()
+    host['n_pedidos'] = rng.integers(3000, 9000, n_part)
+    host['recaudacion_total'] = host['n_pedidos'] * rng.uniform(5, 9, n_part)
+    host['ticket_medio'] = host['recaudacion_total'] / host['n_pedidos']
+    host['n_productos'] = host['n_pedidos'] * 2
+    tablas['pre_hosteleria_partido'] = host
+
+    actual_ids = partidos.loc[partidos['temporada'] == 'actual', ['id_partido', 'hora_exacta']]
+    prod = actual_ids.merge(pd.DataFrame({'product_name': PRODUCTOS}), how='cross')
+    prod['cantidad'] = rng.integers(10, 900, len(prod))
+    prod['recaudacion'] = prod['cantidad'] * rng.uniform(1.5, 6, len(prod))
+    prod['n_pedidos'] = (prod['cantidad'] * 0.8).astype(int)
+    tablas['pre_hosteleria_producto'] = prod
+
+    cant = actual_ids.merge(pd.DataFrame({'store_name': CANTINAS}), how='cross')
+    cant['store_id'] = cant['store_name'].map({s: i for i, s in enumerate(CANTINAS)})
+    cant['recaudacion'] = rng.uniform(500, 6000, len(cant))
+    tablas['pre_hosteleria_cantina'] = cant
+
+    pc = cant[['id_partido', 'hora_exacta', 'store_name']].merge(
+        pd.DataFrame({'product_name': PRODUCTOS}), how='cross')
+    pc['cantidad'] = rng.integers(1, 120, len(pc))
+    pc['recaudacion'] = pc['cantidad'] * rng.uniform(1.5, 6, len(pc))
+    tablas['pre_hosteleria_producto_cantina'] = pc
+
+    met = base[['id_partido', 'temporada', 'schedule', 't2_name']].merge(
+        pd.DataFrame({'payment_method': METODOS_PAGO}), how='cross')
+    met['recaudacion'] = rng.uniform(200, 30000, len(met))
+    met['n_pedidos'] = rng.integers(20, 4000, len(met))
+    tablas['pre_hosteleria_metodo_pago'] = met
+
+    # ---- Asistencia ----
+    asi = base[['id_partido', 'temporada', 'schedule', 't2_name', 'result']].copy()
+    asi['abonados_asistentes'] = rng.integers(14000, 22000, n_part)
+    asi['total_espectadores'] = asi['abonados_asistentes'] + rng.integers(2000, 10000, n_part)
+    tablas['pre_asistencia_partido'] = asi
+
+    tablas['pre_asistencia_kpis'] = pd.DataFrame([{
+        'temporada': t, 'total_abonados': 26000, 'promedio_asistentes': 18000.0,
+        'pct_asistencia': 69.2, 'edad_promedio': 41.3, 'promedio_tarde': 950.0,
+        'pct_tarde': 5.3, 'male_count': 19000, 'female_count': 7000,
+        'male_pct': 73.1, 'female_pct': 26.9,
+    } for t in ('actual', 'anterior')])
+
+    tablas['pre_asistencia_sector'] = pd.DataFrame([{
+        'temporada': t, 'sector': g, 'asistentes': int(rng.integers(3000, 6000)),
+        'pct_asistencia': float(rng.uniform(55, 85)),
+    } for t in ('actual', 'anterior') for g in GRADAS])
+
+    consec = base[['temporada', 't2_name', 'result', 'schedule']].copy()
+    consec['jornada_num'] = consec.groupby('temporada').cumcount() + 1
+    consec['abonados_consecutivos'] = rng.integers(8000, 15000, n_part)
+    tablas['pre_asistencia_consecutiva'] = consec.drop(columns='schedule')
+
+    n_ent = n_part * ENTRADAS_POR_PARTIDO
+    ent_asi = base[['id_partido', 'schedule']].loc[np.repeat(base.index, ENTRADAS_POR_PARTIDO)]
+    sector = rng.choice(GRADAS, n_ent)
+    ent_asi = ent_asi.assign(
+        clave_unica=(np.arange(n_ent) % 26000).astype(str),
+        hora_asistencia_abono=ent_asi['schedule'] + pd.to_timedelta(
+            np.clip(rng.normal(-35, 25, n_ent), -150, 80), unit='min'),
+        sector=sector,
+        locality=[f"{g} {n}" for g, n in zip(sector, rng.integers(1, 6, n_ent))],
+        hora_partido=ent_asi['schedule'] - ent_asi['schedule'].dt.normalize(),
+    )
+    tablas['slv_asistencias'] = ent_asi.reset_index(drop=True)
+
+    tablas['pre_asistencia_edad'] = pd.DataFrame([{
+        'temporada': t, 'grupo_edad': g, 'asistentes': int(rng.integers(1500, 6000)),
+        'pct': float(rng.uniform(5, 35)),
+    } for t in ('actual', 'anterior') for g in GRUPOS_EDAD])
+
+    # ---- Entradas ----
+    ent = base.copy()
+    ent['n_publico'] = rng.integers(1000, 9000, n_part)
+    ent['norm_no_vend'] = rng.integers(100, 3000, n_part)
+    ent['recaudacion'] = ent['n_publico'] * rng.uniform(15, 35, n_part)
+    tablas['pre_entradas_partido'] = ent
+
+    ent_sec = base[['id_partido', 'temporada']].merge(pd.DataFrame({'grada': GRADAS}), how='cross')
+    ent_sec['vendidas'] = rng.integers(200, 2500, len(ent_sec))
+    ent_sec['no_vendidas'] = rng.integers(20, 800, len(ent_sec))
+    ent_sec['recaudacion'] = ent_sec['vendidas'] * rng.uniform(15, 35, len(ent_sec))
+    tablas['pre_entradas_sector'] = ent_sec
+
+    # ---- Museo ----
+    n_dias = 120 * escala
+    fechas = pd.date_range('2026-02-18', periods=n_dias, freq='D')
+    tipos = ['Tour Guiado', 'Tour Libre']
+    diario = pd.DataFrame({'fecha': np.repeat(fechas, len(tipos)),
+                           'tipo_producto': tipos * n_dias})
+    diario['ingresos_netos'] = rng.uniform(50, 1500, len(diario))
+    tablas['agg_museo_diario'] = diario
+    tablas['agg_museo_producto'] = diario.groupby('tipo_producto', as_index=False)['ingresos_netos'].sum()
+    tablas['agg_museo_kpis'] = pd.DataFrame([{
+        'id': 1, 'ingresos_netos': float(diario['ingresos_netos'].sum()),
+        'total_entradas': 12000 * escala, 'ticket_medio': 24.5, 'entradas_por_pedido': 2.3,
+    }])
+    horas_tour = pd.to_timedelta([f"{h}:00:00" for h in range(10, 20)])
+    tablas['agg_museo_horario'] = pd.DataFrame({
+        'hora_tour': horas_tour,
+        'entradas': rng.integers(100, 2000, len(horas_tour)) * escala,
+        'ingresos': rng.uniform(1000, 40000, len(horas_tour)) * escala,
+        'pedidos': rng.integers(50, 900, len(horas_tour)) * escala,
+    })
+    heat = pd.DataFrame({'dia_num': np.repeat(np.arange(1, 8), len(horas_tour)),
+                         'hora_tour': np.tile(horas_tour, 7)})
+    heat['entradas'] = rng.integers(0, 300, len(heat)) * escala
+    tablas['agg_museo_heatmap'] = heat
+    tablas['agg_museo_dia_semana'] = pd.DataFrame({'dia_num': range(1, 8),
+                                                   'entradas': rng.integers(100, 900, 7)})
+    tablas['agg_museo_canal'] = pd.DataFrame({
+        'plataforma': ['mobile', 'desktop', 'tablet'],
+        'pedidos': rng.integers(500, 5000, 3) * escala,
+        'entradas': rng.integers(1000, 9000, 3) * escala,
+        'ingresos': rng.uniform(1e4, 1e5, 3) * escala,
+    })
+    tablas['agg_museo_metodo_pago'] = pd.DataFrame({
+        'metodo_pago': ['TARJETA', 'EFECTIVO', 'DEUDA'],
+        'pedidos': rng.integers(100, 5000, 3) * escala,
+    })
+    partidos_museo = partidos[(partidos['temporada'] == 'actual')
+                              & (partidos['schedule'] >= datetime(2026, 2, 18))]
+    tablas['slv_partidos'] = pd.DataFrame({
+        'fecha': partidos_museo['schedule'].dt.normalize(),
+        'rival': partidos_museo['t2_name'],
+    })
+    return tablas
+
+
+_RE_TABLA = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+
+
+def instalar_backend_sintetico(tablas):
+    """Sustituye `database.query_to_df` por un lector en memoria sobre `tablas`.
+
+    Todas las funciones `get_*` resuelven `query_to_df` en tiempo de llamada,
+    de modo que basta con reemplazar ese único punto de entrada. Los
+    parámetros `ids` / `id_partido` filtran por partido; el resto se ignora.
+    Se devuelve la función original para poder restaurarla.
+    """
+    original = database.query_to_df
+    # Histogramas de llegadas solo en memoria y recalculados para cada escala
+    llegadas.DIR_HISTOGRAMAS = ""
+    llegadas.vaciar_memoria()
+
+    def query_sintetica(query, *args, **kwargs):
+        m = _RE_TABLA.search(str(query))
+        nombre = m.group(1) if m else None
+        if nombre not in tablas:
+            return pd.DataFrame()
+        df = tablas[nombre]
+        params = (args[0] if args else kwargs.get("params")) or {}
+        if "id_partido" in df.columns and ("ids" in params or "id_partido" in params):
+            df = df[df["id_partido"].isin(params.get("ids") or [params.get("id_partido")])]
+        return df.copy()
+
+    database.query_to_df = query_sintetica
+    return original
+
+
+# =============================================================================
+# CASOS DE MEDICIÓN
+# =============================================================================
+
+def _cargar_paginas():
+    """Instancia una app Dash mínima para poder importar los módulos de `pages/`.
+
+    `dash.register_page` exige una app creada con `use_pages=True`; no se
+    importa `app.py` para no lanzar la inicialización de usuarios contra MySQL.
+    """
+    import dash
+    dash.Dash(__name__, use_pages=True, pages_folder="pages",
+              suppress_callback_exceptions=True)
+    from pages import hosteleria, asistencia, museo, entradas
+    return {'hosteleria': hosteleria, 'asistencia': asistencia,
+            'museo': museo, 'entradas': entradas}
+
+
+def construir_casos(paginas, tablas):
+    """Lista de (nombre, función, args) con las combinaciones representativas."""
+    casos = []
+    host = paginas['hosteleria']
+    ids_actual = tablas['pre_hosteleria_partido'].query("temporada == 'actual'")['id_partido'].tolist()
+    for sub_tab in ('EVOLUTIVO', 'METODOS', 'DESGLOSE'):
+        for franja in ('GLOBAL', 'MEDIODIA', 'TARDE', 'NOCHE'):
+            casos.append((f"hosteleria/{franja}/{sub_tab}", host.update_page,
+                          (franja, [], sub_tab)))
+        for etiqueta, ids in (('1', ids_actual[:1]), ('5', ids_actual[:5]), ('todos', ids_actual)):
+            casos.append((f"hosteleria/INDIVIDUAL-{etiqueta}/{sub_tab}", host.update_page,
+                          ('INDIVIDUAL', ids, sub_tab)))
+    for temp in ('actual', 'anterior'):
+        casos.append((f"asistencia/{temp}", paginas['asistencia'].update_page, (None, temp)))
+        casos.append((f"entradas/{temp}", paginas['entradas'].update_page, (None, temp)))
+    casos.append(("museo", paginas['museo'].update_page, (None,)))
+    return casos
+
+
+def bytes_respuesta(salida):
+    """Tamaño en bytes de la salida serializada tal y como la envía Dash."""
+    from dash._utils import to_json
+    return len(to_json(salida).encode('utf-8'))
+
+
+def medir_caso(funcion, args, repeticiones=5):
+    """Ejecuta un caso `repeticiones` veces y devuelve sus métricas."""
+    tiempos = []
+    salida = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        salida = funcion(*args)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    funcion(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(float(np.percentile(tiempos, 50)), 2),
+        'p95_ms': round(float(np.percentile(tiempos, 95)), 2),
+        'media_ms': round(statistics.fmean(tiempos), 2),
+        'pico_mem_kb': round(pico / 1024, 1),
+        'bytes': bytes_respuesta(salida),
+    }
+
+
+def ejecutar(escalas=(1, 10, 100), repeticiones=5, filtro=None, salida=sys.stdout):
+    """Ejecuta todos los casos para cada escala. Devuelve {escala: {caso: métricas}}."""
+    paginas = None
+    resultados = {}
+    for escala in escalas:
+        tablas = generar_datos(escala)
+        original = instalar_backend_sintetico(tablas)
+        try:
+            if paginas is None:
+                paginas = _cargar_paginas()
+            resultados[str(escala)] = {}
+            print(f"\n=== Escala {escala}× ===", file=salida)
+            print(f"{'Caso':<42} {'p50 ms':>9} {'p95 ms':>9} {'Mem KB':>10} {'Bytes':>10}", file=salida)
+            for nombre, funcion, args in construir_casos(paginas, tablas):
+                if filtro and filtro not in nombre:
+                    continue
+                m = medir_caso(funcion, args, repeticiones)
+                m['presupuesto'] = getattr(funcion, 'presupuesto_bytes', None)
+                resultados[str(escala)][nombre] = m
+                aviso = "  > presupuesto" if m['presupuesto'] and m['bytes'] > m['presupuesto'] else ""
+                print(f"{nombre:<42} {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f} "
+                      f"{m['pico_mem_kb']:>10.0f} {m['bytes']:>10}{aviso}", file=salida)
+        finally:
+            database.query_to_df = original
+    return resultados
+
+
+def comparar_con_baseline(resultados, baseline, tolerancia=0.25, margen_ms=5.0):
+    """Devuelve la lista de regresiones frente a `baseline`.
+
+    Un caso regresa si su p95 supera al del baseline en más de `tolerancia`
+    (relativa) y `margen_ms` (absoluto, para no fallar por ruido en casos de
+    pocos milisegundos), o si su respuesta crece más de `tolerancia`.
+    """
+    regresiones = []
+    for escala, casos in resultados.items():
+        for nombre, m in casos.items():
+            ref = baseline.get(escala, {}).get(nombre)
+            if not ref:
+                continue
+            limite_ms = max(ref['p95_ms'] * (1 + tolerancia), ref['p95_ms'] + margen_ms)
+            if m['p95_ms'] > limite_ms:
+                regresiones.append(f"{escala}× {nombre}: p95 {m['p95_ms']:.1f} ms "
+                                   f"(baseline {ref['p95_ms']:.1f} ms)")
+            if m['bytes'] > ref['bytes'] * (1 + tolerancia):
+                regresiones.append(f"{escala}× {nombre}: {m['bytes']} bytes "
+                                   f"(baseline {ref['bytes']} bytes)")
+    return regresiones
+
+
+def comprobar_presupuestos(resultados):
+    """Casos cuya respuesta supera el presupuesto de bytes de su callback."""
+    excesos = []
+    for escala, casos in resultados.items():
+        for nombre, m in casos.items():
+            if m.get('presupuesto') and m['bytes'] > m['presupuesto']:
+                excesos.append(f"{escala}× {nombre}: {m['bytes']} bytes "
+                               f"(presupuesto {m['presupuesto']} bytes)")
+    return excesos
+
+
+# =============================================================================
+# DECODIFICACIÓN DE RESULTADOS
+# =============================================================================
+
+AREAS_CUENTA = ['Hostelería', 'Deportiendas', 'Museo', 'Ticketing']
+PRODUCTOS_CUENTA = [f"Producto {n:03d}" for n in range(60)]
+
+
+def _cuenta_productos_partido(partidos, rng):
+    """`pre_cuenta_productos_partido` sintética: áreas × productos × partido."""
+    df = partidos[['id_partido']].merge(pd.DataFrame({'area': AREAS_CUENTA}), how='cross')
+    df = df.merge(pd.DataFrame({'producto': PRODUCTOS_CUENTA}), how='cross')
+    df['equipo'] = 'Primer equipo'
+    df['dimension'] = 'partido'
+    df['clave'] = df['id_partido'].astype(str)
+    df['unidades'] = rng.integers(0, 500, len(df))
+    df['importe'] = df['unidades'] * rng.uniform(1.5, 40, len(df))
+    return df[['area', 'equipo', 'dimension', 'clave', 'id_partido', 'producto',
+               'unidades', 'importe']]
+
+
+def _medir_lectura(funcion, repeticiones):
+    """CPU (mediana de `repeticiones`) y pico de memoria de una lectura."""
+    cpu = []
+    for _ in range(repeticiones):
+        t0 = time.process_time()
+        df = funcion()
+        cpu.append((time.process_time() - t0) * 1000)
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(cpu)), pico / 1024, df
+
+
+def ejecutar_decodificador(escalas=(1, 10), repeticiones=5, salida=sys.stdout):
+    """Compara `pd.read_sql` con `decodificador` para las tablas `pre_*` anchas.
+
+    Los tipos de columna se pasan a `decodificar` desde el esquema de la tabla
+    (SQLite no los informa en `cursor.description`, MySQL sí).
+    """
+    resultados = {}
+    for escala in escalas:
+        rng = np.random.default_rng(42)
+        tablas = generar_datos(escala)
+        tablas = {
+            'pre_hosteleria_producto_cantina': tablas['pre_hosteleria_producto_cantina'],
+            'pre_cuenta_productos_partido': _cuenta_productos_partido(_partidos(escala, rng), rng),
+        }
+        engine = create_engine("sqlite://", poolclass=StaticPool,
+                               connect_args={"check_same_thread": False})
+        for nombre, df in tablas.items():
+            df.to_sql(nombre, engine, index=False)
+
+        resultados[str(escala)] = {}
+        print(f"\n=== Decodificación, escala {escala}× ===", file=salida)
+        print(f"{'Tabla':<34} {'Filas':>8} {'Lector':<14} {'CPU ms':>9} {'Mem KB':>10}", file=salida)
+        for nombre, df in tablas.items():
+            sql = f"SELECT * FROM {nombre}"
+            tipos = {c: t for c, t in df.dtypes.items() if t.kind in 'if'}
+
+            def leer_read_sql():
+                return pd.read_sql(sql, engine)
+
+            def leer_decodificador():
+                with engine.connect() as conn:
+                    result = conn.exec_driver_sql(sql)
+                    return decodificador.decodificar(result.cursor, clave=sql, tipos=tipos)
+
+            casos = {}
+            for lector, funcion in (('read_sql', leer_read_sql), ('decodificador', leer_decodificador)):
+                cpu_ms, pico_kb, leido = _medir_lectura(funcion, repeticiones)
+                casos[lector] = {'cpu_ms': round(cpu_ms, 2), 'pico_mem_kb': round(pico_kb, 1)}
+                print(f"{nombre:<34} {len(leido):>8} {lector:<14} {cpu_ms:>9.1f} {pico_kb:>10.0f}",
+                      file=salida)
+            resultados[str(escala)][nombre] = casos
+        engine.dispose()
+    return resultados
+
+
+def ejecutar_figuras(escalas=(1, 10), filtro=None, salida=sys.stdout):
+    """Bytes de respuesta de cada caso sin compactar, compactada y con base64."""
+    modos = (('original', False, False), ('compacta', True, False), ('base64', True, True))
+    paginas = None
+    resultados = {}
+    activo, base64 = figuras.ACTIVO, figuras.BASE64
+    for escala in escalas:
+        tablas = generar_datos(escala)
+        original = instalar_backend_sintetico(tablas)
+        try:
+            if paginas is None:
+                paginas = _cargar_paginas()
+            resultados[str(escala)] = {}
+            print(f"\n=== Figuras, escala {escala}× ===", file=salida)
+            print(f"{'Caso':<42} {'Original':>10} {'Compacta':>10} {'Base64':>10} {'Ahorro':>7}",
+                  file=salida)
+            for nombre, funcion, args in construir_casos(paginas, tablas):
+                if filtro and filtro not in nombre:
+                    continue
+                m = {}
+                for modo, compactar, con_base64 in modos:
+                    figuras.ACTIVO, figuras.BASE64 = compactar, con_base64
+                    m[modo] = bytes_respuesta(funcion(*args))
+                resultados[str(escala)][nombre] = m
+                ahorro = 1 - min(m['compacta'], m['base64']) / m['original']
+                print(f"{nombre:<42} {m['original']:>10} {m['compacta']:>10} {m['base64']:>10} "
+                      f"{ahorro:>6.0%}", file=salida)
+        finally:
+            database.query_to_df = original
+            figuras.ACTIVO, figuras.BASE64 = activo, base64
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de callbacks de página")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--filtro", help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--baseline", help="JSON de referencia con el que comparar")
+    parser.add_argument("--guardar-baseline", help="Guarda los resultados como baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--decodificador", action="store_true",
+                        help="Compara pd.read_sql con el decodificador columnar")
+    parser.add_argument("--figuras", action="store_true",
+                        help="Compara el tamaño de respuesta sin/con compactar figuras")
+    parser.add_argument("--presupuestos", action="store_true",
+                        help="Falla si algún caso supera el presupuesto de bytes de su callback")
+    args = parser.parse_args(argv)
+
+    if args.figuras:
+        ejecutar_figuras(args.escalas, args.filtro)
+        return 0
+
+    if args.decodificador:
+        ejecutar_decodificador(args.escalas, args.repeticiones)
+        return 0
+
+    resultados = ejecutar(args.escalas, args.repeticiones, args.filtro)
+
+    if args.guardar_baseline:
+        with open(args.guardar_baseline, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline guardado en {args.guardar_baseline}")
+
+    if args.presupuestos:
+        excesos = comprobar_presupuestos(resultados)
+        if excesos:
+            print("\nPRESUPUESTOS EXCEDIDOS:")
+            for e in excesos:
+                print(f"  - {e}")
+            return 1
+        print("\nTodos los casos dentro de presupuesto.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regresiones = comparar_con_baseline(resultados, baseline, args.tolerancia)
+        if regresiones:
+            print("\nREGRESIONES:")
+            for r in regresiones:
+                print(f"  - {r}")
+            return 1
+        print("\nSin regresiones frente al baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Caché de la Ficha Post-Partido
+==============================
+Carga en bloque las fichas (`pre_ficha_partido`) de la temporada actual y la
+lista de rivales que alimenta el navegador de escudos, indexadas por
+`id_partido`. Con dos consultas se sirve la navegación completa entre
+partidos; las fichas se recargan cuando vence `TTL_SEGUNDOS`. Si la carga
+falla se siguen sirviendo las fichas anteriores (o nada, si aún no las hay) y
+se vuelve a intentar pasados `REINTENTO_SEGUNDOS`.
+
+Al abrir una ficha se construyen en segundo plano los layouts del partido
+anterior y del siguiente (orden cronológico del navegador), de modo que el
+clic en un escudo vecino devuelve un layout ya preparado.
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from database import get_ficha_rivales_temp_actual, get_fichas_partidos, get_ficha_partido
+
+TTL_SEGUNDOS = 300
+REINTENTO_SEGUNDOS = 10
+
+_lock = threading.Lock()
+_estado = {"vence": 0.0, "version": 0, "rivales": pd.DataFrame(), "filas": {}, "orden": []}
+_layouts = {}
+
+
+def _cargar():
+    """Rivales + todas las fichas disponibles de la temporada en una sola query."""
+    df_rivales = get_ficha_rivales_temp_actual()
+    ids = []
+    if not df_rivales.empty:
+        con_ficha = df_rivales[df_rivales['tiene_ficha'].fillna(0).astype(int) == 1]
+        ids = [int(x) for x in con_ficha['id_partido'].dropna().tolist()]
+    df = get_fichas_partidos(ids) if ids else pd.DataFrame()
+    filas = {int(r['id_partido']): r for _, r in df.iterrows()}
+    return df_rivales, filas, ids
+
+
+def _asegurar_fresco():
+    with _lock:
+        if time.time() < _estado["vence"]:
+            return
+        try:
+            df_rivales, filas, orden = _cargar()
+        except Exception as e:
+            print(f"Error cargando las fichas: {e}")
+            _estado["vence"] = time.time() + REINTENTO_SEGUNDOS
+            return
+        _estado.update(vence=time.time() + TTL_SEGUNDOS, version=_estado["version"] + 1,
+                       rivales=df_rivales, filas=filas, orden=orden)
+        _layouts.clear()
+
+
+def get_rivales():
+    """DataFrame de rivales de la temporada (mismo formato que `get_ficha_rivales_temp_actual`)."""
+    _asegurar_fresco()
+    return _estado["rivales"]
+
+
+def get_ficha(id_partido):
+    """Fila de `pre_ficha_partido` para `id_partido` o None si no existe.
+
+    Los partidos fuera de la temporada actual (p. ej. URL directa a una ficha
+    antigua) se consultan individualmente y se añaden a la caché.
+    """
+    _asegurar_fresco()
+    fila = _estado["filas"].get(int(id_partido))
+    if fila is not None:
+        return fila
+    df = get_ficha_partido(int(id_partido))
+    if df.empty:
+        return None
+    fila = df.iloc[0]
+    with _lock:
+        _estado["filas"][int(id_partido)] = fila
+    return fila
+
+
+def vecinos(id_partido):
+    """ids del partido anterior y siguiente con ficha en orden cronológico."""
+    orden = _estado["orden"]
+    try:
+        i = orden.index(int(id_partido))
+    except ValueError:
+        return []
+    return [orden[j] for j in (i - 1, i + 1) if 0 <= j < len(orden)]
+
+
+def get_layout(id_partido, construir):
+    """Layout cacheado de la ficha; `construir(fila, df_rivales)` si no existe.
+
+    Tras devolverlo lanza la construcción de los vecinos en un hilo aparte.
+    """
+    fila = get_ficha(id_partido)
+    if fila is None:
+        return None
+    clave = (_estado["version"], int(id_partido))
+    layout = _layouts.get(clave)
+    if layout is None:
+        layout = construir(fila, _estado["rivales"])
+        _layouts[clave] = layout
+    _prefetch(id_partido, construir)
+    return layout
+
+
+def _prefetch(id_partido, construir):
+    version = _estado["version"]
+    pendientes = [i for i in vecinos(id_partido) if (version, i) not in _layouts]
+    if not pendientes:
+        return
+
+    def _trabajo():
+        for i in pendientes:
+            fila = _estado["filas"].get(i)
+            if fila is not None and _estado["version"] == version:
+                _layouts[(version, i)] = construir(fila, _estado["rivales"])
+
+    threading.Thread(target=_trabajo, daemon=True).start()
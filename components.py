@@ -3,7 +3,19 @@ Componentes reutilizables de la plataforma
 ==========================================
 """
 
-from dash import html, dcc
+import time
+from datetime import datetime
+from functools import wraps
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import html, dcc, no_update
+
+import escudos
+import figuras
+from database import SWR_FRESCURA_SEGUNDOS, iniciar_marca_datos, marca_datos
 
 
 # Mapa t2_name (slv_partidos) -> archivo PNG en /assets/Escudos/
@@ -107,10 +119,10 @@ def temporada_toggle(toggle_id, store_id, label="Temporada 24/25",
 
 
 
-def get_escudo_path(t2_name):
-    """Devuelve la ruta del escudo en /assets/Escudos/<archivo> o None."""
+def get_escudo_path(t2_name, tamano="nav"):
+    """Devuelve la URL del escudo (variante optimizada de `tamano`) o None."""
     archivo = ESCUDOS_MAP.get(t2_name)
-    return f"/assets/Escudos/{archivo}" if archivo else None
+    return escudos.url(archivo, tamano) if archivo else None
 
 
 def _escudo_slot(rival, id_partido, tiene_ficha, active_id=None):
@@ -120,8 +132,16 @@ def _escudo_slot(rival, id_partido, tiene_ficha, active_id=None):
     - tiene_ficha=False → slot deshabilitado (gris), no clickable
     - active_id==id_partido → slot marcado como activo (azul corporativo)
     """
-    escudo = get_escudo_path(rival)
-    img = html.Img(src=escudo, alt=rival) if escudo else html.Span(rival)
+    archivo = ESCUDOS_MAP.get(rival)
+    sprite = escudos.estilo_sprite(archivo) if archivo else None
+    if sprite:
+        # Todos los escudos del navegador salen de un único sprite
+        img = html.Div(className="escudo-sprite", style=sprite, role="img",
+                       **{"aria-label": rival})
+    elif archivo:
+        img = html.Img(src=escudos.url(archivo, "nav"), alt=rival)
+    else:
+        img = html.Span(rival)
 
     classes = ["escudo-slot"]
     if not tiene_ficha:
@@ -175,3 +195,122 @@ def build_escudos_nav(df_rivales, layout="grid", active_id=None, title="FICHA PO
         html.H3(title, className="escudos-nav-title"),
         html.Div([row1, row2], className="escudos-nav-rows"),
     ], className="escudos-nav-section")
+
+
+# =============================================================================
+# ANTIGÜEDAD DE LOS DATOS
+# =============================================================================
+
+ZONA_HORARIA = ZoneInfo("Europe/Madrid")
+
+
+def badge_datos(ts):
+    """Indicador discreto 'Datos a las HH:MM' con la hora del dato más antiguo
+    mostrado. Se resalta si supera la frescura de la caché (MySQL lento o caído)."""
+    if ts is None:
+        return None
+    obsoleto = time.time() - ts >= 2 * SWR_FRESCURA_SEGUNDOS
+    cls = "data-badge data-badge--stale" if obsoleto else "data-badge"
+    return html.Div(f"Datos a las {datetime.fromtimestamp(ts, ZONA_HORARIA).strftime('%H:%M')}",
+                    className=cls)
+
+
+def indicador_progreso(id_indicador):
+    """Aviso 'Actualizando datos...' que se muestra mientras el render de la
+    página corre en segundo plano (ver `segundo_plano.py`). Oculto por defecto."""
+    return html.Div([
+        html.Div(className="progreso-spinner"),
+        html.Span("Actualizando datos..."),
+    ], id=id_indicador, className="progreso-render", style={"display": "none"})
+
+
+def con_marca_datos(func):
+    """Decorador para callbacks de página: antepone `badge_datos` al contenido
+    devuelto, con la antigüedad de los datos leídos durante el callback.
+    Las figuras del contenido se compactan (ver `figuras.py`)."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        iniciar_marca_datos()
+        contenido = figuras.compactar(func(*args, **kwargs))
+        badge = badge_datos(marca_datos())
+        if badge is None or contenido is no_update:
+            return contenido
+        return [badge, contenido]
+    return wrapper
+
+
+# =============================================================================
+# GRÁFICAS COMPARATIVAS POR CATEGORÍA
+# =============================================================================
+
+# (valor de la columna temporada, etiqueta, color) en orden de dibujo
+TEMPORADAS_GRAFICA = (('anterior', '24/25', '#3498db'), ('actual', '25/26', '#18395c'))
+COLOR_BARRA = '#18395c'
+COLOR_MAXIMO = '#f39c12'
+
+
+def figura_por_categoria(df, categoria, valor, orden=None, temporada=None, rival='t2_name',
+                         formato=str, sufijo='', etiqueta='', etiqueta_valor='Promedio',
+                         mostrar_total=False, redondear=False, resaltar_max=False,
+                         margen_y=1.25, tamano_texto=10, **layout):
+    """Barras del promedio de `valor` por `categoria` (día, hora de inicio...).
+
+    Con `temporada` (nombre de columna) dibuja una barra por temporada de
+    TEMPORADAS_GRAFICA en cada categoría; sin ella, una sola serie.
+    Un único groupby por (temporada, categoría), reindexado a `orden` (o a
+    las categorías presentes ordenadas); textos y hovers se construyen por
+    columnas. `layout` se aplica al final con `fig.update_layout`.
+    """
+    claves = [temporada, categoria] if temporada else [categoria]
+    g = df.dropna(subset=[categoria]).groupby(claves, observed=True).agg(
+        total=(valor, 'sum'),
+        n=(valor, 'count'),
+        rivales=(rival, lambda s: ', '.join(s.dropna().astype(str))),
+    )
+    presentes = set(g.index.get_level_values(categoria))
+    cats = [c for c in orden if c in presentes] if orden is not None else sorted(presentes)
+    series = TEMPORADAS_GRAFICA if temporada else ((None, None, COLOR_BARRA),)
+    if temporada:
+        g = g.reindex(pd.MultiIndex.from_product([[s[0] for s in series], cats], names=claves))
+    else:
+        g = g.reindex(pd.Index(cats, name=categoria))
+    g['n'] = g['n'].fillna(0).astype(int)
+    g['total'] = g['total'].fillna(0)
+    g['rivales'] = g['rivales'].fillna('')
+    g['promedio'] = (g['total'] / g['n'].where(g['n'] > 0)).fillna(0)
+    if redondear:
+        g['promedio'] = g['promedio'].round(0)
+
+    x = [str(c) for c in cats]
+    fig = go.Figure()
+    for clave, nombre, color in series:
+        sub = g.xs(clave, level=temporada) if temporada else g
+        sub = sub.reset_index(drop=True)
+        txt_prom = sub['promedio'].map(formato) + sufijo
+        titulo = '<b>' + etiqueta + pd.Series(x) + (f' ({nombre})' if nombre else '') + '</b>'
+        hover = (titulo + f'<br>{etiqueta_valor}: ' + txt_prom
+                 + '<br>Partidos: ' + sub['n'].astype(str) + ' (' + sub['rivales'] + ')')
+        if mostrar_total:
+            hover = hover + '<br>Total: ' + sub['total'].map(formato) + sufijo
+        colores = color
+        if resaltar_max and len(sub):
+            colores = np.where(sub['promedio'] == sub['promedio'].max(), COLOR_MAXIMO, color).tolist()
+        fig.add_trace(go.Bar(
+            name=nombre, x=x, y=sub['promedio'].tolist(),
+            marker_color=colores,
+            text=txt_prom.where(sub['n'] > 0, '').tolist(),
+            textposition='outside',
+            textfont=dict(color='#333', size=tamano_texto, family='Montserrat', weight='bold'),
+            hovertext=hover.tolist(),
+            hoverinfo='text',
+        ))
+
+    max_y = g['promedio'].max() * margen_y if len(g) else 0
+    fig.update_layout(
+        barmode='group', showlegend=False, height=200,
+        margin=dict(t=30, b=30, l=20, r=20),
+        xaxis=dict(type='category', tickfont=dict(size=10, family='Montserrat', weight='bold')),
+        yaxis=dict(showticklabels=False, range=[0, max_y or 1]),
+    )
+    fig.update_layout(**layout)
+    return fig
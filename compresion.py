@@ -0,0 +1,87 @@
+"""
+Compresión de respuestas de callbacks
+=====================================
+Comprime en `after_request` las respuestas JSON de Dash
+(`/_dash-update-component`, `/_dash-layout`, `/_dash-dependencies`), que
+gunicorn envía sin comprimir. El store de DESGLOSE o las salidas con varias
+figuras (asistencia, museo) pasan de cientos de KB a una fracción.
+
+    - Solo por encima de `COMPRESION_UMBRAL` bytes (por defecto 1 KB): en
+      respuestas pequeñas la cabecera y la CPU no compensan.
+    - Algoritmo según `Accept-Encoding` y `COMPRESION`: `auto` (brotli si el
+      paquete `brotli` está instalado y el navegador lo acepta, si no gzip),
+      `br`, `gzip` o `0` para desactivar.
+    - Nivel adaptativo por tamaño (`NIVELES`): cuanto mayor la respuesta,
+      más rápido el nivel, para que comprimir un store de varios MB no cueste
+      más que enviarlo.
+
+El tamaño sin comprimir queda en `flask.g.bytes_json` para las métricas y los
+presupuestos de `metricas.py`.
+"""
+
+import gzip
+import os
+
+import flask
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se usa gzip
+    brotli = None
+
+MODO = os.environ.get("COMPRESION", "auto")
+UMBRAL = int(os.environ.get("COMPRESION_UMBRAL", "1024"))
+RUTAS = ("/_dash-update-component", "/_dash-layout", "/_dash-dependencies")
+
+# (hasta bytes, nivel gzip, calidad brotli)
+NIVELES = (
+    (512 * 1024, 6, 5),
+    (4 * 1024 * 1024, 4, 4),
+    (None, 1, 1),
+)
+
+
+def _nivel(n_bytes):
+    return next((g, b) for limite, g, b in NIVELES if limite is None or n_bytes <= limite)
+
+
+def _ofrecidas():
+    if MODO == "br":
+        return ["br"] if brotli is not None else []
+    if MODO == "gzip":
+        return ["gzip"]
+    if MODO == "auto":
+        return (["br"] if brotli is not None else []) + ["gzip"]
+    return []
+
+
+def comprimir(datos, codificacion):
+    """`datos` comprimidos con `codificacion` ('br' o 'gzip') al nivel adaptativo."""
+    nivel_gzip, calidad_br = _nivel(len(datos))
+    if codificacion == "br":
+        return brotli.compress(datos, quality=calidad_br)
+    return gzip.compress(datos, nivel_gzip, mtime=0)
+
+
+def _comprimir_respuesta(response):
+    if (not flask.request.path.endswith(RUTAS) or response.status_code != 200
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    datos = response.get_data()
+    flask.g.bytes_json = len(datos)
+    response.vary.add("Accept-Encoding")
+    if len(datos) < UMBRAL:
+        return response
+    codificacion = flask.request.accept_encodings.best_match(_ofrecidas())
+    if not codificacion:
+        return response
+    response.set_data(comprimir(datos, codificacion))
+    response.headers["Content-Encoding"] = codificacion
+    return response
+
+
+def registrar(server):
+    """Activa la compresión de las respuestas de Dash en `server`."""
+    if not _ofrecidas():
+        return
+    server.after_request(_comprimir_respuesta)
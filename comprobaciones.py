@@ -0,0 +1,178 @@
+"""
+Comprobaciones sin MySQL
+========================
+Casos concretos que deben seguir funcionando y que no cubren `benchmark.py`
+ni `migraciones.py --sqlite`: cada comprobación prepara su propio estado en
+memoria (sin MySQL) y falla con un mensaje si el comportamiento cambia.
+
+Uso:
+    python comprobaciones.py               # todas
+    python comprobaciones.py circuito sondeo   # solo las indicadas
+
+El proceso termina con código 1 si alguna falla.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+import benchmark
+import conciliacion
+import database
+import metricas
+
+COMPROBACIONES = {}
+
+
+def comprobacion(nombre):
+    """Registra la función como comprobación `nombre`."""
+    def decorator(func):
+        COMPROBACIONES[nombre] = func
+        return func
+    return decorator
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+def _abrir_circuito():
+    """Circuito nuevo abierto y con la espera ya cumplida (semiabierto)."""
+    circuito = database._Circuito()
+    for _ in range(database.CIRCUITO_FALLOS):
+        circuito.fallo()
+    circuito.abierto_hasta = time.time() - 1
+    return circuito
+
+
+@comprobacion("circuito")
+def comprobar_circuito():
+    """Una consulta de prueba que agota su plazo no deja el circuito bloqueado."""
+    original_circuito, original_ejecutar = database._circuito, database._ejecutar_entre_workers
+
+    def agota_plazo(query, params, clave):
+        raise database.PlazoAgotado("plazo de prueba")
+
+    database._circuito = _abrir_circuito()
+    database._ejecutar_entre_workers = agota_plazo
+    try:
+        try:
+            database.query_to_df("SELECT 1", cache=False)
+            raise AssertionError("la consulta de prueba debía agotar su plazo")
+        except database.PlazoAgotado:
+            pass
+        assert not database._circuito.sondeando, "el sondeo sigue marcado tras PlazoAgotado"
+        assert database._circuito.permite(), "el circuito no permite una nueva consulta de prueba"
+    finally:
+        database._circuito, database._ejecutar_entre_workers = original_circuito, original_ejecutar
+
+
+@comprobacion("sondeo")
+def comprobar_sondeo_caducado():
+    """Una consulta de prueba que nunca informa caduca a los CIRCUITO_ESPERA_SEGUNDOS."""
+    circuito = _abrir_circuito()
+    assert circuito.permite(), "el circuito semiabierto no permite la consulta de prueba"
+    assert not circuito.permite(), "se permitió una segunda prueba simultánea"
+    circuito.sondeo_desde -= database.CIRCUITO_ESPERA_SEGUNDOS
+    assert circuito.permite(), "la prueba perdida no caducó"
+    assert not circuito.permite(), "la prueba nueva no volvió a ser única"
+
+
+# =============================================================================
+# CONCILIACIÓN
+# =============================================================================
+
+@comprobacion("conciliacion")
+def comprobar_conciliacion():
+    """`conciliacion.py --ejemplo` detecta el descuadre y solo ese, y sale con 1."""
+    tabla, partido, columna, _ = conciliacion.DESCUADRE_EJEMPLO
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = os.path.join(tmp, "informe.json")
+        with contextlib.redirect_stderr(io.StringIO()):
+            codigo = conciliacion.main(["--ejemplo", "--salida", salida])
+        with open(salida, encoding="utf-8") as f:
+            informe = json.load(f)
+    assert codigo == 1, f"código de salida {codigo}, se esperaba 1"
+    assert not informe["ok"], "el informe no marca el descuadre"
+    mal = [t for t, r in informe["tablas"].items() if not r["ok"]]
+    assert mal == [tabla], f"tablas que no concilian: {mal}, se esperaba [{tabla}]"
+    diferencias = [(d["id_partido"], d["columna"]) for d in informe["tablas"][tabla]["diferencias"]]
+    assert diferencias == [(partido, columna)], f"diferencias inesperadas: {diferencias}"
+    assert conciliacion.conciliar(conciliacion.engine_ejemplo(descuadre=False))["ok"], \
+        "los datos de ejemplo sin descuadre no concilian"
+
+
+# =============================================================================
+# PRESUPUESTOS DE BYTES
+# =============================================================================
+
+@comprobacion("presupuestos")
+def comprobar_presupuestos():
+    """Los callbacks de página no superan su `@presupuesto` con datos sintéticos 1×.
+
+    Se ejecutan los casos de `benchmark.construir_casos` con
+    `metricas.ESTRICTO` activo (como `PRESUPUESTOS_ESTRICTOS=1`): un exceso
+    lanza `PresupuestoExcedido` desde el propio callback.
+    """
+    estricto = metricas.ESTRICTO
+    metricas.ESTRICTO = True
+    try:
+        try:
+            metricas.presupuesto(10)(lambda: {"relleno": "x" * 100})()
+            raise AssertionError("el modo estricto no lanza PresupuestoExcedido")
+        except metricas.PresupuestoExcedido:
+            pass
+
+        tablas = benchmark.generar_datos(1)
+        original = benchmark.instalar_backend_sintetico(tablas)
+        try:
+            excesos = []
+            for nombre, funcion, args in benchmark.construir_casos(benchmark._cargar_paginas(), tablas):
+                assert getattr(funcion, "presupuesto_bytes", None), f"{nombre}: callback sin @presupuesto"
+                try:
+                    funcion(*args)
+                except metricas.PresupuestoExcedido as e:
+                    excesos.append(f"{nombre}: {e}")
+        finally:
+            database.query_to_df = original
+    finally:
+        metricas.ESTRICTO = estricto
+    assert not excesos, "presupuestos excedidos:\n  " + "\n  ".join(excesos)
+
+
+# =============================================================================
+# EJECUCIÓN
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comprobaciones sin MySQL")
+    parser.add_argument("nombres", nargs="*",
+                        help=f"comprobaciones a ejecutar (por defecto, todas): {', '.join(COMPROBACIONES)}")
+    args = parser.parse_args(argv)
+    desconocidas = [n for n in args.nombres if n not in COMPROBACIONES]
+    if desconocidas:
+        parser.error(f"comprobación desconocida: {', '.join(desconocidas)}")
+
+    fallidas = 0
+    for nombre in args.nombres or COMPROBACIONES:
+        t0 = time.perf_counter()
+        try:
+            COMPROBACIONES[nombre]()
+            marca = "OK "
+        except Exception:
+            fallidas += 1
+            marca = "MAL"
+            traceback.print_exc()
+        print(f"[{marca}] {nombre:<14} {time.perf_counter() - t0:6.2f} s")
+    print(f"{len(args.nombres or COMPROBACIONES) - fallidas} correctas, {fallidas} fallidas")
+    return 1 if fallidas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Conciliación Silver ↔ tablas pre-calculadas
+===========================================
+Recalcula desde las tablas Silver (`slv_*`) los agregados por partido de las
+tablas `pre_*` que lee el dashboard y los compara con los almacenados, con
+tolerancia por columna. Pensado para ejecutarse tras cada refresco del ETL.
+
+    - Las tablas Silver se extraen en bloques de partidos en paralelo, solo
+      con las columnas necesarias.
+    - Los agregados se recalculan con group-by vectorizados.
+    - El resultado es un informe JSON por tabla: partidos que faltan en la
+      `pre_*`, ids duplicados y diferencias por columna.
+
+Uso:
+    python conciliacion.py                          # MySQL, informe en stdout
+    python conciliacion.py --salida informe.json
+    python conciliacion.py --sqlite copia.db        # contra una copia SQLite
+    python conciliacion.py --ejemplo                # datos de ejemplo con un descuadre
+
+Termina con código 1 si alguna tabla no concilia.
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import database
+import decodificador
+from jornadas import TEMPORADAS
+
+TAMANO_BLOQUE = 40  # partidos por consulta de extracción
+HILOS = 4
+MAX_DIFERENCIAS = 50  # diferencias listadas por tabla en el informe
+
+TOL_CONTEO = (0, 0.0)          # (absoluta, relativa)
+TOL_IMPORTE = (0.01, 1e-6)
+
+
+def _por_partidos(sql):
+    return text(sql).bindparams(bindparam("ids", expanding=True))
+
+
+# =============================================================================
+# EXTRACCIÓN SILVER
+# =============================================================================
+
+EXTRACCIONES = {
+    "ticketing": _por_partidos("""
+        SELECT id_partido, n_publico, norm_no_vend, recaudacion, rec_ces_vend
+        FROM slv_ticketing
+        WHERE id_partido IN :ids
+    """),
+    "cesiones": _por_partidos("""
+        SELECT id_partido, estado_mercado_secundario_v_d_b AS estado
+        FROM slv_cesiones
+        WHERE id_partido IN :ids
+    """),
+    "asistencias": _por_partidos(f"""
+        SELECT a.id_partido, a.clave_unica
+        FROM slv_asistencias a
+        JOIN slv_abonos ab ON a.clave_unica = ab.cardId
+        JOIN slv_socios s ON ab.ownerId = s.id
+        WHERE ab.locality NOT IN {database._LOCALITIES_EXCLUIDAS}
+        AND a.id_partido IN :ids
+    """),
+}
+
+
+def _leer(engine, consulta, params=None):
+    """Lee directamente de `engine` (sin la caché de `database`)."""
+    with engine.connect() as conn:
+        result = conn.execute(consulta, params or {})
+        return decodificador.decodificar(result.cursor, list(result.keys()))
+
+
+def _ids_calendario(engine):
+    ids = set()
+    for temporada in TEMPORADAS.values():
+        df = _leer(engine, database.CONSULTAS["partidos_local"], {"temporada": temporada})
+        ids.update(int(i) for i in df["id"].dropna())
+    return ids
+
+
+def extraer(engine, ids, nombres=None):
+    """{nombre: DataFrame} de las extracciones Silver para los partidos `ids`."""
+    nombres = list(nombres or EXTRACCIONES)
+    ids = sorted(ids)
+    bloques = [ids[i:i + TAMANO_BLOQUE] for i in range(0, len(ids), TAMANO_BLOQUE)]
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        futuros = {nombre: [pool.submit(_leer, engine, EXTRACCIONES[nombre], {"ids": b})
+                            for b in bloques]
+                   for nombre in nombres}
+        return {nombre: pd.concat([f.result() for f in fs], ignore_index=True) if fs else pd.DataFrame()
+                for nombre, fs in futuros.items()}
+
+
+# =============================================================================
+# AGREGADOS RECALCULADOS
+# =============================================================================
+# Cada función recibe las extracciones y devuelve un DataFrame indexado por
+# id_partido con las mismas columnas que la tabla `pre_*`.
+
+def _entradas_partido(ext):
+    return ext["ticketing"].groupby("id_partido")[["n_publico", "norm_no_vend", "recaudacion"]].sum()
+
+
+def _cesiones_recaudacion(ext):
+    return ext["ticketing"].groupby("id_partido")[["rec_ces_vend"]].sum()
+
+
+def _cesiones_partido(ext):
+    c = ext["cesiones"]
+    return pd.DataFrame({
+        "id_partido": c["id_partido"],
+        "vendidas": c["estado"].eq("V"),
+        "no_vendidas": c["estado"].eq("D"),
+    }).groupby("id_partido").sum().astype("int64")
+
+
+def _asistencia_partido(ext):
+    return ext["asistencias"].groupby("id_partido")["clave_unica"].nunique().to_frame("abonados_asistentes")
+
+
+# tabla pre_* -> (extracción Silver, agregado, {columna: tolerancia})
+CONCILIACIONES = {
+    "pre_entradas_partido": ("ticketing", _entradas_partido, {
+        "n_publico": TOL_CONTEO, "norm_no_vend": TOL_CONTEO, "recaudacion": TOL_IMPORTE,
+    }),
+    "pre_cesiones_recaudacion": ("ticketing", _cesiones_recaudacion, {
+        "rec_ces_vend": TOL_IMPORTE,
+    }),
+    "pre_cesiones_partido": ("cesiones", _cesiones_partido, {
+        "vendidas": TOL_CONTEO, "no_vendidas": TOL_CONTEO,
+    }),
+    "pre_asistencia_partido": ("asistencias", _asistencia_partido, {
+        "abonados_asistentes": TOL_CONTEO,
+    }),
+}
+
+
+# =============================================================================
+# COMPARACIÓN
+# =============================================================================
+
+def comparar(pre, silver, tolerancias):
+    """Compara la tabla almacenada con la recalculada (ambas con id_partido).
+
+    Los partidos sin datos Silver cuentan como 0. Devuelve el dict del informe
+    de la tabla.
+    """
+    columnas = list(tolerancias)
+    duplicados = pre.loc[pre["id_partido"].duplicated(), "id_partido"].astype(int).unique().tolist()
+    pre_ag = pre.groupby("id_partido")[columnas].sum(min_count=1)
+    faltan = silver.index.difference(pre_ag.index)
+    partidos_silver = len(silver)
+    silver = silver.reindex(pre_ag.index).fillna(0)
+
+    resumen, diferencias = {}, []
+    for col, (tol_abs, tol_rel) in tolerancias.items():
+        a = pd.to_numeric(pre_ag[col], errors="coerce").to_numpy(dtype=float)
+        b = silver[col].to_numpy(dtype=float)
+        delta = np.abs(a - b)
+        mal = ~(delta <= tol_abs + tol_rel * np.abs(b))
+        resumen[col] = {"diferencias": int(mal.sum()),
+                        "max_abs": float(np.nanmax(delta)) if len(delta) else 0.0}
+        for i in np.flatnonzero(mal)[:MAX_DIFERENCIAS]:
+            diferencias.append({"id_partido": int(pre_ag.index[i]), "columna": col,
+                                "pre": None if np.isnan(a[i]) else float(a[i]),
+                                "silver": float(b[i])})
+
+    return {
+        "ok": not (len(faltan) or duplicados or any(r["diferencias"] for r in resumen.values())),
+        "filas_pre": int(len(pre)),
+        "partidos_silver": int(partidos_silver),
+        "faltan_en_pre": [int(i) for i in faltan],
+        "duplicados": duplicados,
+        "columnas": resumen,
+        "diferencias": diferencias[:MAX_DIFERENCIAS],
+    }
+
+
+def conciliar(engine=None, tablas=None):
+    """Ejecuta la conciliación y devuelve el informe (dict serializable en JSON)."""
+    engine = engine or database.get_engine()
+    tablas = list(tablas or CONCILIACIONES)
+    t0 = time.perf_counter()
+
+    pres = {t: _leer(engine, text(f"SELECT * FROM {t}")) for t in tablas}
+    ids = _ids_calendario(engine)
+    for pre in pres.values():
+        if "id_partido" in pre.columns:
+            ids.update(int(i) for i in pre["id_partido"].dropna())
+    ext = extraer(engine, ids, {CONCILIACIONES[t][0] for t in tablas})
+
+    informe = {"generado": datetime.now().isoformat(timespec="seconds"),
+               "partidos": len(ids), "tablas": {}}
+    for t in tablas:
+        fuente, agregado, tolerancias = CONCILIACIONES[t]
+        silver = agregado(ext) if not ext[fuente].empty else pd.DataFrame(columns=list(tolerancias))
+        informe["tablas"][t] = comparar(pres[t], silver, tolerancias)
+    informe["ok"] = all(r["ok"] for r in informe["tablas"].values())
+    informe["segundos"] = round(time.perf_counter() - t0, 3)
+    return informe
+
+
+# =============================================================================
+# DATOS DE EJEMPLO
+# =============================================================================
+# Réplica SQLite en memoria con las tablas Silver y `pre_*` que concilian
+# salvo un descuadre deliberado (`DESCUADRE_EJEMPLO`): sirve para comprobar
+# el informe y el código de salida sin MySQL.
+
+DESCUADRE_EJEMPLO = ("pre_entradas_partido", 2, "recaudacion", 5.0)   # tabla, partido, columna, delta
+
+_ESQUEMA_EJEMPLO = [
+    """CREATE TABLE slv_partidos (
+        id INTEGER PRIMARY KEY, schedule TEXT, dia_semana TEXT, t1_name TEXT,
+        t2_name TEXT, id_temporada TEXT, equipo_depor TEXT)""",
+    """CREATE TABLE slv_ticketing (
+        id INTEGER PRIMARY KEY, id_partido INTEGER, n_publico INTEGER,
+        norm_no_vend INTEGER, recaudacion REAL, rec_ces_vend REAL)""",
+    """CREATE TABLE slv_cesiones (
+        id INTEGER PRIMARY KEY, id_partido INTEGER, estado_mercado_secundario_v_d_b TEXT)""",
+    """CREATE TABLE slv_asistencias (
+        id INTEGER PRIMARY KEY, clave_unica TEXT, id_partido INTEGER)""",
+    """CREATE TABLE slv_abonos (
+        id INTEGER PRIMARY KEY, cardId TEXT, ownerId INTEGER, locality TEXT)""",
+    """CREATE TABLE slv_socios (id INTEGER PRIMARY KEY)""",
+    """CREATE TABLE pre_entradas_partido (
+        id_partido INTEGER, n_publico INTEGER, norm_no_vend INTEGER, recaudacion REAL)""",
+    """CREATE TABLE pre_cesiones_recaudacion (id_partido INTEGER, rec_ces_vend REAL)""",
+    """CREATE TABLE pre_cesiones_partido (id_partido INTEGER, vendidas INTEGER, no_vendidas INTEGER)""",
+    """CREATE TABLE pre_asistencia_partido (id_partido INTEGER, abonados_asistentes INTEGER)""",
+]
+
+
+def engine_ejemplo(descuadre=True):
+    """Engine SQLite en memoria con tres partidos de ejemplo.
+
+    Las `pre_*` se rellenan con los agregados correctos; con `descuadre` se
+    altera el valor indicado en `DESCUADRE_EJEMPLO`.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    partidos = [1, 2, 3]
+    ticketing = [(p, 100 * p + k, k, 1000.0 * p + 10.5 * k, 50.0 * k) for p in partidos for k in range(1, 4)]
+    cesiones = [(p, "VDB"[k % 3]) for p in partidos for k in range(p + 3)]
+    abonos = [(k, f"card{k}", k, "SIN ASIENTO" if k == 5 else "TRIBUNA") for k in range(1, 7)]
+    asistencias = [(p, f"card{k}") for p in partidos for k in range(1, 7) if k <= p + 3]
+    asistencias.append((1, "card1"))   # entrada repetida: cuenta una vez
+
+    pre = {
+        "pre_entradas_partido": [(p, sum(t[1] for t in ticketing if t[0] == p),
+                                  sum(t[2] for t in ticketing if t[0] == p),
+                                  sum(t[3] for t in ticketing if t[0] == p)) for p in partidos],
+        "pre_cesiones_recaudacion": [(p, sum(t[4] for t in ticketing if t[0] == p)) for p in partidos],
+        "pre_cesiones_partido": [(p, sum(e == "V" for q, e in cesiones if q == p),
+                                  sum(e == "D" for q, e in cesiones if q == p)) for p in partidos],
+        "pre_asistencia_partido": [(p, len({c for q, c in asistencias if q == p and c != "card5"}))
+                                   for p in partidos],
+    }
+    if descuadre:
+        tabla, partido, columna, delta = DESCUADRE_EJEMPLO
+        posicion = list(CONCILIACIONES[tabla][2]).index(columna) + 1
+        pre[tabla] = [tuple(v + delta if j == posicion and fila[0] == partido else v
+                            for j, v in enumerate(fila)) for fila in pre[tabla]]
+
+    with engine.begin() as conn:
+        for ddl in _ESQUEMA_EJEMPLO:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql(
+            "INSERT INTO slv_partidos VALUES (?, ?, 'Sábado', 'RC Deportivo', ?, ?, '901')",
+            [(p, f"2025-09-{p:02d} 18:00:00", f"Rival {p}", TEMPORADAS["actual"]) for p in partidos])
+        conn.exec_driver_sql("INSERT INTO slv_ticketing (id_partido, n_publico, norm_no_vend, "
+                             "recaudacion, rec_ces_vend) VALUES (?, ?, ?, ?, ?)", ticketing)
+        conn.exec_driver_sql("INSERT INTO slv_cesiones (id_partido, estado_mercado_secundario_v_d_b) "
+                             "VALUES (?, ?)", cesiones)
+        conn.exec_driver_sql("INSERT INTO slv_abonos VALUES (?, ?, ?, ?)", abonos)
+        conn.exec_driver_sql("INSERT INTO slv_socios VALUES (?)", [(k,) for k in range(1, 7)])
+        conn.exec_driver_sql("INSERT INTO slv_asistencias (id_partido, clave_unica) VALUES (?, ?)",
+                             asistencias)
+        for tabla, filas in pre.items():
+            marcas = ", ".join("?" * len(filas[0]))
+            conn.exec_driver_sql(f"INSERT INTO {tabla} VALUES ({marcas})", filas)
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conciliación Silver ↔ tablas pre-calculadas")
+    parser.add_argument("--salida", help="Fichero donde guardar el informe JSON")
+    parser.add_argument("--sqlite", help="Base SQLite a conciliar en lugar de MySQL")
+    parser.add_argument("--ejemplo", action="store_true",
+                        help="concilia los datos de ejemplo en memoria (con un descuadre)")
+    parser.add_argument("--tabla", action="append", choices=list(CONCILIACIONES),
+                        help="Limitar a estas tablas (repetible)")
+    args = parser.parse_args(argv)
+
+    if args.ejemplo:
+        engine = engine_ejemplo()
+    elif args.sqlite:
+        engine = create_engine(f"sqlite:///{args.sqlite}", connect_args={"check_same_thread": False})
+    else:
+        engine = None
+    try:
+        informe = conciliar(engine, args.tabla)
+    except Exception as e:
+        print(f"Error en la conciliación: {e}", file=sys.stderr)
+        return 2
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+    for tabla, r in informe["tablas"].items():
+        n = sum(c["diferencias"] for c in r["columnas"].values())
+        print(f"[{'OK ' if r['ok'] else 'MAL'}] {tabla:<28} diferencias: {n} · "
+              f"faltan en pre: {len(r['faltan_en_pre'])} · duplicados: {len(r['duplicados'])}",
+              file=sys.stderr)
+    return 0 if informe["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,21 @@ Conexión a la base de datos MySQL
 ==================================
 """
 
+import hashlib
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as SATimeoutError
+
+import decodificador
+import perfil_sql
 
 # Configuración MySQL
 MYSQL_CONFIG = {
@@ -17,19 +30,678 @@ MYSQL_CONFIG = {
 MYSQL_URL = f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}"
 
 
+_engine = None
+_engine_lock = threading.Lock()
+
+
 def get_engine():
-    """Crea y devuelve un engine de SQLAlchemy.
+    """Devuelve el engine de SQLAlchemy del proceso (se crea en la primera llamada).
 
     future=True activa la API compatible con SQLAlchemy 2.0 (Connection.commit
     y protocolo que pandas 2.x espera en df.to_sql).
+
+    Se reutiliza un único engine por proceso: el pool de conexiones y la caché
+    de sentencias compiladas de SQLAlchemy viven en el engine, así que crear
+    uno nuevo por consulta los desaprovechaba. pool_pre_ping/pool_recycle
+    evitan reutilizar conexiones que MySQL haya cerrado por inactividad.
     """
-    return create_engine(MYSQL_URL, future=True)
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(MYSQL_URL, future=True,
+                                        pool_pre_ping=True, pool_recycle=3600,
+                                        connect_args={"connect_timeout": 10})
+    return _engine
+
+
+# =============================================================================
+# PLAZOS (deadline por callback)
+# =============================================================================
+# Un callback puede fijar un plazo con `with plazo(segundos):`. Las consultas
+# lanzadas dentro lo respetan: las esperas (coalescencia, lock entre workers)
+# se cortan al vencer y en MySQL se aplica como MAX_EXECUTION_TIME de la
+# sesión, de modo que una consulta lenta se aborta en el servidor en lugar de
+# ocupar el worker hasta el timeout de gunicorn.
+
+class PlazoAgotado(Exception):
+    """La consulta no ha terminado dentro del plazo del callback."""
+
+
+# Errores de MySQL por consulta abortada (MAX_EXECUTION_TIME superado /
+# consulta interrumpida): el servidor responde, no son fallos de conexión.
+ERRNOS_PLAZO = (3024, 1317)
+
+_plazo = threading.local()
+_max_execution_time_soportado = True
+
+
+@contextmanager
+def plazo(segundos):
+    """Limita a `segundos` las consultas del hilo actual (anidable: gana el más corto)."""
+    anterior = getattr(_plazo, "limite", None)
+    limite = time.monotonic() + segundos
+    _plazo.limite = limite if anterior is None else min(limite, anterior)
+    try:
+        yield
+    finally:
+        _plazo.limite = anterior
+
+
+def plazo_restante():
+    """Segundos que quedan del plazo activo en este hilo, o None si no hay."""
+    limite = getattr(_plazo, "limite", None)
+    return None if limite is None else limite - time.monotonic()
+
+
+def _comprobar_plazo():
+    restante = plazo_restante()
+    if restante is not None and restante <= 0:
+        raise PlazoAgotado("Plazo agotado antes de ejecutar la consulta")
+    return restante
+
+
+def _fijar_max_execution_time(conn, ms):
+    """MAX_EXECUTION_TIME (MySQL ≥ 5.7.8, solo SELECT). Si el servidor no lo
+    admite (p. ej. MariaDB) se desactiva para el resto del proceso."""
+    global _max_execution_time_soportado
+    if not _max_execution_time_soportado or conn.dialect.name != "mysql":
+        return False
+    try:
+        conn.exec_driver_sql(f"SET SESSION MAX_EXECUTION_TIME = {int(ms)}")
+        return True
+    except Exception as e:
+        print(f"MAX_EXECUTION_TIME no disponible, se ignora el plazo en MySQL: {e}")
+        _max_execution_time_soportado = False
+        return False
+
+
+def _errno(error):
+    """Código de error de MySQL de una excepción de SQLAlchemy (o None)."""
+    args = getattr(getattr(error, "orig", None), "args", ())
+    return args[0] if args and isinstance(args[0], int) else None
 
 
-def query_to_df(query: str) -> pd.DataFrame:
-    """Ejecuta una query y devuelve un DataFrame."""
+def _ejecutar(query, params=None) -> pd.DataFrame:
+    """Ejecuta la query contra MySQL y la registra en `perfil_sql`.
+
+    Equivale a `pd.read_sql(query, engine, params=params)`, pero el DataFrame
+    se construye con `decodificador` directamente desde el cursor y se separa
+    el tiempo de MySQL (execute) del de decodificación.
+    """
+    restante = _comprobar_plazo()
     engine = get_engine()
-    return pd.read_sql(query, engine)
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        con_limite = restante is not None and _fijar_max_execution_time(conn, max(1, restante * 1000))
+        try:
+            if isinstance(query, str):
+                result = conn.exec_driver_sql(query)
+            else:
+                result = conn.execute(query, params or {})
+            columnas = list(result.keys())
+            t1 = time.perf_counter()
+            df = decodificador.decodificar(result.cursor, columnas, clave=str(query))
+            t2 = time.perf_counter()
+            result.close()
+        except OperationalError as e:
+            if _errno(e) in ERRNOS_PLAZO:
+                raise PlazoAgotado(f"MySQL abortó la consulta por plazo: {e.orig}") from e
+            raise
+        finally:
+            # La conexión vuelve al pool: restaurar el límite por defecto
+            if con_limite:
+                try:
+                    conn.exec_driver_sql("SET SESSION MAX_EXECUTION_TIME = 0")
+                except Exception:
+                    conn.invalidate()
+    # `deep=True` recorre cada cadena de las columnas object: solo compensa
+    # para el detalle de las sentencias lentas
+    lenta = (t2 - t0) * 1000 >= perfil_sql.UMBRAL_LENTA_MS
+    perfil_sql.registrar(query, t1 - t0, t2 - t1, len(df),
+                         int(df.memory_usage(deep=lenta).sum()),
+                         perfil_sql.origen_llamada())
+    return df
+
+
+# =============================================================================
+# COALESCENCIA DE CONSULTAS (single-flight)
+# =============================================================================
+# En día de partido muchos usuarios abren la misma página a la vez y cada
+# callback lanza los mismos `get_pre_*`. Las peticiones concurrentes con la
+# misma (query, params) comparten una única ejecución:
+#
+#   - entre hilos del mismo worker: el primero ejecuta y el resto espera su
+#     resultado (cada uno recibe su propia copia del DataFrame, porque las
+#     páginas modifican columnas in situ);
+#   - entre workers de gunicorn: un flock por consulta serializa la ejecución.
+#     Si un worker tuvo que esperar, deja una marca y quien tiene el lock
+#     publica el resultado en un pickle que el que espera lee en lugar de
+#     repetir la consulta. Sin fcntl (Windows) solo se coalesce entre hilos.
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin coalescencia entre procesos
+    fcntl = None
+
+# Directorio privado del usuario (0700): contiene pickles que se deserializan
+_uid = os.getuid() if hasattr(os, "getuid") else 0
+SINGLEFLIGHT_DIR = os.environ.get(
+    "SINGLEFLIGHT_DIR",
+    os.path.join(tempfile.gettempdir(), f"dash_negocio_singleflight_{_uid}"),
+)
+_singleflight = {"dir_ok": None}
+
+_vuelos = {}
+_vuelos_lock = threading.Lock()
+_contadores = {"ejecuciones": 0, "coalescidas_hilo": 0, "coalescidas_worker": 0,
+               "cache_fresca": 0, "cache_obsoleta": 0, "rechazadas": 0}
+
+
+class _Vuelo:
+    """Ejecución en curso de una (query, params) y sus esperas."""
+
+    def __init__(self):
+        self.hecho = threading.Event()
+        self.seguidores = 0
+        self.df = None
+        self.error = None
+
+
+def _clave_consulta(query, params):
+    return str(query) + "\x00" + repr(sorted((params or {}).items()))
+
+
+def estadisticas_lecturas():
+    """Contadores del proceso: ejecuciones reales, peticiones coalescidas,
+    servidas desde caché y rechazadas con el circuito abierto."""
+    with _vuelos_lock:
+        return dict(_contadores)
+
+
+def _flock_con_plazo(f):
+    """flock exclusivo bloqueante, o por sondeo si hay un plazo activo."""
+    if plazo_restante() is None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            _comprobar_plazo()
+            time.sleep(0.05)
+
+
+def _directorio_privado():
+    """True si `SINGLEFLIGHT_DIR` es un directorio (no enlace) del usuario del
+    proceso sin permisos para nadie más. Si no, otro usuario podría dejar ahí
+    pickles que se deserializarían: se avisa una vez y no se usa."""
+    if _singleflight["dir_ok"] is None:
+        try:
+            os.makedirs(SINGLEFLIGHT_DIR, mode=0o700, exist_ok=True)
+            st = os.lstat(SINGLEFLIGHT_DIR)
+            ok = (stat.S_ISDIR(st.st_mode) and st.st_uid == _uid
+                  and stat.S_IMODE(st.st_mode) & 0o077 == 0)
+        except OSError:
+            ok = False
+        if not ok:
+            print(f"Aviso: {SINGLEFLIGHT_DIR} no es un directorio privado (0700) de este "
+                  f"usuario; consultas sin coalescencia entre workers")
+        _singleflight["dir_ok"] = ok
+    return _singleflight["dir_ok"]
+
+
+def _ejecutar_entre_workers(query, params, clave):
+    """Ejecuta bajo el flock de la consulta, reutilizando el resultado de
+    otro worker si se publicó mientras se esperaba."""
+    if fcntl is None or not _directorio_privado():
+        return _ejecutar(query, params), False
+    base = os.path.join(SINGLEFLIGHT_DIR, hashlib.sha1(clave.encode()).hexdigest())
+    marca, resultado = base + ".espera", base + ".pkl"
+    t_inicio = time.time()
+    with open(base + ".lock", "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Otro worker la está ejecutando: avisar y esperar a que termine
+            open(marca, "a").close()
+            _flock_con_plazo(f)
+            try:
+                if os.path.getmtime(resultado) >= t_inicio:
+                    return pd.read_pickle(resultado), True
+            except (OSError, EOFError, ValueError):
+                pass
+        try:
+            df = _ejecutar(query, params)
+            if os.path.exists(marca):
+                tmp = f"{resultado}.{os.getpid()}"
+                df.to_pickle(tmp)
+                os.replace(tmp, resultado)
+                os.remove(marca)
+            return df, False
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _consulta_coalescida(query, params, clave, guardar=True):
+    """Ejecuta (o espera) la consulta compartida y devuelve el DataFrame intacto.
+
+    El DataFrame devuelto no debe modificarse: se comparte con los demás
+    hilos y se guarda (si `guardar`) en la caché de `query_to_df`, que
+    entrega copias.
+    """
+    with _vuelos_lock:
+        vuelo = _vuelos.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = _vuelos[clave] = _Vuelo()
+        else:
+            vuelo.seguidores += 1
+            _contadores["coalescidas_hilo"] += 1
+
+    if not lider:
+        if not vuelo.hecho.wait(timeout=plazo_restante()):
+            raise PlazoAgotado("Plazo agotado esperando una consulta en curso")
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.df
+
+    df, error, de_otro_worker = None, None, False
+    try:
+        df, de_otro_worker = _ejecutar_entre_workers(query, params, clave)
+        _circuito.exito()
+        if guardar:
+            _guardar_en_cache(clave, df)
+        return df
+    except Exception as e:
+        error = e
+        if isinstance(e, ERRORES_CONEXION):
+            _circuito.fallo()
+        elif isinstance(e, PlazoAgotado):
+            _circuito.liberar_sondeo()   # sin veredicto: otra consulta podrá probar
+        else:
+            _circuito.exito()   # MySQL respondió (p. ej. error de SQL)
+        raise
+    finally:
+        with _vuelos_lock:
+            _vuelos.pop(clave, None)
+            if de_otro_worker:
+                _contadores["coalescidas_worker"] += 1
+            elif error is None:
+                _contadores["ejecuciones"] += 1
+        vuelo.df = df
+        vuelo.error = error
+        vuelo.hecho.set()
+
+
+# =============================================================================
+# STALE-WHILE-REVALIDATE + CIRCUIT BREAKER
+# =============================================================================
+# Cada resultado correcto se guarda en memoria. Mientras tenga menos de
+# SWR_FRESCURA_SEGUNDOS se sirve sin tocar MySQL; pasado ese tiempo se sirve
+# igualmente y se lanza una recarga en segundo plano. Solo la primera lectura
+# de cada consulta en el worker espera a MySQL.
+#
+# Si MySQL falla CIRCUITO_FALLOS veces seguidas por conexión/timeout, el
+# circuito se abre CIRCUITO_ESPERA_SEGUNDOS: no se lanzan consultas, se sirve
+# lo que haya en caché y las lecturas sin caché fallan al instante con
+# `BaseDatosNoDisponible` en lugar de bloquear el worker. Después se permite
+# una consulta de prueba; si va bien el circuito se cierra. Si la prueba no
+# informa en CIRCUITO_ESPERA_SEGUNDOS se da por perdida y se permite otra.
+#
+# La caché es LRU con como mucho CACHE_MAX_ENTRADAS resultados, y al guardar
+# se descartan los que llevan más de CACHE_MAX_EDAD_SEGUNDOS sin recargarse
+# (consultas que ya nadie pide; las que se leen se revalidan y rejuvenecen).
+
+SWR_FRESCURA_SEGUNDOS = float(os.environ.get("SWR_FRESCURA_SEGUNDOS", "60"))
+CACHE_MAX_ENTRADAS = int(os.environ.get("CACHE_MAX_ENTRADAS", "512"))
+CACHE_MAX_EDAD_SEGUNDOS = 10 * SWR_FRESCURA_SEGUNDOS
+CIRCUITO_FALLOS = 3
+CIRCUITO_ESPERA_SEGUNDOS = 30
+
+ERRORES_CONEXION = (OperationalError, InterfaceError, SATimeoutError)
+
+
+class BaseDatosNoDisponible(Exception):
+    """MySQL no responde y no hay datos en caché para la consulta."""
+
+
+class _Circuito:
+    """Circuit breaker sencillo: cerrado → abierto → semiabierto → cerrado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fallos = 0
+        self.abierto_hasta = 0.0
+        self.sondeando = False
+        self.sondeo_desde = 0.0
+
+    def permite(self):
+        with self._lock:
+            if self.fallos < CIRCUITO_FALLOS:
+                return True
+            ahora = time.time()
+            if ahora < self.abierto_hasta:
+                return False
+            # Una prueba que no informa en CIRCUITO_ESPERA_SEGUNDOS (hilo
+            # perdido, excepción no prevista) se da por caducada.
+            if self.sondeando and ahora - self.sondeo_desde < CIRCUITO_ESPERA_SEGUNDOS:
+                return False
+            self.sondeando = True   # semiabierto: una única consulta de prueba
+            self.sondeo_desde = ahora
+            return True
+
+    def exito(self):
+        with self._lock:
+            self.fallos = 0
+            self.sondeando = False
+
+    def liberar_sondeo(self):
+        """La consulta de prueba terminó sin decidir nada (p. ej. por plazo)."""
+        with self._lock:
+            self.sondeando = False
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            self.sondeando = False
+            if self.fallos >= CIRCUITO_FALLOS:
+                self.abierto_hasta = time.time() + CIRCUITO_ESPERA_SEGUNDOS
+
+    def estado(self):
+        with self._lock:
+            if self.fallos < CIRCUITO_FALLOS:
+                return "cerrado"
+            return "abierto" if time.time() < self.abierto_hasta else "semiabierto"
+
+
+_circuito = _Circuito()
+_cache = OrderedDict()
+_cache_purgada = {"ts": 0.0}
+_revalidando = set()
+_marca = threading.local()
+
+
+def estado_circuito():
+    return _circuito.estado()
+
+
+def iniciar_marca_datos():
+    """Empieza a registrar la antigüedad de los datos servidos en este hilo."""
+    _marca.ts = None
+
+
+def marca_datos():
+    """Hora (epoch) del dato más antiguo servido desde `iniciar_marca_datos`."""
+    return getattr(_marca, "ts", None)
+
+
+def anotar_marca(ts):
+    """Registra en este hilo un dato servido con fecha `ts` (epoch)."""
+    actual = getattr(_marca, "ts", None)
+    _marca.ts = ts if actual is None else min(actual, ts)
+
+
+def _guardar_en_cache(clave, df):
+    """Guarda el resultado como el más reciente y aplica los límites de la caché."""
+    ahora = time.time()
+    with _vuelos_lock:
+        _cache[clave] = {"df": df, "ts": ahora}
+        _cache.move_to_end(clave)
+        if ahora - _cache_purgada["ts"] >= SWR_FRESCURA_SEGUNDOS:
+            _cache_purgada["ts"] = ahora
+            for vieja in [c for c, e in _cache.items() if ahora - e["ts"] > CACHE_MAX_EDAD_SEGUNDOS]:
+                del _cache[vieja]
+        while len(_cache) > CACHE_MAX_ENTRADAS:
+            _cache.popitem(last=False)
+
+
+def _revalidar(query, params, clave):
+    """Recarga la consulta en un hilo aparte (una sola recarga por clave)."""
+    with _vuelos_lock:
+        if clave in _revalidando:
+            return
+        _revalidando.add(clave)
+
+    def _trabajo():
+        try:
+            if _circuito.permite():
+                _consulta_coalescida(query, params, clave)
+        except Exception as e:
+            print(f"Error revalidando consulta en segundo plano: {e}")
+        finally:
+            with _vuelos_lock:
+                _revalidando.discard(clave)
+
+    threading.Thread(target=_trabajo, daemon=True).start()
+
+
+def _reiniciar_tras_fork():
+    """Estado del proceso hijo tras un fork (background callbacks de Dash).
+
+    Los hilos del padre no existen en el hijo: sus vuelos en curso no
+    terminarían nunca y sus locks podrían haberse copiado tomados. Las
+    conexiones del pool siguen siendo del padre y no deben compartirse.
+    """
+    global _engine_lock, _vuelos_lock, _usuarios_lock
+    _engine_lock = threading.Lock()
+    _vuelos_lock = threading.Lock()
+    _usuarios_lock = threading.Lock()
+    _circuito._lock = threading.Lock()
+    _vuelos.clear()
+    _revalidando.clear()
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def query_to_df(query, params: dict = None, cache: bool = True) -> pd.DataFrame:
+    """Ejecuta una query y devuelve un DataFrame (copia propia del llamante).
+
+    `query` puede ser SQL literal (str) o una sentencia de `CONSULTAS` con sus
+    `params`. Sirve desde caché con revalidación en segundo plano y coalesce
+    las lecturas concurrentes idénticas (ver secciones anteriores).
+    Con `cache=False` (lecturas incrementales, cuyos parámetros cambian en
+    cada llamada) siempre consulta MySQL y no guarda el resultado; sigue
+    coalesciendo y respetando el circuit breaker.
+    """
+    clave = _clave_consulta(query, params)
+    with _vuelos_lock:
+        entrada = _cache.get(clave) if cache else None
+        if entrada is not None:
+            _cache.move_to_end(clave)
+    if entrada is not None:
+        obsoleta = time.time() - entrada["ts"] >= SWR_FRESCURA_SEGUNDOS
+        with _vuelos_lock:
+            _contadores["cache_obsoleta" if obsoleta else "cache_fresca"] += 1
+        if obsoleta:
+            _revalidar(query, params, clave)
+        anotar_marca(entrada["ts"])
+        return entrada["df"].copy()
+
+    _comprobar_plazo()
+    if not _circuito.permite():
+        with _vuelos_lock:
+            _contadores["rechazadas"] += 1
+        raise BaseDatosNoDisponible("Base de datos no disponible temporalmente")
+    df = _consulta_coalescida(query, params, clave, guardar=cache)
+    anotar_marca(time.time())
+    return df.copy()
+
+
+# =============================================================================
+# CONSULTAS PARAMETRIZADAS
+# =============================================================================
+# Sentencias con parámetros enlazados, construidas una sola vez al importar el
+# módulo. El texto SQL es siempre el mismo para cada consulta, de modo que
+# SQLAlchemy reutiliza la forma compilada (caché del engine) y el perfil de
+# `perfil_sql` las agrupa sin depender de los valores.
+
+_LOCALITIES_EXCLUIDAS = "('SIN ASIENTO', 'CERO', 'AREA 1906')"
+
+# Líneas de venta de hostelería tal y como llegan del TPV (una por producto
+# de cada pedido, con `id` creciente); las lee el modo en directo
+# (`directo.py`) antes de que el ETL reconstruya `pre_hosteleria_*`.
+# Nombre fijo: `migraciones.py` (versión 4) crea sus índices.
+HOSTELERIA_VENTAS = "slv_hosteleria_ventas"
+
+CONSULTAS = {
+    "partidos_temporada": text("""
+        SELECT * FROM slv_partidos
+        WHERE equipo_depor = '1'
+        AND id_temporada = :temporada
+        ORDER BY schedule DESC
+    """),
+    "abonados_totales": text(f"""
+        SELECT COUNT(*) as total_abonados
+        FROM slv_abonos
+        WHERE id_temporada = :temporada
+        AND locality NOT IN {_LOCALITIES_EXCLUIDAS}
+    """),
+    "abonados_por_sector": text(f"""
+        SELECT sector, COUNT(*) as total
+        FROM slv_abonos
+        WHERE id_temporada = :temporada
+        AND locality NOT IN {_LOCALITIES_EXCLUIDAS}
+        AND sector IN ('FONDO MARATHON', 'FONDO PABELLON', 'PREFERENCIA', 'TRIBUNA')
+        GROUP BY sector
+    """),
+    "abonados_por_sexo": text(f"""
+        SELECT s.gender, COUNT(*) as total
+        FROM slv_abonos ab
+        JOIN slv_socios s ON ab.ownerId = s.id
+        WHERE ab.id_temporada = :temporada
+        AND ab.locality NOT IN {_LOCALITIES_EXCLUIDAS}
+        GROUP BY s.gender
+    """),
+    "primeros_n_partidos_local": text("""
+        SELECT id FROM slv_partidos
+        WHERE t1_name = 'RC Deportivo'
+        AND id_temporada = :temporada
+        AND schedule >= :cutoff
+        ORDER BY schedule
+        LIMIT :n_partidos
+    """),
+    "partidos_local": text("""
+        SELECT id, schedule, t2_name, t1_name, id_temporada, dia_semana
+        FROM slv_partidos
+        WHERE equipo_depor = '901'
+        AND id_temporada = :temporada
+        AND t1_name = 'RC Deportivo'
+        ORDER BY schedule
+    """),
+    "ticketing": text("""
+        SELECT 
+            t.*,
+            p.schedule,
+            p.dia_semana,
+            p.t1_name,
+            p.t2_name,
+            p.result,
+            p.id_temporada
+        FROM slv_ticketing t
+        LEFT JOIN slv_partidos p ON t.id_partido = p.id
+        WHERE p.id IS NOT NULL
+    """),
+    "cesiones": text("""
+        SELECT 
+            c.*,
+            p.schedule,
+            p.dia_semana,
+            p.t1_name,
+            p.t2_name,
+            p.result,
+            p.id_temporada
+        FROM slv_cesiones c
+        LEFT JOIN slv_partidos p ON c.id_partido = p.id
+        WHERE p.id IS NOT NULL
+    """),
+    "asistencias": text(f"""
+        SELECT 
+            a.clave_unica,
+            a.hora_asistencia_abono,
+            a.id_partido,
+            a.condicion,
+            ab.sector,
+            ab.locality,
+            ab.cardId,
+            s.birthdate,
+            s.gender,
+            p.schedule,
+            p.t2_name,
+            p.t1_name,
+            p.id_temporada,
+            p.dia_semana,
+            p.result,
+            TIME(p.schedule) as hora_partido
+        FROM slv_asistencias a
+        JOIN slv_abonos ab ON a.clave_unica = ab.cardId
+        JOIN slv_socios s ON ab.ownerId = s.id
+        JOIN slv_partidos p ON a.id_partido = p.id
+        WHERE ab.locality NOT IN {_LOCALITIES_EXCLUIDAS}
+        AND p.equipo_depor = '901'
+    """),
+    "recaudacion_cesiones": text("""
+        SELECT 
+            t.id_partido,
+            SUM(t.rec_ces_vend) as rec_ces_vend,
+            p.schedule,
+            p.t1_name,
+            p.t2_name,
+            p.id_temporada,
+            p.dia_semana,
+            p.result
+        FROM slv_ticketing t
+        LEFT JOIN slv_partidos p ON t.id_partido = p.id
+        WHERE p.id IS NOT NULL
+        GROUP BY t.id_partido, p.schedule, p.t1_name, p.t2_name, p.id_temporada, p.dia_semana, p.result
+    """),
+    "ficha_partido": text(
+        "SELECT * FROM pre_ficha_partido WHERE id_partido = :id_partido LIMIT 1"
+    ),
+    "fichas_partidos": text(
+        "SELECT * FROM pre_ficha_partido WHERE id_partido IN :ids"
+    ).bindparams(bindparam("ids", expanding=True)),
+    "asistencias_llegadas": text(f"""
+        SELECT a.id_partido, a.clave_unica, a.hora_asistencia_abono,
+               ab.sector, ab.locality, p.schedule, TIME(p.schedule) AS hora_partido
+        FROM slv_asistencias a
+        JOIN slv_abonos ab ON a.clave_unica = ab.cardId
+        JOIN slv_partidos p ON a.id_partido = p.id
+        WHERE a.id_partido IN :ids
+        AND ab.locality NOT IN {_LOCALITIES_EXCLUIDAS}
+    """).bindparams(bindparam("ids", expanding=True)),
+    "asistencias_llegadas_desde": text(f"""
+        SELECT a.id_partido, a.clave_unica, a.hora_asistencia_abono,
+               ab.sector, ab.locality, p.schedule, TIME(p.schedule) AS hora_partido
+        FROM slv_asistencias a
+        JOIN slv_abonos ab ON a.clave_unica = ab.cardId
+        JOIN slv_partidos p ON a.id_partido = p.id
+        WHERE a.id_partido = :id_partido
+        AND a.hora_asistencia_abono >= :desde
+        AND ab.locality NOT IN {_LOCALITIES_EXCLUIDAS}
+    """),
+    "hosteleria_partido_en_curso": text(f"""
+        SELECT v.id_partido, p.t1_name, p.t2_name, p.schedule
+        FROM {HOSTELERIA_VENTAS} v
+        JOIN slv_partidos p ON v.id_partido = p.id
+        WHERE v.fecha >= NOW() - INTERVAL :horas HOUR
+        ORDER BY v.id DESC
+        LIMIT 1
+    """),
+    "hosteleria_ventas_desde": text(f"""
+        SELECT id, id_pedido, fecha, store_id, store_name, product_name,
+               payment_method, cantidad, importe
+        FROM {HOSTELERIA_VENTAS}
+        WHERE id_partido = :id_partido AND id > :desde
+        ORDER BY id
+        LIMIT :lote
+    """),
+}
 
 
 # =============================================================================
@@ -38,49 +710,23 @@ def query_to_df(query: str) -> pd.DataFrame:
 
 def get_ticketing_data():
     """Obtiene datos de ticketing con información de partidos."""
-    query = """
-    SELECT 
-        t.*,
-        p.schedule,
-        p.dia_semana,
-        p.t1_name,
-        p.t2_name,
-        p.result,
-        p.id_temporada
-    FROM slv_ticketing t
-    LEFT JOIN slv_partidos p ON t.id_partido = p.id
-    WHERE p.id IS NOT NULL
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["ticketing"])
 
 
 def get_cesiones_data():
     """Obtiene datos de cesiones con información de partidos."""
-    query = """
-    SELECT 
-        c.*,
-        p.schedule,
-        p.dia_semana,
-        p.t1_name,
-        p.t2_name,
-        p.result,
-        p.id_temporada
-    FROM slv_cesiones c
-    LEFT JOIN slv_partidos p ON c.id_partido = p.id
-    WHERE p.id IS NOT NULL
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["cesiones"])
 
 
 def get_partidos_temporada(temporada: str = None):
     """Obtiene partidos de una temporada."""
+    if temporada:
+        return query_to_df(CONSULTAS["partidos_temporada"], {"temporada": str(temporada)})
     query = """
     SELECT * FROM slv_partidos
     WHERE equipo_depor = '1'
+    ORDER BY schedule DESC
     """
-    if temporada:
-        query += f" AND id_temporada = '{temporada}'"
-    query += " ORDER BY schedule DESC"
     return query_to_df(query)
 
 
@@ -97,89 +743,40 @@ def get_temporadas():
 
 def get_asistencias_data():
     """Obtiene datos de asistencias con información de partidos, abonos y socios."""
-    query = """
-    SELECT 
-        a.clave_unica,
-        a.hora_asistencia_abono,
-        a.id_partido,
-        a.condicion,
-        ab.sector,
-        ab.locality,
-        ab.cardId,
-        s.birthdate,
-        s.gender,
-        p.schedule,
-        p.t2_name,
-        p.t1_name,
-        p.id_temporada,
-        p.dia_semana,
-        p.result,
-        TIME(p.schedule) as hora_partido
-    FROM slv_asistencias a
-    JOIN slv_abonos ab ON a.clave_unica = ab.cardId
-    JOIN slv_socios s ON ab.ownerId = s.id
-    JOIN slv_partidos p ON a.id_partido = p.id
-    WHERE ab.locality NOT IN ('SIN ASIENTO', 'CERO', 'AREA 1906')
-    AND p.equipo_depor = '901'
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["asistencias"])
+
+
+def get_asistencias_llegadas(ids):
+    """Entradas por torno de los partidos `ids` con sector, localidad y hora de
+    inicio (sin caché: se agregan una vez en `llegadas`)."""
+    return query_to_df(CONSULTAS["asistencias_llegadas"], {"ids": [int(i) for i in ids]},
+                       cache=False)
+
+
+def get_asistencias_llegadas_desde(id_partido: int, desde: str):
+    """Entradas por torno del partido desde la hora `desde` incluida (sin caché)."""
+    return query_to_df(CONSULTAS["asistencias_llegadas_desde"],
+                       {"id_partido": int(id_partido), "desde": desde}, cache=False)
 
 
 def get_abonados_totales(temporada: str = '2025'):
     """Obtiene el total de abonados de una temporada (excluyendo SIN ASIENTO, CERO, AREA 1906)."""
-    query = f"""
-    SELECT COUNT(*) as total_abonados 
-    FROM slv_abonos 
-    WHERE id_temporada = '{temporada}' 
-    AND locality NOT IN ('SIN ASIENTO', 'CERO', 'AREA 1906')
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["abonados_totales"], {"temporada": str(temporada)})
 
 
 def get_abonados_por_sector(temporada: str = '2025'):
     """Obtiene abonados por sector de una temporada."""
-    query = f"""
-    SELECT sector, COUNT(*) as total 
-    FROM slv_abonos 
-    WHERE id_temporada = '{temporada}' 
-    AND locality NOT IN ('SIN ASIENTO', 'CERO', 'AREA 1906')
-    AND sector IN ('FONDO MARATHON', 'FONDO PABELLON', 'PREFERENCIA', 'TRIBUNA')
-    GROUP BY sector
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["abonados_por_sector"], {"temporada": str(temporada)})
 
 
 def get_abonados_por_sexo(temporada: str = '2025'):
     """Obtiene desglose de abonados por sexo."""
-    query = f"""
-    SELECT s.gender, COUNT(*) as total
-    FROM slv_abonos ab
-    JOIN slv_socios s ON ab.ownerId = s.id
-    WHERE ab.id_temporada = '{temporada}'
-    AND ab.locality NOT IN ('SIN ASIENTO', 'CERO', 'AREA 1906')
-    GROUP BY s.gender
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["abonados_por_sexo"], {"temporada": str(temporada)})
 
 
 def get_recaudacion_cesiones():
     """Obtiene la recaudación por cesiones vendidas por partido."""
-    query = """
-    SELECT 
-        t.id_partido,
-        SUM(t.rec_ces_vend) as rec_ces_vend,
-        p.schedule,
-        p.t1_name,
-        p.t2_name,
-        p.id_temporada,
-        p.dia_semana,
-        p.result
-    FROM slv_ticketing t
-    LEFT JOIN slv_partidos p ON t.id_partido = p.id
-    WHERE p.id IS NOT NULL
-    GROUP BY t.id_partido, p.schedule, p.t1_name, p.t2_name, p.id_temporada, p.dia_semana, p.result
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["recaudacion_cesiones"])
 
 
 def get_primeros_n_partidos_local(n_partidos, temporada='2024'):
@@ -187,15 +784,11 @@ def get_primeros_n_partidos_local(n_partidos, temporada='2024'):
     # Excluir pretemporada (antes del 15 de agosto)
     year = int(temporada)
     cutoff = f"{year}-08-15"
-    query = f"""
-    SELECT id FROM slv_partidos 
-    WHERE t1_name = 'RC Deportivo' 
-    AND id_temporada = '{temporada}'
-    AND schedule >= '{cutoff}'
-    ORDER BY schedule
-    LIMIT {n_partidos}
-    """
-    df = query_to_df(query)
+    df = query_to_df(CONSULTAS["primeros_n_partidos_local"], {
+        "temporada": str(temporada),
+        "cutoff": cutoff,
+        "n_partidos": int(n_partidos),
+    })
     return [int(x) for x in df['id'].tolist()]
 
 
@@ -253,6 +846,18 @@ def get_pre_hosteleria_metodo_pago():
     return query_to_df("SELECT * FROM pre_hosteleria_metodo_pago ORDER BY schedule")
 
 
+def get_hosteleria_partido_en_curso(horas: int = 4):
+    """Partido de la última venta de hostelería de las últimas `horas` (o vacío)."""
+    return query_to_df(CONSULTAS["hosteleria_partido_en_curso"], {"horas": int(horas)})
+
+
+def get_hosteleria_ventas_desde(id_partido: int, desde: int, lote: int = 5000):
+    """Líneas de venta del partido con `id` mayor que `desde` (sin caché)."""
+    return query_to_df(CONSULTAS["hosteleria_ventas_desde"],
+                       {"id_partido": int(id_partido), "desde": int(desde), "lote": int(lote)},
+                       cache=False)
+
+
 def get_pre_asistencia_kpis():
     """KPIs pre-calculados de asistencia."""
     return query_to_df("SELECT * FROM pre_asistencia_kpis")
@@ -310,15 +915,7 @@ def get_pre_deportiendas_canal():
 
 def get_partidos_local(temporada: str = '2025'):
     """Obtiene partidos donde RC Deportivo juega de local."""
-    query = f"""
-    SELECT id, schedule, t2_name, t1_name, id_temporada, dia_semana
-    FROM slv_partidos
-    WHERE equipo_depor = '901'
-    AND id_temporada = '{temporada}'
-    AND t1_name = 'RC Deportivo'
-    ORDER BY schedule
-    """
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["partidos_local"], {"temporada": str(temporada)})
 
 
 # =============================================================================
@@ -353,8 +950,12 @@ def get_ficha_rivales_temp_actual():
 
 def get_ficha_partido(id_partido: int):
     """Devuelve la fila de pre_ficha_partido para un partido concreto."""
-    query = f"SELECT * FROM pre_ficha_partido WHERE id_partido = {int(id_partido)} LIMIT 1"
-    return query_to_df(query)
+    return query_to_df(CONSULTAS["ficha_partido"], {"id_partido": int(id_partido)})
+
+
+def get_fichas_partidos(ids):
+    """Devuelve las filas de pre_ficha_partido de varios partidos en una sola query."""
+    return query_to_df(CONSULTAS["fichas_partidos"], {"ids": [int(i) for i in ids]})
 
 
 # =============================================================================
@@ -494,6 +1095,26 @@ def init_users_table():
             ))
 
 
+_usuarios_lock = threading.Lock()
+_usuarios_intentado = False
+
+
+def asegurar_tabla_usuarios():
+    """Ejecuta `init_users_table` como mucho una vez por proceso.
+
+    Solo se llama en segundo plano al arrancar (ver `arranque.py`), así que
+    el DDL contra MySQL no bloquea la importación de la app ni los logins.
+    El intento queda registrado aunque falle: el error lo recoge quien llama
+    y no se repite el DDL en cada petición.
+    """
+    global _usuarios_intentado
+    with _usuarios_lock:
+        if _usuarios_intentado:
+            return
+        _usuarios_intentado = True
+        init_users_table()
+
+
 def validate_user(usuario: str, contrasena: str):
     """Valida credenciales. Devuelve dict con info del usuario o None."""
     engine = get_engine()
@@ -0,0 +1,110 @@
+"""
+Decodificación columnar de resultados
+=====================================
+Convierte el cursor DB-API de una consulta en un DataFrame leyendo por lotes
+(`fetchmany`) y copiando cada lote, columna a columna, en arrays NumPy ya
+reservados con el tipo de la columna. Evita la lista de `Row` de SQLAlchemy
+y la matriz intermedia de objetos que construyen `pd.read_sql` /
+`DataFrame.from_records`, que en las tablas `pre_*` anchas son la mayor
+parte del tiempo y del pico de memoria.
+
+El tipo de cada columna sale de `cursor.description` (tipos de campo de
+MySQL): DECIMAL/FLOAT/DOUBLE → float64 y enteros → int64. Un entero con NULL
+pasa a float64 y uno que no cabe en int64 a objeto (después uint64), igual
+que con `read_sql(coerce_float=True)`. El resto (texto, fechas, horas) se
+guarda como objeto y al final se infiere su tipo (datetime64, timedelta64...).
+
+El número de filas se toma de `cursor.rowcount` (pymysql lo conoce al
+ejecutar); si el driver no lo da (SQLite) se usa el de la última ejecución
+de la misma sentencia y, en su defecto, se amplía la reserva por duplicación.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from pymysql.constants import FIELD_TYPE
+
+TAMANO_LOTE = int(os.environ.get("DECODIFICADOR_LOTE", "5000"))
+
+_TIPOS_FLOAT = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+_TIPOS_INT = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG,
+              FIELD_TYPE.INT24, FIELD_TYPE.YEAR}
+# Si un lote no cabe en el tipo actual se pasa al siguiente
+_PROMOCION = {np.dtype(np.int64): np.dtype(np.float64), np.dtype(np.float64): np.dtype(object)}
+
+_filas_previstas = {}
+
+
+def _dtype_columna(type_code):
+    if type_code in _TIPOS_FLOAT:
+        return np.dtype(np.float64)
+    if type_code in _TIPOS_INT:
+        return np.dtype(np.int64)
+    return np.dtype(object)
+
+
+def _asignar(arrays, k, inicio, valores):
+    """Copia `valores` en arrays[k][inicio:...], promocionando el tipo si falla."""
+    fin = inicio + len(valores)
+    while True:
+        try:
+            arrays[k][inicio:fin] = valores
+            return
+        except OverflowError:
+            # BIGINT UNSIGNED fuera de int64: se deja a la inferencia final
+            arrays[k] = arrays[k].astype(object)
+        except (TypeError, ValueError):
+            arrays[k] = arrays[k].astype(_PROMOCION[arrays[k].dtype])
+
+
+def _ampliar(arrays, capacidad):
+    for k, arr in enumerate(arrays):
+        nuevo = np.empty(capacidad, dtype=arr.dtype)
+        nuevo[:len(arr)] = arr
+        arrays[k] = nuevo
+
+
+def decodificar(cursor, columnas=None, clave=None, tipos=None) -> pd.DataFrame:
+    """Lee todas las filas pendientes de `cursor` y devuelve un DataFrame.
+
+    `clave` (p. ej. el texto SQL) sirve para recordar el tamaño del resultado
+    y reservar de una vez cuando el driver no informa de `rowcount`.
+    `tipos` ({columna: dtype}) fija el tipo de columnas concretas cuando el
+    driver no lo informa en `cursor.description` (SQLite).
+    """
+    descripcion = cursor.description or []
+    columnas = list(columnas) if columnas is not None else [d[0] for d in descripcion]
+    tipos = tipos or {}
+    rowcount = getattr(cursor, "rowcount", -1)
+    capacidad = rowcount if rowcount is not None and rowcount >= 0 else _filas_previstas.get(clave, TAMANO_LOTE)
+    capacidad = max(int(capacidad), 1)
+    arrays = [np.empty(capacidad, dtype=np.dtype(tipos[d[0]]) if d[0] in tipos else _dtype_columna(d[1]))
+              for d in descripcion]
+
+    n = 0
+    while True:
+        lote = cursor.fetchmany(TAMANO_LOTE)
+        if not lote:
+            break
+        if n + len(lote) > capacidad:
+            capacidad = max(2 * capacidad, n + len(lote))
+            _ampliar(arrays, capacidad)
+        for k, valores in enumerate(zip(*lote)):
+            _asignar(arrays, k, n, valores)
+        n += len(lote)
+
+    if clave is not None:
+        _filas_previstas[clave] = n
+    if n == 0:
+        return pd.DataFrame(columns=columnas)
+
+    datos = {}
+    for k, arr in enumerate(arrays):
+        arr = arr[:n]
+        if arr.dtype == object:
+            arr = pd.Series(arr, copy=False).infer_objects()
+        datos[k] = arr
+    df = pd.DataFrame(datos)
+    df.columns = columnas
+    return df
@@ -0,0 +1,199 @@
+"""
+Hostelería en directo
+=====================
+Durante el partido las tablas `pre_hosteleria_*` no cambian hasta que el ETL
+las reconstruye. La sub-tab EN DIRECTO de /hosteleria lee en su lugar las
+líneas de venta del TPV (`database.HOSTELERIA_VENTAS`) de forma incremental:
+
+    - Cada sondeo pide las líneas con `id` mayor que la última vista menos
+      `VENTANA_IDS` (`get_hosteleria_ventas_desde`, sin caché), en lotes de
+      `LOTE`. Los `id` se asignan al insertar, pero las transacciones del
+      TPV pueden confirmarse en otro orden: releer esa ventana recoge las
+      líneas que aparecen por detrás del cursor, y las ya sumadas se
+      descartan por `id`.
+      Una línea que se hace visible más de `VENTANA_IDS` ids por detrás del
+      cursor no se cuenta hasta que el ETL reconstruye las `pre_*`.
+    - Las líneas nuevas se suman a acumulados en memoria por cantina,
+      producto, cantina × producto y método de pago; los pedidos se cuentan
+      una vez con conjuntos de `id_pedido`.
+    - Como mucho un sondeo a MySQL cada `INTERVALO_SEGUNDOS` por worker,
+      compartido por todas las pestañas. La versión del acumulado es el
+      número de líneas sumadas: crece igual en todos los workers (también con
+      las líneas que llegan tarde), así que el navegador solo recibe cambios
+      de un worker que va por delante de lo que ya tiene.
+
+El partido en curso es el de la última venta de las últimas
+`HOSTELERIA_DIRECTO_HORAS` horas. Los acumulados son por worker (cada uno
+lee el partido desde el principio la primera vez) y solo se conserva el del
+partido en curso. `HOSTELERIA_DIRECTO=0` desactiva el modo.
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from database import get_hosteleria_partido_en_curso, get_hosteleria_ventas_desde
+
+ACTIVO = os.environ.get("HOSTELERIA_DIRECTO", "1") != "0"
+INTERVALO_SEGUNDOS = float(os.environ.get("HOSTELERIA_DIRECTO_SEGUNDOS", "10"))
+HORAS = int(os.environ.get("HOSTELERIA_DIRECTO_HORAS", "4"))
+LOTE = 5000
+MAX_LOTES = 20   # por sondeo: al entrar a mitad de partido se pone al día en varios
+VENTANA_IDS = 1000   # ids por detrás del cursor que se releen en cada sondeo
+
+_lock = threading.Lock()
+_acumulados = {}
+
+
+class Acumulado:
+    """Totales de un partido, sumados lote a lote desde `ultimo_id`.
+
+    `recientes` son los ids ya sumados dentro de la ventana que se relee
+    (`VENTANA_IDS` por detrás de `ultimo_id`); `lineas` es la versión.
+    """
+
+    def __init__(self, id_partido):
+        self.id_partido = id_partido
+        self.ultimo_id = 0
+        self.lineas = 0
+        self.recientes = set()
+        self.ultima_venta = None
+        self.sondeado = float("-inf")
+        self.sondeando = False
+        self._lock = threading.Lock()
+        self._tablas = None
+        self.recaudacion = 0.0
+        self.unidades = 0.0
+        self.pedidos = set()
+        self.cantinas = {}            # (store_id, store_name) -> recaudación
+        self.productos = {}           # product_name -> [cantidad, recaudación, líneas]
+        self.producto_cantina = {}    # (store_name, product_name) -> [cantidad, recaudación]
+        self.metodos = {}             # payment_method -> [recaudación, {id_pedido}]
+
+    def sumar(self, lote):
+        """Suma las líneas de `lote` (columnas de `hosteleria_ventas_desde`)
+        que no se hayan sumado ya."""
+        lote = lote[~lote["id"].isin(self.recientes)]
+        if lote.empty:
+            return
+        lote = lote.assign(cantidad=pd.to_numeric(lote["cantidad"], errors="coerce").fillna(0),
+                           importe=pd.to_numeric(lote["importe"], errors="coerce").fillna(0))
+        por_cantina = lote.groupby(["store_id", "store_name"])["importe"].sum()
+        por_producto = lote.groupby("product_name").agg(
+            cantidad=("cantidad", "sum"), recaudacion=("importe", "sum"), lineas=("id", "size"))
+        por_cruce = lote.groupby(["store_name", "product_name"])[["cantidad", "importe"]].sum()
+        por_metodo = lote.groupby("payment_method").agg(
+            recaudacion=("importe", "sum"), pedidos=("id_pedido", "unique"))
+
+        with self._lock:
+            self.recaudacion += float(lote["importe"].sum())
+            self.unidades += float(lote["cantidad"].sum())
+            self.pedidos.update(lote["id_pedido"].unique().tolist())
+            for clave, importe in por_cantina.items():
+                self.cantinas[clave] = self.cantinas.get(clave, 0.0) + importe
+            for nombre, fila in zip(por_producto.index, por_producto.itertuples(index=False)):
+                acc = self.productos.setdefault(nombre, [0.0, 0.0, 0])
+                acc[0] += fila.cantidad
+                acc[1] += fila.recaudacion
+                acc[2] += fila.lineas
+            for clave, fila in zip(por_cruce.index, por_cruce.itertuples(index=False)):
+                acc = self.producto_cantina.setdefault(clave, [0.0, 0.0])
+                acc[0] += fila.cantidad
+                acc[1] += fila.importe
+            for metodo, fila in zip(por_metodo.index, por_metodo.itertuples(index=False)):
+                acc = self.metodos.setdefault(metodo, [0.0, set()])
+                acc[0] += fila.recaudacion
+                acc[1].update(fila.pedidos.tolist())
+            if int(lote["id"].max()) > self.ultimo_id:
+                self.ultimo_id = int(lote["id"].max())
+                self.ultima_venta = lote["fecha"].iloc[-1]
+            suelo = self.ultimo_id - VENTANA_IDS
+            self.recientes = {i for i in self.recientes if i > suelo}
+            self.recientes.update(i for i in lote["id"].tolist() if i > suelo)
+            self.lineas += len(lote)
+            self._tablas = None
+
+    def tablas(self):
+        """DataFrames con la forma de las `pre_hosteleria_*` de un solo partido.
+
+        Devuelve (lineas, {"cantina", "producto", "producto_cantina",
+        "metodo", "kpis"}); se construyen una vez por versión (`lineas`).
+        """
+        with self._lock:
+            if self._tablas is None or self._tablas[0] != self.lineas:
+                cantina = pd.DataFrame(
+                    [(sid, nombre, rec) for (sid, nombre), rec in self.cantinas.items()],
+                    columns=["store_id", "store_name", "recaudacion"])
+                producto = pd.DataFrame(
+                    [(nombre, *acc) for nombre, acc in self.productos.items()],
+                    columns=["product_name", "cantidad", "recaudacion", "n_pedidos"])
+                producto_cantina = pd.DataFrame(
+                    [(*clave, *acc) for clave, acc in self.producto_cantina.items()],
+                    columns=["store_name", "product_name", "cantidad", "recaudacion"])
+                metodo = pd.DataFrame(
+                    [(m, rec, len(pedidos)) for m, (rec, pedidos) in self.metodos.items()],
+                    columns=["payment_method", "recaudacion", "n_pedidos"])
+                kpis = {
+                    "recaudacion": self.recaudacion,
+                    "pedidos": len(self.pedidos),
+                    "unidades": self.unidades,
+                    "ultima_venta": self.ultima_venta,
+                }
+                self._tablas = (self.lineas, {
+                    "cantina": cantina, "producto": producto,
+                    "producto_cantina": producto_cantina, "metodo": metodo, "kpis": kpis,
+                })
+            return self._tablas
+
+
+# =============================================================================
+# SONDEO
+# =============================================================================
+
+def partido_en_curso():
+    """Dict con id_partido, t1_name, t2_name y schedule del partido en curso, o None."""
+    df = get_hosteleria_partido_en_curso(HORAS)
+    if df.empty:
+        return None
+    return df.iloc[0].to_dict()
+
+
+def actualizar(id_partido):
+    """Acumulado del partido tras leer las líneas nuevas, si toca sondear.
+
+    Si otro hilo ya está sondeando, o el último sondeo es de hace menos de
+    `INTERVALO_SEGUNDOS`, devuelve el acumulado tal cual.
+    """
+    with _lock:
+        acumulado = _acumulados.get(id_partido)
+        if acumulado is None:
+            _acumulados.clear()   # solo el partido en curso
+            acumulado = _acumulados[id_partido] = Acumulado(id_partido)
+        if acumulado.sondeando or time.monotonic() - acumulado.sondeado < INTERVALO_SEGUNDOS:
+            return acumulado
+        acumulado.sondeando = True
+    try:
+        desde = max(0, acumulado.ultimo_id - VENTANA_IDS)
+        for _ in range(MAX_LOTES):
+            lote = get_hosteleria_ventas_desde(id_partido, desde, LOTE)
+            acumulado.sumar(lote)
+            if len(lote) < LOTE:
+                break
+            desde = int(lote["id"].max())
+    finally:
+        with _lock:
+            acumulado.sondeando = False
+            acumulado.sondeado = time.monotonic()
+    return acumulado
+
+
+def _reiniciar_tras_fork():
+    global _lock
+    _lock = threading.Lock()
+    _acumulados.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
@@ -0,0 +1,248 @@
+"""
+Escudos optimizados
+===================
+Los escudos de `assets/Escudos` son PNG de 512-1000 px (hasta ~220 KB) que se
+muestran a tamaño de icono en las gráficas y en el navegador de escudos.
+Este módulo genera, una vez por versión de los originales:
+
+    - Variantes reducidas por tamaño de visualización (`TAMANOS`, a 2x para
+      pantallas de alta densidad), con `Image.thumbnail` de Pillow
+      (promedio por área, `BOX`) y guardadas con `optimize=True`.
+    - Un sprite con todos los escudos para el navegador de escudos: una sola
+      petición en lugar de una por rival.
+
+Cada fichero lleva el hash de su contenido en el nombre y se sirve desde
+`/escudos/<nombre>` con `Cache-Control: immutable`, así que el navegador no
+vuelve a pedirlo mientras no cambie el original.
+
+Requiere Pillow (requirements.txt); sin él se sirven los originales.
+Si falta el manifiesto o los originales han cambiado, la app lo regenera en
+segundo plano y mientras tanto sirve los originales de `/assets/Escudos`.
+
+Uso (paso de build):
+    python escudos.py
+    python escudos.py --salida /ruta/cache
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from flask import abort, send_from_directory
+
+import estaticos
+import manifiestos
+
+try:
+    from PIL import Image
+except ImportError:  # sin Pillow se sirven los originales
+    Image = None
+
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+DIR_FUENTE = os.path.join(DIR_BASE, "assets", "Escudos")
+DIR_SALIDA = os.environ.get("ESCUDOS_DIR", os.path.join(DIR_BASE, ".escudos"))
+MANIFIESTO = "manifiesto.json"
+RUTA = "/escudos"
+
+# Lado máximo en px de cada variante (2x el tamaño CSS con el que se muestra)
+TAMANOS = {
+    "icono": 64,     # checklist de partidos (30 px)
+    "grafica": 96,   # imágenes de layout en las gráficas de Plotly
+    "nav": 128,      # navegador de escudos (58 px)
+    "ficha": 256,    # cabecera de la ficha post-partido (130 px)
+}
+TAMANO_SPRITE = TAMANOS["nav"]
+COLUMNAS_SPRITE = 8
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_NOMBRE = re.compile(r"[a-z0-9-]+\.[0-9a-f]{12}\.png")
+
+
+# =============================================================================
+# IMÁGENES
+# =============================================================================
+
+def abrir(ruta):
+    """Carga el PNG `ruta` como imagen RGBA."""
+    with Image.open(ruta) as img:
+        return img.convert("RGBA")
+
+
+def reducir(img, lado):
+    """Copia de `img` con el lado mayor a `lado` como mucho (nunca amplía)."""
+    copia = img.copy()
+    copia.thumbnail((lado, lado), Image.Resampling.BOX)
+    return copia
+
+
+def escribir_png(img):
+    """PNG optimizado de `img` (RGB si es opaca)."""
+    if img.getextrema()[3][0] == 255:
+        img = img.convert("RGB")
+    salida = io.BytesIO()
+    img.save(salida, format="PNG", optimize=True)
+    return salida.getvalue()
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _slug(archivo):
+    base = unicodedata.normalize("NFKD", os.path.splitext(archivo)[0])
+    base = base.encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", "-", base).strip("-") or "escudo"
+
+
+def _originales(dir_fuente):
+    return sorted(f for f in os.listdir(dir_fuente) if f.lower().endswith(".png"))
+
+
+def _firma(dir_fuente, archivos):
+    """Hash de nombre + contenido de los originales y de los parámetros del build."""
+    h = hashlib.sha1(json.dumps([TAMANOS, COLUMNAS_SPRITE]).encode())
+    for archivo in archivos:
+        h.update(archivo.encode())
+        with open(os.path.join(dir_fuente, archivo), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _guardar(dir_salida, base, contenido):
+    nombre = f"{base}.{hashlib.sha256(contenido).hexdigest()[:12]}.png"
+    ruta = os.path.join(dir_salida, nombre)
+    if not os.path.exists(ruta):
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(contenido)
+        os.replace(tmp, ruta)
+    return nombre
+
+
+def construir(dir_fuente=DIR_FUENTE, dir_salida=DIR_SALIDA):
+    """Genera variantes + sprite en `dir_salida` y devuelve el manifiesto."""
+    archivos = _originales(dir_fuente)
+    manifiesto = {"firma": _firma(dir_fuente, archivos), "variantes": {}, "sprite": None,
+                  "bytes": {"originales": 0, "variantes": {t: 0 for t in TAMANOS}}}
+    if Image is None:
+        print("Aviso: Pillow no instalado; se sirven los escudos originales")
+        return manifiesto
+    os.makedirs(dir_salida, exist_ok=True)
+    celdas = []
+    for archivo in archivos:
+        ruta = os.path.join(dir_fuente, archivo)
+        try:
+            img = abrir(ruta)
+        except (OSError, ValueError) as e:
+            print(f"Escudo {archivo} no optimizado: {e}")
+            continue
+        manifiesto["bytes"]["originales"] += os.path.getsize(ruta)
+        base = _slug(archivo)
+        variantes = {}
+        for tamano, lado in TAMANOS.items():
+            contenido = escribir_png(reducir(img, lado))
+            variantes[tamano] = _guardar(dir_salida, f"{base}-{tamano}", contenido)
+            manifiesto["bytes"]["variantes"][tamano] += len(contenido)
+        manifiesto["variantes"][archivo] = variantes
+        celdas.append((archivo, reducir(img, TAMANO_SPRITE)))
+
+    if celdas:
+        columnas = min(COLUMNAS_SPRITE, len(celdas))
+        filas = math.ceil(len(celdas) / columnas)
+        sprite = Image.new("RGBA", (columnas * TAMANO_SPRITE, filas * TAMANO_SPRITE), (0, 0, 0, 0))
+        posiciones = {}
+        for i, (archivo, celda) in enumerate(celdas):
+            fila, col = divmod(i, columnas)
+            w, h = celda.size
+            y = fila * TAMANO_SPRITE + (TAMANO_SPRITE - h) // 2
+            x = col * TAMANO_SPRITE + (TAMANO_SPRITE - w) // 2
+            sprite.paste(celda, (x, y))
+            posiciones[archivo] = [col, fila]
+        contenido = escribir_png(sprite)
+        manifiesto["sprite"] = {"archivo": _guardar(dir_salida, "sprite", contenido),
+                                "columnas": columnas, "filas": filas, "celdas": posiciones}
+        manifiesto["bytes"]["sprite"] = len(contenido)
+
+    tmp = os.path.join(dir_salida, f"{MANIFIESTO}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(dir_salida, MANIFIESTO))
+    return manifiesto
+
+
+# =============================================================================
+# USO EN LA APP
+# =============================================================================
+
+_manifiesto = manifiestos.Manifiesto(
+    "escudos", os.path.join(DIR_SALIDA, MANIFIESTO),
+    lambda: _firma(DIR_FUENTE, _originales(DIR_FUENTE)), construir).obtener
+
+
+def url(archivo, tamano="grafica"):
+    """URL del escudo `archivo` (nombre en assets/Escudos) para `tamano`.
+
+    Devuelve la variante optimizada si existe y, si no, el original.
+    """
+    manifiesto = _manifiesto()
+    nombre = manifiesto and manifiesto["variantes"].get(archivo, {}).get(tamano)
+    return f"{RUTA}/{nombre}" if nombre else estaticos.url(f"Escudos/{archivo}")
+
+
+def estilo_sprite(archivo):
+    """Estilo CSS (background) para pintar `archivo` desde el sprite, o None."""
+    manifiesto = _manifiesto()
+    sprite = manifiesto and manifiesto.get("sprite")
+    celda = sprite and sprite["celdas"].get(archivo)
+    if not celda:
+        return None
+    (col, fila), columnas, filas = celda, sprite["columnas"], sprite["filas"]
+    pct = lambda i, n: f"{100 * i / (n - 1):.4f}%" if n > 1 else "0%"
+    return {
+        "backgroundImage": f"url({RUTA}/{sprite['archivo']})",
+        "backgroundSize": f"{columnas * 100}% {filas * 100}%",
+        "backgroundPosition": f"{pct(col, columnas)} {pct(fila, filas)}",
+    }
+
+
+def registrar(server):
+    """Añade la ruta `/escudos/<nombre>` al servidor Flask y prepara el manifiesto."""
+
+    @server.route(f"{RUTA}/<nombre>")
+    def servir_escudo(nombre):
+        if not _NOMBRE.fullmatch(nombre):
+            abort(404)
+        resp = send_from_directory(DIR_SALIDA, nombre, mimetype="image/png")
+        resp.headers["Cache-Control"] = CACHE_CONTROL
+        return resp
+
+    _manifiesto()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera las variantes optimizadas de los escudos")
+    parser.add_argument("--fuente", default=DIR_FUENTE, help="Carpeta de los PNG originales")
+    parser.add_argument("--salida", default=DIR_SALIDA, help="Carpeta de salida (ESCUDOS_DIR)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    manifiesto = construir(args.fuente, args.salida)
+    total = manifiesto["bytes"]
+    print(f"{len(manifiesto['variantes'])} escudos en {time.perf_counter() - t0:.1f} s → {args.salida}")
+    print(f"  originales: {total['originales'] / 1024:8.1f} KB")
+    for tamano, n in total["variantes"].items():
+        print(f"  {tamano:<10} {TAMANOS[tamano]:>4} px: {n / 1024:8.1f} KB")
+    if manifiesto["sprite"]:
+        print(f"  sprite {TAMANO_SPRITE} px:    {total['sprite'] / 1024:8.1f} KB")
+    return 0 if manifiesto["variantes"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
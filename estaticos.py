@@ -0,0 +1,232 @@
+"""
+Servido de estáticos (assets/)
+==============================
+Sustituye el servido por defecto de `/assets/*` de Dash/Flask:
+
+    - Cada fichero se identifica por el hash de su contenido. Las URL
+      versionadas (`?v=<hash>` de `url()` o `?m=<ts>` que añade Dash a los CSS)
+      se sirven con `Cache-Control: immutable` a un año; las demás con
+      `no-cache` + ETag, de modo que la revalidación cuesta un 304.
+    - Los ficheros de texto (CSS, JS, SVG, TTF...) se sirven precomprimidos en
+      gzip (y brotli si el paquete `brotli` está instalado) según
+      `Accept-Encoding`. Las variantes se generan una vez, en el build
+      (`python estaticos.py`) o en la primera petición, y se guardan en disco.
+    - En los CSS las referencias `url('/assets/...')` se reescriben a su URL
+      versionada, así `background.jpg` también queda en caché inmutable.
+
+Los cambios en `assets/` se detectan por mtime/tamaño (recarga en desarrollo).
+
+Uso (paso de build):
+    python estaticos.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import quote, unquote
+
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se sirve gzip
+    brotli = None
+
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+DIR_ASSETS = os.path.join(DIR_BASE, "assets")
+DIR_SALIDA = os.environ.get("ESTATICOS_DIR", os.path.join(DIR_BASE, ".estaticos"))
+PREFIJO = "/assets/"
+
+COMPRIMIBLES = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".ttf", ".otf", ".ico"}
+RATIO_MINIMO = 0.9  # solo se usa la variante comprimida si ahorra al menos un 10 %
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+
+_URL_CSS = re.compile(r"""url\(\s*(['"]?)(/assets/[^'")?#]+)\1\s*\)""")
+
+_lock = threading.Lock()
+_indice = {}  # ruta relativa -> entrada
+
+
+class _Entrada:
+    __slots__ = ("ruta", "firma", "hash", "contenido", "mimetype", "variantes")
+
+    def __init__(self, ruta, firma, contenido, mimetype):
+        self.ruta = ruta
+        self.firma = firma
+        self.contenido = contenido  # bytes solo si se ha reescrito (CSS)
+        self.hash = hashlib.sha256(contenido if contenido is not None else _leer(ruta)).hexdigest()[:12]
+        self.mimetype = mimetype
+        self.variantes = {}
+
+
+def _leer(ruta):
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def _firma(ruta):
+    st = os.stat(ruta)
+    return st.st_mtime_ns, st.st_size
+
+
+def _mimetype(ruta):
+    if ruta.endswith(".woff"):
+        return "font/woff"
+    if ruta.endswith(".woff2"):
+        return "font/woff2"
+    return mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+
+
+def _reescribir_css(contenido):
+    def sustituir(m):
+        relativa = unquote(m.group(2)[len(PREFIJO):])
+        return f"url('{url(relativa)}')" if _entrada(relativa) else m.group(0)
+    return _URL_CSS.sub(sustituir, contenido.decode("utf-8")).encode("utf-8")
+
+
+def _entrada(relativa):
+    """Entrada vigente de `relativa` (ruta bajo assets/) o None si no existe."""
+    ruta = os.path.normpath(os.path.join(DIR_ASSETS, relativa))
+    if not ruta.startswith(DIR_ASSETS + os.sep) or not os.path.isfile(ruta):
+        return None
+    firma = _firma(ruta)
+    entrada = _indice.get(relativa)
+    if entrada is not None and entrada.firma == firma:
+        return entrada
+    contenido = _reescribir_css(_leer(ruta)) if ruta.endswith(".css") else None
+    entrada = _Entrada(ruta, firma, contenido, _mimetype(ruta))
+    with _lock:
+        _indice[relativa] = entrada
+    return entrada
+
+
+def url(relativa):
+    """URL versionada por contenido de un fichero de assets/ (p. ej. 'Indice/Museo.png')."""
+    entrada = _entrada(relativa)
+    base = PREFIJO + quote(relativa)
+    return f"{base}?v={entrada.hash}" if entrada else base
+
+
+# =============================================================================
+# VARIANTES COMPRIMIDAS
+# =============================================================================
+
+def _codificadores():
+    cods = {"gzip": lambda d: gzip.compress(d, 9, mtime=0)}
+    if brotli is not None:
+        cods["br"] = lambda d: brotli.compress(d, quality=11)
+    return cods
+
+
+def _variante(entrada, codificacion):
+    """bytes comprimidos de `entrada` o None si no compensa."""
+    if codificacion in entrada.variantes:
+        return entrada.variantes[codificacion]
+    cache = os.path.join(DIR_SALIDA, f"{entrada.hash}.{codificacion}")
+    datos = None
+    if os.path.exists(cache):
+        datos = _leer(cache) or None
+    else:
+        original = entrada.contenido if entrada.contenido is not None else _leer(entrada.ruta)
+        datos = _codificadores()[codificacion](original)
+        if len(datos) > RATIO_MINIMO * len(original):
+            datos = None
+        try:
+            os.makedirs(DIR_SALIDA, exist_ok=True)
+            tmp = f"{cache}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(datos or b"")
+            os.replace(tmp, cache)
+        except OSError as e:
+            print(f"Aviso: no se pudo guardar {cache}: {e}")
+    entrada.variantes[codificacion] = datos
+    return datos
+
+
+def _comprimible(entrada):
+    return os.path.splitext(entrada.ruta)[1].lower() in COMPRIMIBLES
+
+
+# =============================================================================
+# SERVIDO
+# =============================================================================
+
+def responder(relativa):
+    """Respuesta Flask para `relativa` o None si no es un fichero de assets/."""
+    entrada = _entrada(relativa)
+    if entrada is None:
+        return None
+    versionada = request.args.get("v") == entrada.hash or "m" in request.args
+
+    codificacion, datos = None, None
+    if _comprimible(entrada):
+        ofrecidas = [c for c in ("br", "gzip") if c in _codificadores()]
+        codificacion = request.accept_encodings.best_match(ofrecidas)
+        datos = _variante(entrada, codificacion) if codificacion else None
+
+    if datos is not None:
+        resp = Response(datos, mimetype=entrada.mimetype)
+        resp.headers["Content-Encoding"] = codificacion
+        resp.set_etag(f"{entrada.hash}-{codificacion}")
+    elif entrada.contenido is not None:
+        resp = Response(entrada.contenido, mimetype=entrada.mimetype)
+        resp.set_etag(entrada.hash)
+    else:
+        resp = send_file(entrada.ruta, mimetype=entrada.mimetype, etag=entrada.hash,
+                         last_modified=entrada.firma[0] / 1e9)  # 304 y Range
+    if resp.status_code == 200 and not resp.direct_passthrough:
+        resp.last_modified = entrada.firma[0] / 1e9
+        resp = resp.make_conditional(request, accept_ranges=True)
+    if _comprimible(entrada):
+        resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = CACHE_INMUTABLE if versionada else CACHE_REVALIDAR
+    return resp
+
+
+def registrar(server):
+    """Atiende `/assets/*` antes que el blueprint de estáticos de Dash."""
+
+    @server.before_request
+    def servir_estatico():
+        if request.method not in ("GET", "HEAD") or not request.path.startswith(PREFIJO):
+            return None
+        return responder(request.path[len(PREFIJO):])
+
+
+def construir():
+    """Calcula hashes y variantes comprimidas de todo assets/ (paso de build)."""
+    n, original, comprimido = 0, 0, 0
+    for raiz, _, archivos in os.walk(DIR_ASSETS):
+        for archivo in archivos:
+            relativa = os.path.relpath(os.path.join(raiz, archivo), DIR_ASSETS).replace(os.sep, "/")
+            entrada = _entrada(relativa)
+            if entrada is None or not _comprimible(entrada):
+                continue
+            n += 1
+            tamano = len(entrada.contenido) if entrada.contenido is not None else entrada.firma[1]
+            original += tamano
+            variantes = [_variante(entrada, c) for c in _codificadores()]
+            comprimido += min([len(v) for v in variantes if v] or [tamano])
+    return n, original, comprimido
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomprime los estáticos de assets/")
+    parser.parse_args(argv)
+    t0 = time.perf_counter()
+    n, original, comprimido = construir()
+    print(f"{n} ficheros comprimibles en {time.perf_counter() - t0:.1f} s → {DIR_SALIDA} "
+          f"({'gzip + brotli' if brotli else 'gzip'})")
+    print(f"  {original / 1024:.1f} KB → {comprimido / 1024:.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
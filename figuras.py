@@ -0,0 +1,371 @@
+"""
+Compactación de figuras Plotly
+==============================
+Reduce el JSON de las figuras que devuelven los callbacks sin cambiar lo que
+se ve en pantalla:
+
+    - Plantilla: cada figura lleva su `layout.template` completo (~7,5 KB con
+      la plantilla `plotly`). Se deja solo lo que la figura usa (valores por
+      defecto de sus tipos de traza, sin polar/ternary/scene/geo/mapbox ni
+      escalas de color si no las necesita).
+    - Estilo compartido: los atributos idénticos en todas las trazas de un
+      tipo (textfont, marker.line...) y en todas las imágenes, formas o
+      anotaciones del layout (xref, sizex, yanchor...) se suben a la
+      plantilla (`data.<tipo>`, `imagedefaults`, `shapedefaults`,
+      `annotationdefaults`) en lugar de repetirse en cada elemento.
+    - Arrays numéricos redondeados a precisión de pantalla (`DECIMALES`, con
+      al menos `CIFRAS` significativas) y enteros sin `.0`. Los escalares
+      float del layout (rangos, posiciones) a `CIFRAS_LAYOUT` significativas.
+    - Arrays repetidos: `hovertext` igual a `text` se elimina (o se usa
+      `%{text}` en el hovertemplate), y los arrays de estilo con el mismo
+      valor en todos los puntos pasan a escalar.
+    - Opcional (`FIGURAS_B64=1`): arrays numéricos como typed arrays base64
+      (`{"dtype", "bdata"}`, plotly.js >= 2.28) cuando ocupan menos.
+
+Se aplica a la salida de los callbacks de página (`con_marca_datos`), a los
+paneles de `paneles.renderizar` y a los callbacks decorados con
+`@figuras_compactas`. `FIGURAS_COMPACTAS=0` lo desactiva.
+"""
+
+import base64
+import copy
+import json
+import math
+import os
+from functools import wraps
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from dash import dcc
+from dash.development.base_component import Component
+
+ACTIVO = os.environ.get("FIGURAS_COMPACTAS", "1") != "0"
+BASE64 = os.environ.get("FIGURAS_B64", "0") == "1"
+
+DECIMALES = 2
+CIFRAS = 4
+CIFRAS_LAYOUT = 6
+
+# Atributos "arrayOk" de estilo que pueden pasar a escalar si son uniformes
+_ESTILO_POR_PUNTO = {
+    ("text",), ("hovertext",), ("textposition",), ("hovertemplate",), ("texttemplate",),
+    ("width",), ("opacity",), ("pull",),
+    ("marker", "color"), ("marker", "opacity"), ("marker", "size"), ("marker", "symbol"),
+    ("marker", "line", "color"), ("marker", "line", "width"),
+    ("textfont", "color"), ("textfont", "size"), ("textfont", "family"),
+}
+# Atributos de datos: se redondean pero nunca se suben a la plantilla
+_DATOS = {"x", "y", "z", "values", "labels", "ids", "customdata", "text", "hovertext",
+          "base", "offset", "width", "lat", "lon", "r", "theta", "parents", "source", "target"}
+_SUBPLOTS = {"polar": None, "ternary": None, "scene": None, "geo": None, "mapbox": None}
+_ESCALAS = {"heatmap", "contour", "histogram2d", "histogram2dcontour", "surface",
+            "choropleth", "densitymapbox"}
+_ELEMENTOS = {"images": "imagedefaults", "shapes": "shapedefaults",
+              "annotations": "annotationdefaults"}
+_DTYPES_B64 = [("i1", np.int8), ("u1", np.uint8), ("i2", np.int16), ("u2", np.uint16),
+               ("i4", np.int32), ("u4", np.uint32)]
+
+_plantillas = {}
+
+
+# =============================================================================
+# NÚMEROS
+# =============================================================================
+
+def _redondear_array(arr):
+    """Redondea a precisión de pantalla; enteros exactos pasan a int64."""
+    finitos = arr[np.isfinite(arr)]
+    if not len(finitos):
+        return arr
+    maximo = float(np.abs(finitos).max())
+    decimales = DECIMALES
+    if 0 < maximo:
+        decimales = max(DECIMALES, CIFRAS - 1 - math.floor(math.log10(maximo)))
+    out = np.round(arr, decimales)
+    if len(finitos) == len(arr) and np.array_equal(out, np.trunc(out)) and maximo < 2 ** 53:
+        return out.astype(np.int64)
+    return out
+
+
+def _redondear_escalar(v):
+    if not isinstance(v, float) or not math.isfinite(v) or v == 0:
+        return v
+    r = round(v, CIFRAS_LAYOUT - 1 - math.floor(math.log10(abs(v))))
+    return int(r) if r == int(r) and abs(r) < 2 ** 53 else r
+
+
+def _numerico(v):
+    """ndarray numérico (int/float) de `v` o None."""
+    if isinstance(v, np.ndarray):
+        arr = v
+    elif isinstance(v, (list, tuple)) and v and not isinstance(v[0], (str, dict, list, tuple)):
+        try:
+            arr = np.asarray(v)
+        except (ValueError, TypeError):
+            return None
+    else:
+        return None
+    if arr.dtype.kind == "f" or (arr.dtype.kind in "iu" and arr.ndim):
+        return arr
+    return None
+
+
+def _b64(arr):
+    """Typed array base64 de plotly.js si ocupa menos que la lista JSON."""
+    if arr.ndim != 1 or not len(arr):
+        return arr
+    if arr.dtype.kind in "iu":
+        lo, hi = int(arr.min()), int(arr.max())
+        dtype = next((c, t) for c, t in _DTYPES_B64 + [("f8", np.float64)]
+                     if c == "f8" or (np.iinfo(t).min <= lo and hi <= np.iinfo(t).max))
+    else:
+        dtype = ("f8", np.float64)
+    bdata = base64.b64encode(arr.astype(dtype[1]).tobytes()).decode("ascii")
+    if len(bdata) + 30 >= len(json.dumps(arr.tolist())):
+        return arr
+    return {"dtype": dtype[0], "bdata": bdata}
+
+
+def _compactar_numeros(d, datos):
+    """Redondea en sitio los arrays (y escalares si `not datos`) de un dict."""
+    for k, v in list(d.items()):
+        if isinstance(v, dict):
+            _compactar_numeros(v, datos)
+            continue
+        if isinstance(v, list) and v and isinstance(v[0], dict):
+            for item in v:
+                _compactar_numeros(item, datos)
+            continue
+        arr = _numerico(v)
+        if arr is not None:
+            arr = _redondear_array(arr.astype(np.float64)) if arr.dtype.kind == "f" else arr
+            d[k] = _b64(arr) if BASE64 and datos else arr
+        elif not datos:
+            d[k] = _redondear_escalar(v)
+
+
+# =============================================================================
+# ARRAYS REPETIDOS Y ESTILO COMPARTIDO
+# =============================================================================
+
+def _obtener(d, ruta):
+    for k in ruta:
+        if not isinstance(d, dict) or k not in d:
+            return None
+        d = d[k]
+    return d
+
+
+def _fijar(d, ruta, valor):
+    for k in ruta[:-1]:
+        d = d[k]
+    d[ruta[-1]] = valor
+
+
+def _uniforme(v):
+    """Valor único si todos los elementos de `v` son iguales (y no nulos)."""
+    if isinstance(v, np.ndarray):
+        if v.ndim != 1 or not len(v) or v.dtype.kind not in "iufUS":
+            return None
+        return v[0].item() if (v == v[0]).all() else None
+    if isinstance(v, (list, tuple)) and v and all(x is not None for x in v):
+        primero = v[0]
+        if isinstance(primero, (str, int, float)) and all(x == primero for x in v):
+            return primero
+    return None
+
+
+def _deduplicar_traza(traza):
+    plantilla = traza.get("hovertemplate")
+    text, hovertext = traza.get("text"), traza.get("hovertext")
+    if hovertext is not None and text is not None and _iguales(text, hovertext):
+        if isinstance(plantilla, str):
+            traza["hovertemplate"] = plantilla.replace("%{hovertext}", "%{text}")
+        del traza["hovertext"]
+    elif hovertext is not None and isinstance(plantilla, str) and "%{hovertext}" not in plantilla:
+        del traza["hovertext"]  # con hovertemplate, hovertext no se muestra
+    for ruta in _ESTILO_POR_PUNTO:
+        v = _obtener(traza, ruta)
+        unico = _uniforme(v) if v is not None else None
+        if unico is not None and not (ruta == ("marker", "color") and not isinstance(unico, str)):
+            _fijar(traza, ruta, unico)
+
+
+def _iguales(a, b):
+    a = a.tolist() if isinstance(a, np.ndarray) else list(a) if isinstance(a, (list, tuple)) else a
+    b = b.tolist() if isinstance(b, np.ndarray) else list(b) if isinstance(b, (list, tuple)) else b
+    return a == b
+
+
+def _hojas(d, prefijo=()):
+    """{ruta: valor} de las hojas escalares de un dict anidado."""
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_hojas(v, prefijo + (k,)))
+        elif isinstance(v, (str, int, float, bool)) or v is None:
+            out[prefijo + (k,)] = v
+    return out
+
+
+def _comunes(elementos, excluir=()):
+    """Hojas con el mismo valor en todos los `elementos` (≥ 2)."""
+    if len(elementos) < 2:
+        return {}
+    comunes = _hojas(elementos[0])
+    for e in elementos[1:]:
+        hojas = _hojas(e)
+        comunes = {r: v for r, v in comunes.items() if r in hojas and hojas[r] == v}
+        if not comunes:
+            return {}
+    return {r: v for r, v in comunes.items() if r[0] not in excluir}
+
+
+def _quitar(d, ruta):
+    for k in ruta[:-1]:
+        d = d[k]
+    d.pop(ruta[-1], None)
+
+
+def _poner(d, ruta, valor):
+    for k in ruta[:-1]:
+        d = d.setdefault(k, {})
+    d[ruta[-1]] = valor
+
+
+def _podar_vacios(d):
+    for k in [k for k, v in d.items() if isinstance(v, dict)]:
+        _podar_vacios(d[k])
+        if not d[k]:
+            del d[k]
+
+
+def _subir_a_plantilla(items, destino, excluir=()):
+    comunes = _comunes(items, excluir)
+    for ruta, valor in comunes.items():
+        _poner(destino, ruta, valor)
+        for item in items:
+            _quitar(item, ruta)
+    for item in items:
+        _podar_vacios(item)
+
+
+# =============================================================================
+# PLANTILLA
+# =============================================================================
+
+def _plantilla_base(nombre):
+    if nombre not in _plantillas:
+        _plantillas[nombre] = pio.templates[nombre].to_plotly_json()
+    return _plantillas[nombre]
+
+
+def _recortar(actual, tipos, subplots, usa_escala):
+    return {"data": {t: v for t, v in actual.get("data", {}).items() if t in tipos},
+            "layout": {k: v for k, v in actual.get("layout", {}).items()
+                       if not (k in _SUBPLOTS and k not in subplots)
+                       and not (k in ("colorscale", "coloraxis") and not usa_escala)}}
+
+
+def _plantilla(figura):
+    """Plantilla mínima equivalente para `figura` (dict), como copia editable."""
+    layout = figura["layout"]
+    trazas = figura["data"]
+    tipos = frozenset(t.get("type", "scatter") for t in trazas)
+    subplots = frozenset(k for k in _SUBPLOTS if k in layout)
+    usa_escala = (bool(tipos & _ESCALAS) or "coloraxis" in layout
+                  or any(_numerico(_obtener(t, ("marker", "color"))) is not None
+                         or "colorscale" in t.get("marker", {}) for t in trazas))
+    actual = layout.get("template")
+    if actual is not None:
+        return json.loads(json.dumps(_recortar(actual, tipos, subplots, usa_escala)))
+    nombre = pio.templates.default
+    if not isinstance(nombre, str) or "+" in nombre or nombre not in pio.templates:
+        return None
+    # Las plantillas registradas se recortan una vez por combinación de uso
+    clave = (nombre, tipos, subplots, usa_escala)
+    if clave not in _plantillas:
+        _plantillas[clave] = json.dumps(_recortar(_plantilla_base(nombre), tipos, subplots,
+                                                  usa_escala))
+    return json.loads(_plantillas[clave])
+
+
+def compactar_figura(figura):
+    """Devuelve el dict compactado de `figura` (go.Figure o dict)."""
+    if isinstance(figura, go.Figure):
+        figura = figura.to_plotly_json()
+    elif isinstance(figura, dict):
+        figura = copy.deepcopy(figura)
+        figura.setdefault("data", [])
+        figura.setdefault("layout", {})
+    else:
+        return figura
+    plantilla = _plantilla(figura)
+    layout = figura["layout"]
+
+    for traza in figura["data"]:
+        _compactar_numeros(traza, datos=True)
+        _deduplicar_traza(traza)
+
+    if plantilla is not None:
+        por_tipo = {}
+        for traza in figura["data"]:
+            por_tipo.setdefault(traza.get("type", "scatter"), []).append(traza)
+        for tipo, trazas in por_tipo.items():
+            base = plantilla["data"].setdefault(tipo, [{"type": tipo}])
+            if len(base) == 1:
+                _subir_a_plantilla(trazas, base[0], excluir=_DATOS | {"name", "type", "uid", "xaxis", "yaxis",
+                                                                       "legendgroup", "offsetgroup"})
+        for clave, defecto in _ELEMENTOS.items():
+            items = layout.get(clave)
+            if isinstance(items, (list, tuple)) and len(items) > 1:
+                items = layout[clave] = [dict(i) for i in items]
+                _subir_a_plantilla(items, plantilla["layout"].setdefault(defecto, {}),
+                                   excluir={"x", "y", "text", "source", "type",
+                                           "x0", "x1", "y0", "y1", "path"})
+        layout["template"] = plantilla
+
+    _compactar_numeros({k: v for k, v in layout.items() if k != "template"}, datos=False)
+    for k, v in list(layout.items()):
+        if k != "template" and not isinstance(v, (dict, list)):
+            layout[k] = _redondear_escalar(v)
+    return figura
+
+
+# =============================================================================
+# SALIDA DE CALLBACKS
+# =============================================================================
+
+def compactar(salida):
+    """Compacta las figuras que haya en la salida de un callback
+    (figuras sueltas, dcc.Graph y árboles de componentes)."""
+    if not ACTIVO:
+        return salida
+    if isinstance(salida, go.Figure) or (isinstance(salida, dict) and "data" in salida
+                                         and "layout" in salida):
+        return compactar_figura(salida)
+    if isinstance(salida, dcc.Graph):
+        # Solo go.Figure: un dict dentro de un dcc.Graph ya viene compactado
+        # (p. ej. de `paneles._a_componente`)
+        if isinstance(getattr(salida, "figure", None), go.Figure):
+            salida.figure = compactar_figura(salida.figure)
+        return salida
+    if isinstance(salida, Component):
+        hijos = getattr(salida, "children", None)
+        if hijos is not None:
+            salida.children = compactar(hijos)
+        return salida
+    if isinstance(salida, list):
+        return [compactar(x) for x in salida]
+    if isinstance(salida, tuple):
+        return tuple(compactar(x) for x in salida)
+    return salida
+
+
+def figuras_compactas(func):
+    """Decorador de callbacks: compacta las figuras de su salida."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return compactar(func(*args, **kwargs))
+    return wrapper
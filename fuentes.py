@@ -0,0 +1,238 @@
+"""
+Tipografías corporativas optimizadas
+====================================
+Los TTF de Commissioner Flair y Barlow Condensed pesan 100-200 KB por peso y
+se descargan antes del primer pintado. Este módulo genera, una vez por
+versión de los originales, un subconjunto WOFF2 de cada peso usado con
+`fontTools.subset`:
+
+    - Solo se conservan los glifos de `CARACTERES` (latín básico, Latin-1 con
+      las letras del español, puntuación tipográfica, €, flechas...) más los
+      que alcanzan sus sustituciones GSUB (ligaduras, alternativas de
+      `calt`...) y los componentes de glifos compuestos; se eliminan los
+      nombres de glifo y `DSIG`.
+    - Se empaqueta en WOFF2 (Brotli).
+
+Los ficheros llevan el hash del contenido en el nombre y se sirven desde
+`/fuentes/<nombre>` con `Cache-Control: immutable`. Las reglas `@font-face`
+(con `unicode-range` y `font-display: swap`) y los `<link rel="preload">` de
+`PRECARGAR` se insertan en el `<head>` del index de Dash. Si falta el
+manifiesto se regenera en segundo plano y mientras tanto se usan los TTF.
+
+Requiere `fonttools[woff]` y `brotli` (requirements.txt); sin ellos no se
+genera nada y se sirven los TTF.
+
+Uso (paso de build):
+    python fuentes.py
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from flask import abort, send_from_directory
+
+import estaticos
+import manifiestos
+
+try:
+    from fontTools import subset
+except ImportError:  # dependencia de build: sin ella se sirven los TTF
+    subset = None
+
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+DIR_TIPOGRAFIAS = os.path.join(DIR_BASE, "assets", "MATERIAL", "TIPOGRAFIAS")
+DIR_SALIDA = os.environ.get("FUENTES_DIR", os.path.join(DIR_BASE, ".fuentes"))
+MANIFIESTO = "manifiesto.json"
+RUTA = "/fuentes"
+
+# (familia, peso, ruta relativa a TIPOGRAFIAS) de los pesos usados en styles.css
+FUENTES = [
+    ("Commissioner Flair", 400, "Commissioner-Flair/ttf/CommissionerFlair-Regular.ttf"),
+    ("Commissioner Flair", 500, "Commissioner-Flair/ttf/CommissionerFlair-Medium.ttf"),
+    ("Commissioner Flair", 600, "Commissioner-Flair/ttf/CommissionerFlair-SemiBold.ttf"),
+    ("Commissioner Flair", 700, "Commissioner-Flair/ttf/CommissionerFlair-Bold.ttf"),
+    ("Barlow Condensed", 500, "Barlow_Condensed/BarlowCondensed-Medium.ttf"),
+    ("Barlow Condensed", 600, "Barlow_Condensed/BarlowCondensed-SemiBold.ttf"),
+    ("Barlow Condensed", 700, "Barlow_Condensed/BarlowCondensed-Bold.ttf"),
+]
+# Pesos que se piden antes del CSS: cuerpo de texto y cabecera/KPIs
+PRECARGAR = [("Commissioner Flair", 400), ("Barlow Condensed", 700)]
+
+# Rangos Unicode conservados (inclusive)
+CARACTERES = [
+    (0x0020, 0x007E),  # latín básico
+    (0x00A0, 0x00FF),  # Latin-1: á é í ó ú ñ ü ¿ ¡ º ª · × ÷ ...
+    (0x0152, 0x0153),  # Œ œ
+    (0x2010, 0x2027),  # guiones, comillas tipográficas, •, …
+    (0x2030, 0x2030),  # ‰
+    (0x2039, 0x203A),  # ‹ ›
+    (0x20AC, 0x20AC),  # €
+    (0x2122, 0x2122),  # ™
+    (0x2190, 0x2195),  # flechas
+    (0x2212, 0x2212),  # −
+    (0x2248, 0x2248),  # ≈
+    (0x2260, 0x2265),  # ≠ ≤ ≥
+    (0x25B2, 0x25B2),  # ▲
+    (0x25BC, 0x25BC),  # ▼
+]
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_NOMBRE = re.compile(r"[A-Za-z0-9-]+\.[0-9a-f]{12}\.woff2")
+FORMATO = "woff2"
+
+
+# =============================================================================
+# SUBCONJUNTO
+# =============================================================================
+
+def _codepoints():
+    return [cp for ini, fin in CARACTERES for cp in range(ini, fin + 1)]
+
+
+def _opciones():
+    opciones = subset.Options()
+    opciones.flavor = FORMATO
+    opciones.layout_features = ["*"]   # todas las features: ligaduras, calt, kern...
+    opciones.glyph_names = False
+    opciones.notdef_outline = True
+    return opciones
+
+
+def subconjunto(ruta, codepoints=None):
+    """Bytes WOFF2 de la fuente `ruta` con solo los glifos de `codepoints`
+    (por defecto `CARACTERES`) y los que alcanzan sus sustituciones GSUB."""
+    opciones = _opciones()
+    fuente = subset.load_font(ruta, opciones, dontLoadGlyphNames=True)
+    try:
+        subsetter = subset.Subsetter(options=opciones)
+        subsetter.populate(unicodes=codepoints or _codepoints())
+        subsetter.subset(fuente)
+        salida = io.BytesIO()
+        subset.save_font(fuente, salida, opciones)
+    finally:
+        fuente.close()
+    return salida.getvalue()
+
+
+def _unicode_range():
+    return ", ".join(f"U+{ini:04X}" if ini == fin else f"U+{ini:04X}-{fin:04X}" for ini, fin in CARACTERES)
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _firma(dir_fuente):
+    h = hashlib.sha1(json.dumps([FORMATO, FUENTES, CARACTERES]).encode())
+    for _, _, ruta in FUENTES:
+        with open(os.path.join(dir_fuente, ruta), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def construir(dir_fuente=DIR_TIPOGRAFIAS, dir_salida=DIR_SALIDA):
+    """Genera los WOFF2 en `dir_salida` y devuelve el manifiesto."""
+    manifiesto = {"firma": _firma(dir_fuente), "fuentes": []}
+    if subset is None:
+        print("Aviso: fonttools no instalado; se sirven las tipografías TTF")
+        return manifiesto
+    os.makedirs(dir_salida, exist_ok=True)
+    for familia, peso, ruta in FUENTES:
+        origen = os.path.join(dir_fuente, ruta)
+        try:
+            contenido = subconjunto(origen)
+        except Exception as e:  # fuente dañada, brotli ausente...
+            print(f"Fuente {ruta} no optimizada: {e}")
+            continue
+        base = re.sub(r"[^A-Za-z0-9]+", "-", os.path.splitext(os.path.basename(ruta))[0])
+        nombre = f"{base}.{hashlib.sha256(contenido).hexdigest()[:12]}.{FORMATO}"
+        destino = os.path.join(dir_salida, nombre)
+        if not os.path.exists(destino):
+            tmp = f"{destino}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(contenido)
+            os.replace(tmp, destino)
+        manifiesto["fuentes"].append({"familia": familia, "peso": peso, "archivo": nombre,
+                                      "bytes_original": os.path.getsize(origen), "bytes": len(contenido)})
+    tmp = os.path.join(dir_salida, f"{MANIFIESTO}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(dir_salida, MANIFIESTO))
+    return manifiesto
+
+
+# =============================================================================
+# USO EN LA APP
+# =============================================================================
+
+_manifiesto = manifiestos.Manifiesto(
+    "fuentes", os.path.join(DIR_SALIDA, MANIFIESTO),
+    lambda: _firma(DIR_TIPOGRAFIAS), construir).obtener
+
+
+def cabecera_html():
+    """`<link rel="preload">` + `<style>` con las reglas @font-face vigentes."""
+    manifiesto = _manifiesto()
+    optimizadas = {(f["familia"], f["peso"]): f["archivo"] for f in (manifiesto or {}).get("fuentes", [])}
+    enlaces, reglas = [], []
+    for familia, peso, ruta in FUENTES:
+        archivo = optimizadas.get((familia, peso))
+        if archivo:
+            url, formato, rango = f"{RUTA}/{archivo}", FORMATO, f"\n    unicode-range: {_unicode_range()};"
+            if (familia, peso) in PRECARGAR:
+                enlaces.append(f'<link rel="preload" href="{url}" as="font" type="font/{FORMATO}" crossorigin>')
+        else:
+            url, formato, rango = estaticos.url(f"MATERIAL/TIPOGRAFIAS/{ruta}"), "truetype", ""
+        reglas.append(f"@font-face {{\n    font-family: '{familia}';\n"
+                      f"    src: url('{url}') format('{formato}');\n"
+                      f"    font-weight: {peso};\n    font-style: normal;\n"
+                      f"    font-display: swap;{rango}\n}}")
+    return "\n".join(enlaces + ["<style>", *reglas, "</style>"])
+
+
+def registrar(app):
+    """Ruta `/fuentes/<nombre>` + reglas @font-face y preloads en el index de Dash."""
+
+    @app.server.route(f"{RUTA}/<nombre>")
+    def servir_fuente(nombre):
+        if not _NOMBRE.fullmatch(nombre):
+            abort(404)
+        resp = send_from_directory(DIR_SALIDA, nombre, mimetype=f"font/{FORMATO}")
+        resp.headers["Cache-Control"] = CACHE_CONTROL
+        return resp
+
+    interpolar = app.interpolate_index
+
+    def interpolate_index(**kwargs):
+        kwargs["css"] = cabecera_html() + "\n" + kwargs.get("css", "")
+        return interpolar(**kwargs)
+
+    app.interpolate_index = interpolate_index
+    _manifiesto()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los subconjuntos WOFF2 de las tipografías")
+    parser.add_argument("--salida", default=DIR_SALIDA, help="Carpeta de salida (FUENTES_DIR)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    manifiesto = construir(DIR_TIPOGRAFIAS, args.salida)
+    print(f"{len(manifiesto['fuentes'])} fuentes en {time.perf_counter() - t0:.1f} s → {args.salida}")
+    for f in manifiesto["fuentes"]:
+        print(f"  {f['familia']:<20} {f['peso']}: {f['bytes_original'] / 1024:7.1f} KB → "
+              f"{f['bytes'] / 1024:6.1f} KB")
+    total_original = sum(f["bytes_original"] for f in manifiesto["fuentes"])
+    total = sum(f["bytes"] for f in manifiesto["fuentes"])
+    print(f"  {'total':<24}: {total_original / 1024:7.1f} KB → {total / 1024:6.1f} KB")
+    return 0 if len(manifiesto["fuentes"]) == len(FUENTES) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
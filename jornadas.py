@@ -0,0 +1,138 @@
+"""
+Alineación de jornadas entre temporadas
+=======================================
+Comparativa justa temporada actual vs anterior: la jornada n como local de
+la temporada actual se compara con la jornada n de la anterior, excluyendo
+la pretemporada (partidos anteriores al 15 de agosto).
+
+El índice de alineación (id_partido → temporada, jornada) se construye una
+sola vez por versión del calendario de `slv_partidos` y se reutiliza en todas
+las páginas. Cualquier tabla con `id_partido` se alinea con un merge y las
+métricas se comparan con reducciones vectorizadas (`comparar`).
+
+Si el calendario no está disponible se alinea con los propios partidos del
+DataFrame recibido (mismo corte de pretemporada).
+"""
+
+import threading
+
+import pandas as pd
+
+from database import get_partidos_local
+
+TEMPORADAS = {'actual': '2025', 'anterior': '2024'}
+CORTE_PRETEMPORADA = (8, 15)  # (mes, día): primer día de liga considerado
+MAX_INDICES = 16
+
+_lock = threading.Lock()
+_indices = {}
+
+
+def _calendario():
+    """Partidos como local de las temporadas comparadas: id_partido, schedule, temporada."""
+    partes = []
+    for etiqueta, temporada in TEMPORADAS.items():
+        try:
+            df = get_partidos_local(temporada)
+        except Exception as e:
+            print(f"Error cargando calendario {temporada}: {e}")
+            continue
+        if df.empty or not {'id', 'schedule'}.issubset(df.columns):
+            continue
+        partes.append(pd.DataFrame({'id_partido': df['id'], 'schedule': df['schedule'],
+                                    'temporada': etiqueta}))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+
+def _construir_indice(cal):
+    """Numera las jornadas de cada temporada a partir del corte de pretemporada."""
+    cal = cal.dropna(subset=['id_partido', 'schedule']).drop_duplicates('id_partido').copy()
+    cal['schedule'] = pd.to_datetime(cal['schedule'], errors='coerce')
+    cal = cal.dropna(subset=['schedule'])
+    anio = cal['schedule'].dt.year - (cal['schedule'].dt.month < 7)
+    mes, dia = CORTE_PRETEMPORADA
+    corte = pd.to_datetime(pd.DataFrame({'year': anio, 'month': mes, 'day': dia}))
+    cal = cal[cal['schedule'] >= corte].sort_values('schedule')
+    cal['jornada'] = cal.groupby('temporada').cumcount() + 1
+    return cal.set_index('id_partido')[['temporada', 'jornada']]
+
+
+def indice(cal=None):
+    """Índice de alineación {id_partido: (temporada, jornada)} para `cal`
+    (por defecto el calendario de `slv_partidos`), cacheado por su contenido."""
+    if cal is None:
+        cal = _calendario()
+    if cal.empty:
+        return pd.DataFrame(columns=['temporada', 'jornada'])
+    clave = int(pd.util.hash_pandas_object(cal[['id_partido', 'schedule', 'temporada']],
+                                           index=False).sum())
+    with _lock:
+        idx = _indices.get(clave)
+    if idx is None:
+        idx = _construir_indice(cal)
+        with _lock:
+            if len(_indices) >= MAX_INDICES:
+                _indices.pop(next(iter(_indices)))
+            _indices[clave] = idx
+    return idx
+
+
+def _indice_para(df, col_temporada):
+    idx = indice()
+    if idx.empty or not df['id_partido'].isin(idx.index).any():
+        cols = ['id_partido', 'schedule', col_temporada]
+        idx = indice(df[cols].rename(columns={col_temporada: 'temporada'}))
+    return idx
+
+
+def alinear(df, col_temporada='temporada'):
+    """Copia de `df` con la columna `jornada` (NaN en pretemporada o partidos
+    fuera del calendario). Si `df` no trae `col_temporada` se toma del índice."""
+    if df.empty:
+        return df.assign(jornada=pd.Series(dtype=float))
+    idx = _indice_para(df, col_temporada) if col_temporada in df.columns else indice()
+    out = df.copy()
+    out['jornada'] = out['id_partido'].map(idx['jornada'])
+    if col_temporada not in out.columns:
+        out[col_temporada] = out['id_partido'].map(idx['temporada'])
+    return out
+
+
+def comparables(df, col_temporada='temporada'):
+    """(df_actual, df_anterior): todas las filas de la temporada actual y las
+    de la anterior cuya jornada no supera la última jornada con datos de la
+    actual."""
+    if df.empty:
+        return df, df
+    al = alinear(df, col_temporada)
+    actual = al[al[col_temporada] == 'actual']
+    limite = actual['jornada'].max()
+    anterior = al[(al[col_temporada] == 'anterior') & (al['jornada'] <= limite)]
+    return actual.drop(columns='jornada'), anterior.drop(columns='jornada')
+
+
+def ids_jornadas(n, temporada='anterior'):
+    """ids de las `n` primeras jornadas como local de `temporada` (orden cronológico)."""
+    idx = indice()
+    sel = idx[(idx['temporada'] == temporada) & (idx['jornada'] <= n)]
+    return [int(i) for i in sel.sort_values('jornada').index]
+
+
+def comparar(df, metricas, col_temporada='temporada'):
+    """Compara métricas entre temporadas alineadas.
+
+    `metricas` es {nombre: (columna, 'sum' | 'mean' | ...)}. Devuelve un
+    DataFrame indexado por nombre con columnas `actual` y `anterior` (0 si la
+    temporada no tiene filas, como en las tarjetas KPI).
+    """
+    return comparar_alineados(*comparables(df, col_temporada), metricas)
+
+
+def comparar_alineados(actual, anterior, metricas):
+    """`comparar` a partir del par (df_actual, df_anterior) que ya devolvió
+    `comparables`, para no alinear dos veces."""
+    filas = {nombre: (actual[col].agg(func) if len(actual) else 0,
+                      anterior[col].agg(func) if len(anterior) else 0)
+             for nombre, (col, func) in metricas.items()}
+    return pd.DataFrame.from_dict(filas, orient='index', columns=['actual', 'anterior']).fillna(0)
+
@@ -0,0 +1,361 @@
+"""
+Curvas de llegada de abonados
+=============================
+El KPI "Abonados Tardíos" solo distingue antes/después del inicio. Este
+módulo agrega las entradas por torno (`slv_asistencias.hora_asistencia_abono`)
+en histogramas por partido:
+
+    - Minutos respecto al inicio (`TIME(p.schedule)`, o `schedule` si la
+      entrada trae fecha) en cubetas de `ANCHO_MINUTOS`, desde
+      `DESDE_MINUTOS` hasta `HASTA_MINUTOS`; las llegadas fuera del rango
+      cuentan en la primera o la última cubeta.
+    - Por grupo (sector, localidad): la localidad del abono es lo más
+      parecido a la puerta de acceso que hay en las tablas Silver.
+    - Cada abonado cuenta una vez por partido (su primera entrada).
+
+Todo el cálculo es vectorial (`np.bincount` sobre partido × grupo × cubeta)
+y un histograma ocupa unos pocos KB, así que combinar cualquier selección de
+partidos (`curva`) es sumar tablas pequeñas. Los histogramas se guardan en
+`LLEGADAS_DIR` (por defecto `.llegadas/`, un `.npz` por partido) y se
+comparten entre workers y background callbacks: cada partido se lee de
+MySQL una sola vez. Los partidos que empezaron hace menos de
+`EN_CURSO_HORAS` se ponen al día cada `LLEGADAS_DIRECTO_SEGUNDOS` leyendo
+solo las entradas desde la última vista. `LLEGADAS_DIR=` (vacío) los deja
+solo en memoria.
+"""
+
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from database import get_asistencias_llegadas, get_asistencias_llegadas_desde, plazo_restante
+
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+DIR_HISTOGRAMAS = os.environ.get("LLEGADAS_DIR", os.path.join(DIR_BASE, ".llegadas"))
+DIRECTO_SEGUNDOS = float(os.environ.get("LLEGADAS_DIRECTO_SEGUNDOS", "30"))
+EN_CURSO_HORAS = 4
+LOTE_PARTIDOS = 10   # partidos por consulta al calcular los que faltan
+
+ANCHO_MINUTOS = 5
+DESDE_MINUTOS = -120
+HASTA_MINUTOS = 45
+CUBETAS = np.arange(DESDE_MINUTOS, HASTA_MINUTOS, ANCHO_MINUTOS)   # inicio de cada cubeta
+
+_lock = threading.Lock()
+_memoria = {}
+_sin_entradas = {}   # id_partido -> time.time() de la última consulta vacía
+_en_vuelo = {}       # id_partido -> Event del hilo que lo está leyendo de MySQL
+
+
+def etiqueta_cubeta(minuto):
+    """Texto de la cubeta que empieza en `minuto` (las de los extremos son abiertas)."""
+    minuto = int(minuto)
+    if minuto == CUBETAS[0]:
+        return f"antes del {minuto + ANCHO_MINUTOS:+d}'"
+    if minuto == CUBETAS[-1]:
+        return f"desde el {minuto:+d}'"
+    return f"{minuto:+d}' a {minuto + ANCHO_MINUTOS:+d}'"
+
+
+class Histograma:
+    """Llegadas de un partido: `conteos[g, c]` son los abonados del grupo
+    (`sector[g]`, `localidad[g]`) cuya primera entrada cae en la cubeta c.
+
+    `marca` es la hora de la última entrada vista y `vistos` los hashes de
+    los abonados ya contados; este último solo se conserva mientras el
+    partido está en curso (`None` = histograma cerrado).
+    """
+
+    __slots__ = ("sector", "localidad", "conteos", "inicio", "marca", "vistos", "actualizado")
+
+    def __init__(self, sector, localidad, conteos, inicio="", marca="", vistos=None, actualizado=0.0):
+        self.sector = np.asarray(sector, dtype=str)
+        self.localidad = np.asarray(localidad, dtype=str)
+        self.conteos = np.asarray(conteos, dtype=np.int32).reshape(len(self.sector), len(CUBETAS))
+        self.inicio = inicio
+        self.marca = marca
+        self.vistos = vistos
+        self.actualizado = actualizado
+
+    def tabla(self):
+        """DataFrame (sector, localidad) × inicio de cubeta."""
+        indice = pd.MultiIndex.from_arrays([self.sector, self.localidad], names=["sector", "localidad"])
+        return pd.DataFrame(self.conteos, index=indice, columns=CUBETAS)
+
+    def sumar(self, otro):
+        """Histograma con las llegadas de los dos (y la marca más reciente)."""
+        tabla = self.tabla().add(otro.tabla(), fill_value=0)
+        vistos = (None if self.vistos is None or otro.vistos is None
+                  else np.union1d(self.vistos, otro.vistos))
+        return Histograma(tabla.index.get_level_values(0), tabla.index.get_level_values(1),
+                          tabla.to_numpy(), self.inicio or otro.inicio,
+                          max(self.marca, otro.marca), vistos, max(self.actualizado, otro.actualizado))
+
+
+# =============================================================================
+# HISTOGRAMAS
+# =============================================================================
+
+def _a_tiempo(serie):
+    """(serie, con_fecha): datetime64 si los valores traen fecha, timedelta64
+    si son solo hora del día (columnas TIME de MySQL)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie, True
+    if pd.api.types.is_timedelta64_dtype(serie):
+        return serie, False
+    muestra = serie.dropna()
+    muestra = muestra.iloc[0] if len(muestra) else None
+    if isinstance(muestra, (datetime, date)) or (isinstance(muestra, str) and "-" in muestra):
+        return pd.to_datetime(serie, errors="coerce"), True
+    return pd.to_timedelta(serie.astype(str), errors="coerce"), False
+
+
+def _texto_hora(valor):
+    """`valor` en el formato que MySQL compara con `hora_asistencia_abono`."""
+    if valor is None or pd.isna(valor):
+        return ""
+    if isinstance(valor, (pd.Timestamp, datetime)):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valor, (pd.Timedelta, timedelta)):
+        s = int(valor.total_seconds())
+        return f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}"
+    return str(valor)
+
+
+def histogramar(df, vistos=None):
+    """Histogramas por partido de un DataFrame de `get_asistencias_llegadas`.
+
+    Devuelve {id_partido: Histograma} con `vistos` y `marca` rellenos. Con
+    `vistos` (hashes de un histograma anterior) se ignoran esos abonados.
+    """
+    if df.empty:
+        return {}
+    llegada, con_fecha = _a_tiempo(df["hora_asistencia_abono"])
+    if con_fecha:
+        minutos = (llegada - pd.to_datetime(df["schedule"], errors="coerce")).dt.total_seconds() / 60
+    else:
+        minutos = (llegada - _a_tiempo(df["hora_partido"])[0]).dt.total_seconds() / 60
+        # Solo horas del día: una entrada a las 00:10 de un partido de las
+        # 23:30 es +40', no -1400'
+        minutos = (minutos + 720) % 1440 - 720
+    datos = pd.DataFrame({
+        "id_partido": df["id_partido"].to_numpy(),
+        "hash": pd.util.hash_array(df["clave_unica"].astype(str).to_numpy()),
+        "sector": df["sector"].fillna("SIN SECTOR").astype(str).to_numpy(),
+        "localidad": df["locality"].fillna("SIN LOCALIDAD").astype(str).to_numpy(),
+        "minutos": minutos.to_numpy(),
+        "llegada": llegada.to_numpy(),
+        "schedule": df["schedule"].astype(str).to_numpy(),
+    })
+    datos = datos[~np.isnan(datos["minutos"].to_numpy())]
+    if vistos is not None and len(vistos):
+        datos = datos[~np.isin(datos["hash"].to_numpy(), vistos)]
+    datos = datos.sort_values("minutos", kind="stable").drop_duplicates(["id_partido", "hash"])
+    if datos.empty:
+        return {}
+
+    n_cubetas = len(CUBETAS)
+    cubeta = np.clip((datos["minutos"].to_numpy() - DESDE_MINUTOS) // ANCHO_MINUTOS,
+                     0, n_cubetas - 1).astype(np.int64)
+    cod_partido, partidos = pd.factorize(datos["id_partido"])
+    cod_grupo, grupos = pd.MultiIndex.from_arrays([datos["sector"], datos["localidad"]]).factorize()
+    n_partidos, n_grupos = len(partidos), len(grupos)
+    conteos = np.bincount((cod_partido * n_grupos + cod_grupo) * n_cubetas + cubeta,
+                          minlength=n_partidos * n_grupos * n_cubetas)
+    conteos = conteos.reshape(n_partidos, n_grupos, n_cubetas).astype(np.int32)
+
+    sectores = grupos.get_level_values(0).to_numpy()
+    localidades = grupos.get_level_values(1).to_numpy()
+    marcas = datos.groupby(cod_partido)["llegada"].last()   # ordenado por minutos
+    schedules = datos.groupby(cod_partido)["schedule"].first()
+    orden = np.argsort(cod_partido, kind="stable")
+    cortes = np.searchsorted(cod_partido[orden], np.arange(n_partidos + 1))
+    hashes = datos["hash"].to_numpy()
+    ahora = time.time()
+
+    resultado = {}
+    for i, id_partido in enumerate(partidos):
+        usados = conteos[i].any(axis=1)
+        resultado[int(id_partido)] = Histograma(
+            sectores[usados], localidades[usados], conteos[i][usados],
+            inicio=schedules.get(i, ""), marca=_texto_hora(marcas.get(i)),
+            vistos=np.sort(hashes[orden[cortes[i]:cortes[i + 1]]]), actualizado=ahora)
+    return resultado
+
+
+def _en_curso(histograma):
+    inicio = pd.to_datetime(histograma.inicio, errors="coerce")
+    return pd.notna(inicio) and datetime.now() < inicio + timedelta(hours=EN_CURSO_HORAS)
+
+
+# =============================================================================
+# ALMACÉN
+# =============================================================================
+
+def _ruta(id_partido):
+    return os.path.join(DIR_HISTOGRAMAS, f"{int(id_partido)}.npz")
+
+
+def _guardar(id_partido, h):
+    if not DIR_HISTOGRAMAS:
+        return
+    try:
+        os.makedirs(DIR_HISTOGRAMAS, exist_ok=True)
+        ruta = _ruta(id_partido)
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, cubetas=CUBETAS, sector=h.sector, localidad=h.localidad,
+                     conteos=h.conteos, inicio=np.array(h.inicio), marca=np.array(h.marca),
+                     vistos=h.vistos if h.vistos is not None else np.empty(0, np.uint64),
+                     cerrado=np.array(h.vistos is None), actualizado=np.array(h.actualizado))
+        os.replace(tmp, ruta)
+    except OSError as e:
+        print(f"Aviso: no se pudo guardar el histograma de llegadas {id_partido}: {e}")
+
+
+def _cargar(id_partido):
+    if not DIR_HISTOGRAMAS:
+        return None
+    try:
+        with np.load(_ruta(id_partido)) as z:
+            if not np.array_equal(z["cubetas"], CUBETAS):
+                return None   # cubetas de otra configuración: se recalcula
+            return Histograma(z["sector"], z["localidad"], z["conteos"], str(z["inicio"]),
+                              str(z["marca"]), None if bool(z["cerrado"]) else z["vistos"],
+                              float(z["actualizado"]))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Aviso: histograma de llegadas ilegible ({_ruta(id_partido)}): {e}")
+        return None
+
+
+def _fijar(id_partido, h):
+    """Guarda `h` en memoria y en disco, cerrándolo si el partido ya terminó."""
+    if h.vistos is not None and not _en_curso(h):
+        h.vistos = None
+    with _lock:
+        _memoria[id_partido] = h
+        _sin_entradas.pop(id_partido, None)
+    _guardar(id_partido, h)
+    return h
+
+
+def _terminar(id_partido):
+    """Libera el partido y despierta a los hilos que esperaban su lectura."""
+    with _lock:
+        hecho = _en_vuelo.pop(id_partido, None)
+    if hecho is not None:
+        hecho.set()
+
+
+def _poner_al_dia(id_partido, h):
+    """Suma a `h` las entradas del partido desde su marca (incluida); los
+    abonados ya contados se descartan por `vistos`."""
+    desde = h.marca
+    if "-" not in desde and datetime.now().strftime("%H:%M:%S") < desde:
+        desde = "00:00:00"   # hora sin fecha y ya pasó la medianoche
+    nuevas = get_asistencias_llegadas_desde(id_partido, desde)
+    delta = histogramar(nuevas, vistos=h.vistos).get(id_partido)
+    h = h.sumar(delta) if delta is not None else h
+    h.actualizado = time.time()
+    return h
+
+
+def histogramas(ids):
+    """Histograma de cada partido de `ids` que tiene entradas registradas.
+
+    Se buscan en memoria, luego en `DIR_HISTOGRAMAS` y los que faltan se
+    calculan con una consulta por cada `LOTE_PARTIDOS`. Los partidos en
+    curso se ponen al día si su última lectura tiene más de
+    `DIRECTO_SEGUNDOS`.
+
+    `_lock` solo protege `_memoria`, `_sin_entradas` y `_en_vuelo`: las
+    consultas a MySQL se hacen fuera. Cada partido lo lee un único hilo a la
+    vez; los demás que lo pidan esperan a que termine (como en la
+    coalescencia de `database.query_to_df`) y toman el resultado de memoria.
+    """
+    ids = list(dict.fromkeys(int(i) for i in ids))
+    de_disco = {i: h for i in ids if i not in _memoria and (h := _cargar(i)) is not None}
+
+    resultado, poner_al_dia, faltan, esperar = {}, [], [], {}
+    with _lock:
+        ahora = time.time()
+        for i in ids:
+            if i in _en_vuelo:
+                esperar[i] = _en_vuelo[i]
+                continue
+            h = _memoria.get(i) or de_disco.get(i)
+            if h is None:
+                if ahora - _sin_entradas.get(i, float("-inf")) >= DIRECTO_SEGUNDOS:
+                    faltan.append(i)
+                    _en_vuelo[i] = threading.Event()
+                continue
+            _memoria[i] = resultado[i] = h
+            if h.vistos is not None and ahora - h.actualizado >= DIRECTO_SEGUNDOS:
+                poner_al_dia.append(i)
+                _en_vuelo[i] = threading.Event()
+
+    pendientes = poner_al_dia + faltan
+    try:
+        for i in poner_al_dia:
+            resultado[i] = _fijar(i, _poner_al_dia(i, resultado[i]))
+            _terminar(i)
+        for n in range(0, len(faltan), LOTE_PARTIDOS):
+            lote = faltan[n:n + LOTE_PARTIDOS]
+            nuevos = histogramar(get_asistencias_llegadas(lote))
+            for i in lote:
+                if i in nuevos:
+                    resultado[i] = _fijar(i, nuevos[i])
+                else:
+                    with _lock:
+                        _sin_entradas[i] = time.time()
+                _terminar(i)
+    finally:
+        for i in pendientes:
+            _terminar(i)   # tras un error: que los que esperan no se queden colgados
+
+    for i, hecho in esperar.items():
+        hecho.wait(timeout=plazo_restante())
+        with _lock:
+            h = _memoria.get(i)
+        if h is not None:
+            resultado[i] = h
+    return {i: resultado[i] for i in ids if i in resultado}
+
+
+def curva(ids, por="sector"):
+    """Media por partido de las llegadas de `ids`, agrupada por `por`
+    ('sector' o 'localidad').
+
+    Devuelve (DataFrame `por` × inicio de cubeta, nº de partidos con datos).
+    """
+    hs = histogramas(ids)
+    if not hs:
+        return pd.DataFrame(columns=CUBETAS, dtype=float), 0
+    claves = np.concatenate([getattr(h, por) for h in hs.values()])
+    conteos = np.vstack([h.conteos for h in hs.values()])
+    tabla = pd.DataFrame(conteos, columns=CUBETAS).groupby(claves).sum()
+    tabla.index.name = por
+    return tabla / len(hs), len(hs)
+
+
+def vaciar_memoria():
+    """Olvida los histogramas en memoria de este proceso (no los de disco)."""
+    with _lock:
+        _memoria.clear()
+        _sin_entradas.clear()
+
+
+def _reiniciar_tras_fork():
+    global _lock
+    _lock = threading.Lock()
+    _en_vuelo.clear()   # los hilos que los leían no existen en el hijo
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
@@ -0,0 +1,71 @@
+"""
+Manifiestos de activos generados
+================================
+`escudos.py` y `fuentes.py` generan en el build ficheros optimizados y un
+`manifiesto.json` con la firma de los originales. En la app ambos lo cargan
+igual, con `Manifiesto`:
+
+    - La primera llamada a `obtener()` lee el manifiesto del disco; si falta
+      o su firma no coincide con la de los originales, lanza el build en un
+      hilo en segundo plano y devuelve None (se sirven los originales).
+    - Al terminar el build, `obtener()` devuelve el manifiesto nuevo.
+    - En el hijo de un fork (pool de `procesos`, background callbacks) el
+      hilo del build era del padre: sin manifiesto, se vuelve a leer.
+"""
+
+import json
+import os
+import threading
+
+
+class Manifiesto:
+    """Manifiesto `ruta` de un build; `firma()` es la de los originales
+    actuales y `construir()` regenera los ficheros y devuelve el manifiesto."""
+
+    def __init__(self, nombre, ruta, firma, construir):
+        self.nombre = nombre
+        self.ruta = ruta
+        self._firma = firma
+        self._construir = construir
+        self._lock = threading.Lock()
+        self._estado = {"manifiesto": None, "cargado": False, "construyendo": False}
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reiniciar_tras_fork)
+
+    def _reiniciar_tras_fork(self):
+        self._lock = threading.Lock()
+        if self._estado["manifiesto"] is None:
+            self._estado.update(cargado=False, construyendo=False)
+
+    def _construir_en_segundo_plano(self):
+        try:
+            manifiesto = self._construir()
+        except Exception as e:
+            print(f"Error en el build de {self.nombre}: {e}")
+            manifiesto = None
+        with self._lock:
+            self._estado.update(manifiesto=manifiesto, construyendo=False)
+
+    def _cargar(self):
+        """Manifiesto vigente o None (lanzando el build si falta o está obsoleto)."""
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                manifiesto = json.load(f)
+            if manifiesto.get("firma") == self._firma():
+                return manifiesto
+        except (OSError, ValueError):
+            pass
+        if not self._estado["construyendo"]:
+            self._estado["construyendo"] = True
+            threading.Thread(target=self._construir_en_segundo_plano, daemon=True,
+                             name=f"{self.nombre}-build").start()
+        return None
+
+    def obtener(self):
+        """Manifiesto vigente, o None mientras no lo haya."""
+        if not self._estado["cargado"]:
+            with self._lock:
+                if not self._estado["cargado"]:
+                    self._estado["manifiesto"] = self._cargar()
+                    self._estado["cargado"] = True
+        return self._estado["manifiesto"]
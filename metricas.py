@@ -0,0 +1,348 @@
+"""
+Instrumentación de callbacks
+============================
+Mide cada petición a `/_dash-update-component` y desglosa su tiempo en fases:
+
+    query          → tiempo dentro de `database.query_to_df`
+    figure         → construcción de figuras Plotly (Figure, add_trace, update_layout)
+    serializacion  → `to_json` de la respuesta dentro del dispatch de Dash
+    cola           → espera en el control de admisión (`admision.py`)
+    transform      → resto (pandas, componentes html, lógica del callback)
+
+Además registra los bytes de la respuesta (JSON serializado y enviados, que
+difieren si `compresion.py` la comprime). Los datos se exponen en formato
+Prometheus en `/metrics` y se emite una línea JSON por callback en el logger
+`dash_negocio.metricas`.
+
+Los callbacks decorados con `@presupuesto(max_bytes)` avisan en el log
+(`presupuesto_excedido`) cuando su JSON supera el presupuesto. Con
+`PRESUPUESTOS_ESTRICTOS=1` (benchmark, `comprobaciones.py presupuestos`)
+el callback lanza `PresupuestoExcedido` en su lugar.
+
+Las métricas son por proceso: con gunicorn cada worker expone sus propios
+contadores (Prometheus los agrega al hacer scrape de cada instancia).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+import flask
+
+logger = logging.getLogger("dash_negocio.metricas")
+
+FASES = ("query", "transform", "figure", "serializacion", "cola")
+
+# Buckets del histograma de duración total (segundos)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+ESTRICTO = os.environ.get("PRESUPUESTOS_ESTRICTOS", "0") == "1"
+
+# Presupuestos de `@presupuesto`, fijados por objetivo y no por lo que ocupan
+# hoy las respuestas: con un móvil a ~512 kbit/s en el estadio, un render de
+# página debe llegar en ~1 s y una interacción dentro de ella en ~0,25 s.
+PRESUPUESTO_PAGINA = 64_000
+PRESUPUESTO_INTERACCION = 16_000
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+
+def _reiniciar_tras_fork():
+    global _lock
+    _lock = threading.Lock()  # un hilo del padre pudo dejarlo tomado
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+class PresupuestoExcedido(AssertionError):
+    """La salida serializada de un callback supera su presupuesto de bytes."""
+
+
+def _medicion_activa():
+    """Devuelve el dict de fases de la petición en curso o None."""
+    return getattr(_local, "fases", None)
+
+
+def _acumular(fase, segundos):
+    fases = _medicion_activa()
+    if fases is not None:
+        fases[fase] += segundos
+
+
+def medir_fase(fase):
+    """Decorador que suma el tiempo de la función a `fase` de la petición activa.
+
+    Si la función se llama de forma anidada dentro de otra medición de la
+    misma fase (p. ej. `add_trace` dentro de `Figure.__init__`) solo cuenta
+    el tramo exterior.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _medicion_activa() is None or getattr(_local, "en_" + fase, False):
+                return func(*args, **kwargs)
+            setattr(_local, "en_" + fase, True)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                setattr(_local, "en_" + fase, False)
+                _acumular(fase, time.perf_counter() - t0)
+        wrapper.__wrapped_metricas__ = True
+        return wrapper
+    return decorator
+
+
+def _callback_id():
+    """Identificador del callback a partir del cuerpo de la petición de Dash."""
+    body = flask.request.get_json(silent=True) or {}
+    return str(body.get("output", "desconocido"))
+
+
+def presupuesto(max_bytes):
+    """Decorador de callbacks: presupuesto de bytes de su salida serializada.
+
+    Va por encima de `con_marca_datos` / `figuras_compactas` para medir la
+    salida final. El límite queda en `func.presupuesto_bytes` (lo usa
+    `benchmark.py --presupuestos`).
+    """
+    def decorator(func):
+        nombre = f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            salida = func(*args, **kwargs)
+            _local.presupuesto = (nombre, max_bytes)
+            if ESTRICTO:
+                n_bytes = bytes_salida(salida)
+                if n_bytes > max_bytes:
+                    raise PresupuestoExcedido(
+                        f"{nombre}: {n_bytes} bytes > presupuesto de {max_bytes}")
+            return salida
+        wrapper.presupuesto_bytes = max_bytes
+        return wrapper
+    return decorator
+
+
+def bytes_salida(salida):
+    """Bytes de `salida` serializada tal y como la envía Dash."""
+    from dash._utils import to_json
+    return len(to_json(salida).encode("utf-8"))
+
+
+def registrar(callback_id, total, fases, n_bytes, status, bytes_enviados=None, excedido=False):
+    """Acumula una observación en las estadísticas del proceso."""
+    with _lock:
+        s = _stats.setdefault(callback_id, {
+            "count": 0, "errores": 0, "total": 0.0, "bytes": 0, "bytes_enviados": 0,
+            "presupuesto_excedido": 0,
+            "fases": {f: 0.0 for f in FASES},
+            "buckets": [0] * len(BUCKETS),
+        })
+        s["count"] += 1
+        if status >= 500:
+            s["errores"] += 1
+        s["total"] += total
+        s["bytes"] += n_bytes
+        s["bytes_enviados"] += n_bytes if bytes_enviados is None else bytes_enviados
+        s["presupuesto_excedido"] += int(excedido)
+        for f in FASES:
+            s["fases"][f] += fases.get(f, 0.0)
+        for i, limite in enumerate(BUCKETS):
+            if total <= limite:
+                s["buckets"][i] += 1
+
+
+def snapshot():
+    """Copia de las estadísticas acumuladas (para tests o páginas de admin)."""
+    with _lock:
+        return json.loads(json.dumps(_stats))
+
+
+def _escape(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus():
+    """Serializa las estadísticas en el formato de texto de Prometheus."""
+    import database
+    from admision import estadisticas as estadisticas_admision
+    stats = snapshot()
+    lineas = [
+        "# HELP dash_callback_requests_total Peticiones atendidas por callback.",
+        "# TYPE dash_callback_requests_total counter",
+    ]
+    for cb, s in stats.items():
+        lineas.append(f'dash_callback_requests_total{{callback="{_escape(cb)}"}} {s["count"]}')
+
+    lineas += ["# HELP dash_callback_errors_total Respuestas 5xx por callback.",
+               "# TYPE dash_callback_errors_total counter"]
+    for cb, s in stats.items():
+        lineas.append(f'dash_callback_errors_total{{callback="{_escape(cb)}"}} {s["errores"]}')
+
+    lineas += ["# HELP dash_callback_duration_seconds Duración total del callback.",
+               "# TYPE dash_callback_duration_seconds histogram"]
+    for cb, s in stats.items():
+        lbl = _escape(cb)
+        for limite, n in zip(BUCKETS, s["buckets"]):
+            lineas.append(f'dash_callback_duration_seconds_bucket{{callback="{lbl}",le="{limite}"}} {n}')
+        lineas.append(f'dash_callback_duration_seconds_bucket{{callback="{lbl}",le="+Inf"}} {s["count"]}')
+        lineas.append(f'dash_callback_duration_seconds_sum{{callback="{lbl}"}} {s["total"]:.6f}')
+        lineas.append(f'dash_callback_duration_seconds_count{{callback="{lbl}"}} {s["count"]}')
+
+    lineas += ["# HELP dash_callback_phase_seconds_total Tiempo acumulado por fase.",
+               "# TYPE dash_callback_phase_seconds_total counter"]
+    for cb, s in stats.items():
+        for fase, seg in s["fases"].items():
+            lineas.append(f'dash_callback_phase_seconds_total{{callback="{_escape(cb)}",phase="{fase}"}} {seg:.6f}')
+
+    lineas += ["# HELP dash_callback_response_bytes_total Bytes de respuesta acumulados.",
+               "# TYPE dash_callback_response_bytes_total counter"]
+    for cb, s in stats.items():
+        lineas.append(f'dash_callback_response_bytes_total{{callback="{_escape(cb)}"}} {s["bytes"]}')
+
+    lineas += ["# HELP dash_callback_response_sent_bytes_total Bytes enviados (tras compresión).",
+               "# TYPE dash_callback_response_sent_bytes_total counter"]
+    for cb, s in stats.items():
+        lineas.append(f'dash_callback_response_sent_bytes_total{{callback="{_escape(cb)}"}} {s["bytes_enviados"]}')
+
+    lineas += ["# HELP dash_callback_budget_exceeded_total Respuestas por encima del presupuesto.",
+               "# TYPE dash_callback_budget_exceeded_total counter"]
+    for cb, s in stats.items():
+        lineas.append(f'dash_callback_budget_exceeded_total{{callback="{_escape(cb)}"}} {s["presupuesto_excedido"]}')
+
+    lineas += ["# HELP dash_db_queries_total Lecturas de query_to_df según cómo se resolvieron.",
+               "# TYPE dash_db_queries_total counter"]
+    for resultado, n in database.estadisticas_lecturas().items():
+        lineas.append(f'dash_db_queries_total{{resultado="{resultado}"}} {n}')
+
+    lineas += ["# HELP dash_admission_total Peticiones de callbacks según el control de admisión.",
+               "# TYPE dash_admission_total counter"]
+    admision = estadisticas_admision()
+    for resultado in ("admitida", "urgente", "sustituida", "rechazada"):
+        lineas.append(f'dash_admission_total{{resultado="{resultado}"}} {admision[resultado]}')
+    lineas += ["# HELP dash_admission_queue Peticiones esperando turno.",
+               "# TYPE dash_admission_queue gauge",
+               f"dash_admission_queue {admision['en_cola']}"]
+
+    lineas += ["# HELP dash_db_circuit_open Circuito de MySQL abierto (1) o no (0).",
+               "# TYPE dash_db_circuit_open gauge",
+               f"dash_db_circuit_open {int(database.estado_circuito() == 'abierto')}"]
+
+    return "\n".join(lineas) + "\n"
+
+
+# =============================================================================
+# ENGANCHES
+# =============================================================================
+
+def instrumentar_consultas():
+    """Envuelve `database.query_to_df` (las funciones `get_*` lo resuelven en
+    cada llamada, así que no hace falta tocar sus firmas)."""
+    import database
+    if not getattr(database.query_to_df, "__wrapped_metricas__", False):
+        database.query_to_df = medir_fase("query")(database.query_to_df)
+
+
+def _instrumentar_plotly():
+    """Mide la construcción de figuras en todas las páginas, incluidas las que
+    construyen la figura en línea dentro de `update_page`."""
+    import plotly.graph_objects as go
+    for nombre in ("__init__", "add_trace", "update_layout"):
+        original = getattr(go.Figure, nombre)
+        if not getattr(original, "__wrapped_metricas__", False):
+            setattr(go.Figure, nombre, medir_fase("figure")(original))
+
+
+def _instrumentar_serializacion():
+    """Mide el `to_json` que Dash ejecuta al final de cada callback."""
+    import dash._callback as dash_callback
+    if not getattr(dash_callback.to_json, "__wrapped_metricas__", False):
+        dash_callback.to_json = medir_fase("serializacion")(dash_callback.to_json)
+
+
+def instrumentar(app, consultas=True):
+    """Activa la instrumentación sobre `app.server` y registra `/metrics`.
+
+    Con `consultas=False` no se importa `database` (pandas, SQLAlchemy): el
+    arranque diferido llama a `instrumentar_consultas` en segundo plano.
+
+    Si existe la variable de entorno `METRICS_TOKEN`, `/metrics` exige
+    `Authorization: Bearer <token>` o `?token=<token>`.
+    """
+    server = app.server
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if consultas:
+        instrumentar_consultas()
+    _instrumentar_plotly()
+    _instrumentar_serializacion()
+
+    @server.before_request
+    def _inicio_medicion():
+        if flask.request.path.endswith("/_dash-update-component"):
+            _local.fases = {f: 0.0 for f in FASES}
+            _local.t0 = time.perf_counter()
+            _local.presupuesto = None
+
+    @server.after_request
+    def _fin_medicion(response):
+        fases = _medicion_activa()
+        if fases is None:
+            return response
+        _local.fases = None
+        total = time.perf_counter() - _local.t0
+        fases["transform"] = max(
+            0.0, total - sum(v for f, v in fases.items() if f != "transform"))
+        bytes_enviados = response.calculate_content_length() or 0
+        n_bytes = flask.g.get("bytes_json", bytes_enviados)
+        cb = _callback_id()
+        nombre, limite = getattr(_local, "presupuesto", None) or (None, None)
+        excedido = limite is not None and n_bytes > limite
+        registrar(cb, total, fases, n_bytes, response.status_code, bytes_enviados, excedido)
+        logger.info(json.dumps({
+            "evento": "callback",
+            "callback": cb,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            **{f"{f}_ms": round(v * 1000, 2) for f, v in fases.items()},
+            "bytes": n_bytes,
+            "bytes_enviados": bytes_enviados,
+        }, ensure_ascii=False))
+        if excedido:
+            logger.warning(json.dumps({
+                "evento": "presupuesto_excedido",
+                "callback": cb,
+                "funcion": nombre,
+                "bytes": n_bytes,
+                "presupuesto": limite,
+            }, ensure_ascii=False))
+        return response
+
+    @server.teardown_request
+    def _limpiar_medicion(exc):
+        # Si la petición falla antes de after_request no debe quedar una
+        # medición abierta en el hilo (gunicorn reutiliza los threads).
+        _local.fases = None
+        _local.presupuesto = None
+
+    @server.route("/metrics")
+    def _metrics():
+        token = os.environ.get("METRICS_TOKEN")
+        if token:
+            auth = flask.request.headers.get("Authorization", "")
+            if auth != f"Bearer {token}" and flask.request.args.get("token") != token:
+                return flask.Response("No autorizado\n", status=401, mimetype="text/plain")
+        return flask.Response(render_prometheus(),
+                              mimetype="text/plain; version=0.0.4; charset=utf-8")
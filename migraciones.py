@@ -0,0 +1,322 @@
+"""
+Migraciones de índices de las tablas Silver
+===========================================
+Índices versionados para las tablas `slv_*` que leen directamente los
+lectores de `database` (ticketing, cesiones, asistencias, abonados,
+partidos y las ventas de hostelería en directo). Cada migración es un número de versión con su lista de índices;
+las aplicadas se registran en la tabla `schema_migraciones`. Una migración
+cuyas tablas aún no existen (p. ej. `slv_hosteleria_ventas` antes de conectar
+el TPV) se deja pendiente y se aplica en la siguiente ejecución que las
+encuentre.
+
+Tras aplicar, cada consulta de `CONSULTAS_CRITICAS` se comprueba con su plan
+de ejecución (EXPLAIN en MySQL, EXPLAIN QUERY PLAN en SQLite) y se marca como
+regresión si recorre más tablas completas de las permitidas: en una unión
+solo la tabla que dirige el recorrido puede leerse entera; las demás deben
+resolverse por índice.
+
+Uso:
+    python migraciones.py                 # estado y verificación de planes en MySQL
+    python migraciones.py --aplicar       # aplica las pendientes en MySQL y verifica
+    python migraciones.py --sqlite        # aplica y verifica sobre una réplica SQLite en memoria
+
+El proceso termina con código 1 si alguna consulta crítica hace un recorrido
+completo no permitido. Las consultas de `CONSULTAS_OPCIONALES` se omiten si
+su tabla no existe.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+import database
+
+TABLA_VERSIONES = "schema_migraciones"
+
+# Longitud de prefijo para columnas TEXT/BLOB en MySQL (no admiten índice completo)
+PREFIJO_TEXTO = 191
+_TIPOS_TEXTO = {"tinytext", "text", "mediumtext", "longtext",
+                "tinyblob", "blob", "mediumblob", "longblob"}
+
+
+# =============================================================================
+# MIGRACIONES
+# =============================================================================
+# (versión, descripción, [(nombre_indice, tabla, columnas), ...])
+# Un índice no se crea si ya existe otro (o la clave primaria) cuyas primeras
+# columnas coinciden con las suyas.
+
+MIGRACIONES = [
+    (1, "Uniones con slv_partidos por id_partido", [
+        ("ix_slv_partidos_id", "slv_partidos", ("id",)),
+        ("ix_slv_ticketing_partido", "slv_ticketing", ("id_partido", "rec_ces_vend")),
+        ("ix_slv_cesiones_partido", "slv_cesiones", ("id_partido",)),
+        ("ix_slv_asistencias_partido", "slv_asistencias",
+         ("id_partido", "clave_unica", "hora_asistencia_abono", "condicion")),
+    ]),
+    (2, "Abonos por tarjeta, socio y temporada", [
+        ("ix_slv_abonos_card", "slv_abonos", ("cardId", "locality", "sector", "ownerId")),
+        ("ix_slv_abonos_temporada", "slv_abonos", ("id_temporada", "locality", "sector", "ownerId")),
+        ("ix_slv_socios_id", "slv_socios", ("id",)),
+    ]),
+    (3, "Filtros de partidos como local y por temporada", [
+        ("ix_slv_partidos_local", "slv_partidos",
+         ("equipo_depor", "id_temporada", "t1_name", "schedule")),
+        ("ix_slv_partidos_t1", "slv_partidos", ("t1_name", "id_temporada", "schedule")),
+    ]),
+    (4, "Lecturas incrementales de hostelería en directo", [
+        ("ix_hosteleria_ventas_partido", "slv_hosteleria_ventas", ("id_partido", "id")),
+        ("ix_hosteleria_ventas_fecha", "slv_hosteleria_ventas", ("fecha", "id")),
+    ]),
+]
+
+
+# =============================================================================
+# CONSULTAS CRÍTICAS
+# =============================================================================
+# Sentencias de `database.CONSULTAS` cuyo plan se valida, con parámetros de
+# ejemplo y el número máximo de tablas que pueden recorrerse completas.
+
+CONSULTAS_CRITICAS = {
+    "ticketing": ({}, 1),
+    "cesiones": ({}, 1),
+    "recaudacion_cesiones": ({}, 1),
+    "asistencias": ({}, 1),
+    "abonados_totales": ({"temporada": "2025"}, 0),
+    "abonados_por_sector": ({"temporada": "2025"}, 0),
+    "abonados_por_sexo": ({"temporada": "2025"}, 0),
+    "partidos_temporada": ({"temporada": "2025"}, 0),
+    "partidos_local": ({"temporada": "2025"}, 0),
+    "primeros_n_partidos_local": ({"temporada": "2024", "cutoff": "2024-08-15", "n_partidos": 5}, 0),
+    "asistencias_llegadas_desde": ({"id_partido": 1, "desde": "18:00:00"}, 0),
+    "hosteleria_ventas_desde": ({"id_partido": 1, "desde": 0, "lote": 5000}, 0),
+}
+
+# Consultas críticas sobre tablas que pueden no existir todavía → esa tabla
+CONSULTAS_OPCIONALES = {
+    "hosteleria_ventas_desde": database.HOSTELERIA_VENTAS,
+}
+
+
+# =============================================================================
+# RÉPLICA SQLITE
+# =============================================================================
+# Columnas que usan las consultas críticas; basta para que el planificador de
+# SQLite razone sobre los mismos filtros y uniones que MySQL.
+
+ESQUEMA_SQLITE = [
+    """CREATE TABLE slv_partidos (
+        id INTEGER PRIMARY KEY, schedule TEXT, dia_semana TEXT, t1_name TEXT,
+        t2_name TEXT, result TEXT, id_temporada TEXT, equipo_depor TEXT)""",
+    """CREATE TABLE slv_ticketing (
+        id INTEGER PRIMARY KEY, id_partido INTEGER, rec_ces_vend REAL)""",
+    """CREATE TABLE slv_cesiones (
+        id INTEGER PRIMARY KEY, id_partido INTEGER)""",
+    """CREATE TABLE slv_asistencias (
+        id INTEGER PRIMARY KEY, clave_unica TEXT, hora_asistencia_abono TEXT,
+        id_partido INTEGER, condicion TEXT)""",
+    """CREATE TABLE slv_abonos (
+        id INTEGER PRIMARY KEY, cardId TEXT, ownerId INTEGER, id_temporada TEXT,
+        locality TEXT, sector TEXT)""",
+    """CREATE TABLE slv_socios (
+        id INTEGER PRIMARY KEY, birthdate TEXT, gender TEXT)""",
+    f"""CREATE TABLE {database.HOSTELERIA_VENTAS} (
+        id INTEGER, id_partido INTEGER, id_pedido INTEGER, fecha TEXT,
+        store_id INTEGER, store_name TEXT, product_name TEXT,
+        payment_method TEXT, cantidad REAL, importe REAL)""",
+]
+
+
+def engine_sqlite():
+    """Engine SQLite en memoria con el esquema Silver mínimo (sin índices)."""
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        for ddl in ESQUEMA_SQLITE:
+            conn.exec_driver_sql(ddl)
+    return engine
+
+
+# =============================================================================
+# APLICACIÓN
+# =============================================================================
+
+def _asegurar_tabla_versiones(conn):
+    conn.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} (
+            version INTEGER PRIMARY KEY,
+            descripcion VARCHAR(255),
+            aplicada_en DATETIME
+        )
+    """)
+
+
+def versiones_aplicadas(engine):
+    """Conjunto de versiones ya registradas en `schema_migraciones`."""
+    with engine.begin() as conn:
+        _asegurar_tabla_versiones(conn)
+        return {int(v) for (v,) in conn.exec_driver_sql(f"SELECT version FROM {TABLA_VERSIONES}")}
+
+
+def _indices_existentes(conn, tabla):
+    """Listas de columnas (en minúsculas) de cada índice y de la clave primaria."""
+    insp = inspect(conn)
+    existentes = [[c.lower() for c in ix["column_names"] if c] for ix in insp.get_indexes(tabla)]
+    pk = insp.get_pk_constraint(tabla).get("constrained_columns") or []
+    if pk:
+        existentes.append([c.lower() for c in pk])
+    return existentes
+
+
+def _columnas_mysql(conn, tabla, columnas):
+    """Columnas con prefijo de longitud para los tipos TEXT/BLOB de MySQL."""
+    tipos = dict(conn.execute(text("""
+        SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla
+    """), {"tabla": tabla}).all())
+    tipos = {k.lower(): v.lower() for k, v in tipos.items()}
+    return [f"`{c}`({PREFIJO_TEXTO})" if tipos.get(c.lower()) in _TIPOS_TEXTO else f"`{c}`"
+            for c in columnas]
+
+
+def _crear_indice(conn, nombre, tabla, columnas):
+    """Crea el índice salvo que otro ya cubra sus columnas. Devuelve True si lo crea."""
+    buscadas = [c.lower() for c in columnas]
+    for existente in _indices_existentes(conn, tabla):
+        if existente[:len(buscadas)] == buscadas:
+            return False
+    if conn.dialect.name == "mysql":
+        cols = ", ".join(_columnas_mysql(conn, tabla, columnas))
+        conn.exec_driver_sql(f"CREATE INDEX `{nombre}` ON `{tabla}` ({cols})")
+    else:
+        cols = ", ".join(f'"{c}"' for c in columnas)
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{tabla}" ({cols})')
+    return True
+
+
+def aplicar(engine):
+    """Aplica las migraciones pendientes en orden. Devuelve las versiones aplicadas.
+
+    Cada migración se registra al terminar; como los índices ya presentes se
+    omiten, una migración interrumpida puede relanzarse sin error.
+    """
+    hechas = versiones_aplicadas(engine)
+    aplicadas = []
+    for version, descripcion, indices in MIGRACIONES:
+        if version in hechas:
+            continue
+        faltan = sorted({tabla for _, tabla, _ in indices} - set(inspect(engine).get_table_names()))
+        if faltan:
+            print(f"  v{version} pendiente: no existe {', '.join(faltan)}")
+            continue
+        with engine.begin() as conn:
+            for nombre, tabla, columnas in indices:
+                creado = _crear_indice(conn, nombre, tabla, columnas)
+                estado = "creado" if creado else "ya cubierto"
+                print(f"  v{version} {tabla}({', '.join(columnas)}): {estado}")
+            conn.execute(text(f"""
+                INSERT INTO {TABLA_VERSIONES} (version, descripcion, aplicada_en)
+                VALUES (:version, :descripcion, :aplicada_en)
+            """), {"version": version, "descripcion": descripcion,
+                   "aplicada_en": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+        aplicadas.append(version)
+    return aplicadas
+
+
+# =============================================================================
+# VERIFICACIÓN DE PLANES
+# =============================================================================
+
+def _plan(conn, consulta, params):
+    """Plan de la consulta como lista de (tabla, detalle, recorrido_completo)."""
+    sql = consulta.text
+    if conn.dialect.name == "mysql":
+        filas = conn.execute(text("EXPLAIN " + sql), params).mappings().all()
+        plan = []
+        for f in filas:
+            tipo, extra = f.get("type"), f.get("Extra") or ""
+            completo = tipo == "ALL" or (tipo == "index" and "Using index" not in extra)
+            plan.append((f.get("table"), f"type={tipo} key={f.get('key')} {extra}".strip(), completo))
+        return plan
+    filas = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+    plan = []
+    for f in filas:
+        detalle = f[-1]
+        # Un índice AUTOMATIC se construye recorriendo la tabla entera en cada ejecución
+        completo = ((detalle.startswith("SCAN ") and "COVERING INDEX" not in detalle)
+                    or "AUTOMATIC" in detalle)
+        tabla = detalle.split()[1] if detalle.startswith(("SCAN ", "SEARCH ")) else None
+        plan.append((tabla, detalle, completo))
+    return plan
+
+
+def verificar(engine):
+    """Comprueba el plan de cada consulta crítica.
+
+    Devuelve una lista de dicts (consulta, recorridos, permitidos, ok, plan);
+    las de `CONSULTAS_OPCIONALES` sin tabla van con plan None.
+    """
+    resultados = []
+    with engine.connect() as conn:
+        tablas = set(inspect(conn).get_table_names())
+        for nombre, (params, permitidos) in CONSULTAS_CRITICAS.items():
+            tabla = CONSULTAS_OPCIONALES.get(nombre)
+            if tabla is not None and tabla not in tablas:
+                resultados.append({"consulta": nombre, "recorridos": 0, "permitidos": permitidos,
+                                   "ok": True, "plan": None})
+                continue
+            plan = _plan(conn, database.CONSULTAS[nombre], params)
+            recorridos = sum(1 for _, _, completo in plan if completo)
+            resultados.append({
+                "consulta": nombre,
+                "recorridos": recorridos,
+                "permitidos": permitidos,
+                "ok": recorridos <= permitidos,
+                "plan": plan,
+            })
+    return resultados
+
+
+def _imprimir_verificacion(resultados):
+    for r in resultados:
+        if r["plan"] is None:
+            print(f"[-- ] {r['consulta']:<28} omitida: no existe {CONSULTAS_OPCIONALES[r['consulta']]}")
+            continue
+        marca = "OK " if r["ok"] else "MAL"
+        print(f"[{marca}] {r['consulta']:<28} recorridos completos: {r['recorridos']} "
+              f"(máx. {r['permitidos']})")
+        if not r["ok"]:
+            for tabla, detalle, completo in r["plan"]:
+                print(f"        {'*' if completo else ' '} {tabla or '-'}: {detalle}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones de índices de las tablas Silver")
+    parser.add_argument("--aplicar", action="store_true",
+                        help="aplica las migraciones pendientes antes de verificar")
+    parser.add_argument("--sqlite", action="store_true",
+                        help="usa una réplica SQLite en memoria (implica --aplicar)")
+    args = parser.parse_args(argv)
+
+    engine = engine_sqlite() if args.sqlite else database.get_engine()
+    try:
+        if args.aplicar or args.sqlite:
+            aplicadas = aplicar(engine)
+            print(f"Migraciones aplicadas: {aplicadas or 'ninguna pendiente'}")
+        hechas = versiones_aplicadas(engine)
+        pendientes = [v for v, _, _ in MIGRACIONES if v not in hechas]
+        print(f"Versión del esquema: {max(hechas, default=0)} · pendientes: {pendientes or 'ninguna'}")
+        resultados = verificar(engine)
+    except Exception as e:
+        print(f"Error en migraciones: {e}")
+        return 1
+
+    _imprimir_verificacion(resultados)
+    return 0 if all(r["ok"] for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
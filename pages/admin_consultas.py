@@ -0,0 +1,155 @@
+"""
+Perfil de Consultas SQL
+=======================
+Sentencias más costosas del proceso actual (ver `perfil_sql`) y últimas
+consultas lentas, para decidir qué tablas `pre_*` necesitan índices o
+proyecciones más estrechas.
+Acceso: únicamente usuarios con permiso '0' (admin).
+"""
+
+import dash
+from dash import html, dcc, callback, Output, Input
+
+import perfil_sql
+from database import estadisticas_lecturas, estado_circuito
+
+dash.register_page(__name__, path="/admin/consultas", name="Perfil de Consultas")
+
+
+ORDENES = [
+    {"label": "Tiempo total", "value": "total_ms"},
+    {"label": "p95", "value": "p95_ms"},
+    {"label": "Ejecuciones", "value": "count"},
+    {"label": "Bytes", "value": "bytes"},
+    {"label": "Lentas", "value": "lentas"},
+]
+
+CELDA = {"padding": "6px 10px", "borderBottom": "1px solid #e0e0e0",
+         "fontSize": "13px", "textAlign": "right"}
+CELDA_TXT = {**CELDA, "textAlign": "left"}
+CABECERA = {**CELDA, "backgroundColor": "#18395c", "color": "white", "fontWeight": 600}
+
+
+def _fmt_ms(v):
+    return f"{v:,.1f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _fmt_bytes(v):
+    for unidad in ("B", "KB", "MB"):
+        if v < 1024:
+            return f"{v:,.0f} {unidad}".replace(",", ".")
+        v /= 1024
+    return f"{v:,.1f} GB".replace(",", ".")
+
+
+def _layout_no_autorizado():
+    return html.Div([
+        html.Div("Acceso restringido. Esta sección solo está disponible para administradores.",
+                 style={"padding": "40px", "textAlign": "center",
+                        "color": "#e74c3c", "fontWeight": 600}),
+        dcc.Link("Volver al inicio", href="/",
+                 style={"display": "block", "textAlign": "center",
+                        "color": "#1a3a5c", "fontWeight": 600}),
+    ], className="page-content-container")
+
+
+def _tabla_top(filas):
+    columnas = ["Tabla", "Origen", "Ejec.", "Total ms", "Media ms", "p50 ms",
+                "p95 ms", "Máx ms", "% DataFrame", "Filas/ejec.", "Bytes/ejec.", "Lentas"]
+    cabecera = html.Tr([html.Th(c, style=CABECERA) for c in columnas])
+    cuerpo = []
+    for f in filas:
+        origenes = ", ".join(sorted(f["origenes"], key=f["origenes"].get, reverse=True))
+        pct_df = 100 * f["df_ms"] / f["total_ms"] if f["total_ms"] else 0
+        cuerpo.append(html.Tr([
+            html.Td(html.Span(f["tabla"], title=f["sql"]), style=CELDA_TXT),
+            html.Td(origenes, style=CELDA_TXT),
+            html.Td(f["count"], style=CELDA),
+            html.Td(_fmt_ms(f["total_ms"]), style=CELDA),
+            html.Td(_fmt_ms(f["media_ms"]), style=CELDA),
+            html.Td(_fmt_ms(f["p50_ms"]), style=CELDA),
+            html.Td(_fmt_ms(f["p95_ms"]), style=CELDA),
+            html.Td(_fmt_ms(f["max_ms"]), style=CELDA),
+            html.Td(f"{pct_df:.0f}%", style=CELDA),
+            html.Td(f"{f['filas_media']:,.0f}".replace(",", "."), style=CELDA),
+            html.Td(_fmt_bytes(f["bytes_media"]), style=CELDA),
+            html.Td(f["lentas"], style=CELDA),
+        ]))
+    return html.Table([html.Thead(cabecera), html.Tbody(cuerpo)],
+                      style={"width": "100%", "borderCollapse": "collapse"})
+
+
+def _tabla_lentas(entradas):
+    columnas = ["Hora", "Origen", "Tabla", "Total ms", "MySQL ms", "DataFrame ms", "Filas", "Bytes"]
+    cabecera = html.Tr([html.Th(c, style=CABECERA) for c in columnas])
+    cuerpo = [
+        html.Tr([
+            html.Td(e["ts"], style=CELDA_TXT),
+            html.Td(e["origen"], style=CELDA_TXT),
+            html.Td(html.Span(e["tabla"], title=e["sql"]), style=CELDA_TXT),
+            html.Td(_fmt_ms(e["total_ms"]), style=CELDA),
+            html.Td(_fmt_ms(e["db_ms"]), style=CELDA),
+            html.Td(_fmt_ms(e["df_ms"]), style=CELDA),
+            html.Td(f"{e['filas']:,}".replace(",", "."), style=CELDA),
+            html.Td(_fmt_bytes(e["bytes"]), style=CELDA),
+        ])
+        for e in entradas
+    ]
+    return html.Table([html.Thead(cabecera), html.Tbody(cuerpo)],
+                      style={"width": "100%", "borderCollapse": "collapse"})
+
+
+# =============================================================================
+# LAYOUT
+# =============================================================================
+
+layout = html.Div([
+    html.Div([
+        html.Div("PERFIL DE CONSULTAS SQL", className="section-title"),
+    ], className="section-header"),
+    html.Div([
+        dcc.Dropdown(id="admin-consultas-orden", options=ORDENES, value="total_ms",
+                     clearable=False, style={"width": "220px", "display": "inline-block"}),
+        html.Button("Actualizar", id="admin-consultas-refrescar", n_clicks=0,
+                    className="btn-logout", style={"marginLeft": "12px", "width": "auto"}),
+    ], style={"padding": "10px 20px"}),
+    html.Div(id="admin-consultas-content", className="page-content-container"),
+])
+
+
+# =============================================================================
+# CALLBACK
+# =============================================================================
+
+@callback(
+    Output("admin-consultas-content", "children"),
+    Input("admin-consultas-orden", "value"),
+    Input("admin-consultas-refrescar", "n_clicks"),
+    Input("session-store", "data"),
+)
+def render_consultas(orden, _, session):
+    if not session or not session.get('authenticated'):
+        return _layout_no_autorizado()
+    permisos_raw = str(session.get('permisos', ''))
+    permisos_list = [p.strip() for p in permisos_raw.split(',')]
+    if '0' not in permisos_list:
+        return _layout_no_autorizado()
+
+    filas = perfil_sql.top(n=25, orden=orden or "total_ms")
+    lentas = perfil_sql.lentas_recientes(n=50)
+    umbral = _fmt_ms(perfil_sql.UMBRAL_LENTA_MS)
+    coal = estadisticas_lecturas()
+
+    return html.Div([
+        html.P(f"Datos del worker actual desde su arranque. Umbral de consulta lenta: {umbral} ms.",
+               style={"color": "#666", "fontSize": "13px"}),
+        html.P(f"Ejecuciones en MySQL: {coal['ejecuciones']} · coalescidas en el worker: "
+               f"{coal['coalescidas_hilo']} · recibidas de otro worker: {coal['coalescidas_worker']} · "
+               f"desde caché: {coal['cache_fresca'] + coal['cache_obsoleta']} "
+               f"({coal['cache_obsoleta']} obsoletas) · circuito MySQL: {estado_circuito()}",
+               style={"color": "#666", "fontSize": "13px"}),
+        html.H4("Sentencias más costosas", style={"color": "#18395c"}),
+        _tabla_top(filas) if filas else html.P("Sin consultas registradas."),
+        html.H4("Consultas lentas recientes", style={"color": "#18395c", "marginTop": "30px"}),
+        _tabla_lentas(lentas) if lentas else html.P("Sin consultas por encima del umbral."),
+    ])
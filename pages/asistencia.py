@@ -15,7 +15,14 @@ from database import (
     get_pre_asistencia_consecutiva, get_pre_asistencia_partido,
     get_pre_asistencia_edad
 )
-from components import temporada_toggle
+import escudos
+from components import temporada_toggle, con_marca_datos, indicador_progreso
+from metricas import PRESUPUESTO_PAGINA, presupuesto
+import segundo_plano
+from paneles import registrar_panel, renderizar
+from procesos import construir_figura
+import llegadas
+from jornadas import comparables
 
 dash.register_page(__name__, path="/estadio/asistencia", name="Asistencia")
 
@@ -100,10 +107,10 @@ ESCUDOS_MAP = {
 
 
 def get_escudo_path(team_name):
-    """Obtiene la ruta del escudo para un equipo."""
+    """Obtiene la URL del escudo (variante optimizada) para un equipo."""
     escudo_file = ESCUDOS_MAP.get(team_name)
     if escudo_file:
-        return f"/assets/Escudos/{escudo_file}"
+        return escudos.url(escudo_file)
     return None
 
 
@@ -455,6 +462,7 @@ layout = html.Div([
     create_section_header("asistencia"),
     temporada_toggle(toggle_id="toggle-temp-asistencia",
                       store_id="temp-store-asistencia"),
+    indicador_progreso("progreso-asistencia"),
     dcc.Loading(
         id="loading-asistencia",
         type="default",
@@ -479,12 +487,25 @@ def toggle_temporada_asistencia(n_clicks):
             "season-toggle active" if activo else "season-toggle")
 
 
-def create_page_content(kpis, fig1, fig2, fig3, fig4, fig5):
+def _grafica(fig):
+    """dcc.Graph para una figura; los componentes (panel diferido/error) se dejan tal cual."""
+    if isinstance(fig, go.Figure):
+        return dcc.Graph(figure=fig, config={'displayModeBar': False})
+    return fig
+
+
+def create_page_content(kpis, fig1, fig2, fig3, fig4, fig5, fig6=None, fig7=None):
     """Crea el contenido completo de la página.
 
+    Cada fig* puede ser una figura o el componente ya resuelto del panel
+    (incluido el marcador de panel diferido).
+
     fig5 ("Espectadores por Partido") es una gráfica de barras que comparte
     eje X con el evolutivo: el promedio simple de su serie coincide con el
     KPI "Espectadores por Partido".
+
+    fig6 (curva de llegada) y fig7 (pico por acceso) salen de los
+    histogramas de `llegadas`.
     """
     return html.Div([
         # KPIs
@@ -497,7 +518,7 @@ def create_page_content(kpis, fig1, fig2, fig3, fig4, fig5):
                 html.Div([
                     html.H4("Evolutivo de Asistencia ABANCA - Riazor"),
                     create_legend_with_tooltips(),
-                    dcc.Graph(figure=fig3, config={'displayModeBar': False}),
+                    _grafica(fig3),
                     html.P("Excluidos abonados sin localidad en el estadio",
                            style={'fontStyle': 'italic', 'fontSize': '11px', 'color': '#888',
                                   'textAlign': 'right', 'margin': '2px 10px 0 0'})
@@ -510,7 +531,7 @@ def create_page_content(kpis, fig1, fig2, fig3, fig4, fig5):
             html.Div([
                 html.Div([
                     html.H4("Espectadores por Partido"),
-                    dcc.Graph(figure=fig5, config={'displayModeBar': False})
+                    _grafica(fig5)
                 ], className="graph-card full-width"),
             ], className="graphs-row", style={"marginTop": "18px"}),
 
@@ -519,11 +540,11 @@ def create_page_content(kpis, fig1, fig2, fig3, fig4, fig5):
             html.Div([
                 html.Div([
                     html.H4("Promedio de Abonados Asistentes por Grada"),
-                    dcc.Graph(figure=fig1, config={'displayModeBar': False})
+                    _grafica(fig1)
                 ], className="graph-card small"),
                 html.Div([
                     html.H4("Promedio de Abonados Asistentes por Edad"),
-                    dcc.Graph(figure=fig4, config={'displayModeBar': False})
+                    _grafica(fig4)
                 ], className="graph-card small"),
             ], className="graphs-row", style={"marginTop": "18px"}),
 
@@ -532,325 +553,501 @@ def create_page_content(kpis, fig1, fig2, fig3, fig4, fig5):
             html.Div([
                 html.Div([
                     html.H4("Número de Abonados con Asistencia Consecutiva por Jornada"),
-                    dcc.Graph(figure=fig2, config={'displayModeBar': False})
+                    _grafica(fig2)
                 ], className="graph-card full-width"),
             ], className="graphs-row", style={"marginTop": "18px"}),
+
+            # Fila 5: Curva de llegada a los tornos y pico por acceso
+            html.Div([
+                html.Div([
+                    html.H4("Curva de Llegada de Abonados"),
+                    _grafica(fig6 if fig6 is not None else go.Figure())
+                ], className="graph-card"),
+                html.Div([
+                    html.H4("Pico de Llegadas por Acceso"),
+                    _grafica(fig7 if fig7 is not None else go.Figure())
+                ], className="graph-card"),
+            ], className="graphs-row", style={"marginTop": "18px"}),
         ], className="graphs-container"),
     ], className="page-content-container")
 
 
+# =============================================================================
+# PANELES
+# =============================================================================
+# Cada bloque de la página carga sus propias tablas pre-calculadas y se
+# construye de forma independiente (ver `paneles`): una tabla lenta solo
+# retrasa su gráfica. Las figuras (`build_fig_*`) se construyen en el pool
+# de procesos (ver `procesos`). `temp` es 'actual' | 'anterior'.
+
+@registrar_panel("asistencia.kpis")
+def panel_kpis(temp):
+    """Fila de KPIs (pre-calculados; en modo anterior se omite la comparativa)."""
+    es_anterior = (temp == 'anterior')
+    df_kpis = get_pre_asistencia_kpis()
+    df_partido_full = get_pre_asistencia_partido()
+    if df_kpis.empty:
+        return html.Div("No hay datos disponibles. Ejecuta sync_data.py primero.",
+                        style={"textAlign": "center", "padding": "20px", "color": "#999"})
+
+    # Mantenemos `df_partido_anterior` aparte para calcular comparativas
+    # de los KPIs derivados de la gráfica del evolutivo (mismas jornadas).
+    df_partido = df_partido_full[df_partido_full['temporada'] == temp]
+    df_partido_anterior = (comparables(df_partido_full)[1]
+                            if not es_anterior else pd.DataFrame())
+
+    kpi_sel = df_kpis[df_kpis['temporada'] == temp]
+    kpi_otra = df_kpis[df_kpis['temporada'] == ('anterior' if not es_anterior else 'actual')]
+    if kpi_sel.empty:
+        return html.Div(f"Sin datos KPI para temporada {('24/25' if es_anterior else '25/26')}",
+                        style={"textAlign": "center", "padding": "20px", "color": "#999"})
+    kpi_actual = kpi_sel.iloc[0]
+    # Cuando se muestra temp anterior, no hay comparativa: usamos zeros como anterior
+    if es_anterior or kpi_otra.empty:
+        kpi_anterior = pd.Series({
+            'promedio_asistentes': 0, 'pct_asistencia': 0,
+            'edad_promedio': 0, 'promedio_tarde': 0, 'pct_tarde': 0,
+            'male_count': 0, 'female_count': 0,
+            'male_pct': 0.0, 'female_pct': 0.0,
+            'total_abonados': 0,
+        })
+    else:
+        kpi_anterior = kpi_otra.iloc[0]
+
+    # =====================================================================
+    # PROMEDIOS POR PARTIDO — calculados desde df_partido para garantizar
+    # que coincidan exactamente con los valores que se muestran en las
+    # gráficas "Evolutivo de Asistencia ABANCA - Riazor" y "Espectadores
+    # por Partido". El usuario que sume manualmente los valores y divida
+    # entre N partidos obtiene EXACTAMENTE el valor del KPI.
+    # =====================================================================
+    n_partidos_actual = len(df_partido)
+    promedio_asistentes_actual = (df_partido['abonados_asistentes'].mean()
+                                   if n_partidos_actual > 0 else 0)
+    promedio_espectadores_actual = (df_partido['total_espectadores'].mean()
+                                      if n_partidos_actual > 0 else 0)
+
+    n_partidos_ant = len(df_partido_anterior)
+    promedio_asistentes_ant = (df_partido_anterior['abonados_asistentes'].mean()
+                                if n_partidos_ant > 0 else 0)
+    promedio_espectadores_ant = (df_partido_anterior['total_espectadores'].mean()
+                                   if n_partidos_ant > 0 else 0)
+
+    # Pct asistencia recalculado a partir del nuevo promedio
+    # (pre_asistencia_kpis.total_abonados sigue siendo la población base)
+    total_abonados_actual = kpi_actual.get('total_abonados', 0) or 0
+    pct_actual = ((promedio_asistentes_actual / total_abonados_actual * 100)
+                   if total_abonados_actual > 0 else 0)
+
+    total_abonados_ant = kpi_anterior.get('total_abonados', 0) or 0
+    pct_ant = ((promedio_asistentes_ant / total_abonados_ant * 100)
+                if total_abonados_ant > 0 else 0)
+    
+    # KPI tooltip helpers
+    TT_sexo = "Distribución por género de los abonados asistentes al estadio."
+
+    # Crear KPI de sexo manualmente desde datos pre-calculados
+    sexo_lbl = ["Sexo de los Abonados", _kpi_tooltip(TT_sexo)]
+    sexo_label_div = html.Div(sexo_lbl, className="kpi-label-top",
+                              style={"display": "flex", "alignItems": "center",
+                                     "justifyContent": "center", "gap": "5px"})
+    df_sexo_kpi = html.Div([
+        sexo_label_div,
+        html.Div([
+            html.Div([
+                html.Span(format_with_dots(kpi_actual['male_count']), style={"fontSize": "1.2rem", "fontWeight": "700", "color": "#2c5282"}),
+                html.Span(f" ({kpi_actual['male_pct']:.1f}%)", style={"fontSize": "0.8rem", "fontWeight": "600", "color": "#2c5282"}),
+                html.Div("Masculino", style={"fontSize": "0.65rem", "color": "#666", "marginTop": "2px"}),
+            ], style={"display": "inline-block", "textAlign": "center", "marginRight": "15px"}),
+            html.Div([
+                html.Span(format_with_dots(kpi_actual['female_count']), style={"fontSize": "1.2rem", "fontWeight": "700", "color": "#FFB5C0"}),
+                html.Span(f" ({kpi_actual['female_pct']:.1f}%)", style={"fontSize": "0.8rem", "fontWeight": "600", "color": "#FFB5C0"}),
+                html.Div("Femenino", style={"fontSize": "0.65rem", "color": "#666", "marginTop": "2px"}),
+            ], style={"display": "inline-block", "textAlign": "center"}),
+        ], style={"display": "flex", "justifyContent": "center", "gap": "10px"}),
+    ], className="kpi-card")
+    
+    comparar = not es_anterior
+    kpis = html.Div([
+        create_kpi_espectadores(
+            promedio_espectadores_actual, promedio_espectadores_ant,
+            tooltip="Media de espectadores totales por partido (abonados asistentes + entradas vendidas + invitaciones). Coincide exactamente con el promedio de la serie azul del evolutivo y de la gráfica 'Espectadores por Partido'.",
+            comparar=comparar,
+        ),
+        create_kpi_abonados(
+            promedio_asistentes_actual, pct_actual,
+            promedio_asistentes_ant, pct_ant,
+            tooltip="Media de abonados que accedieron al estadio por partido (registro de tornos). Se excluyen abonos 'SIN ASIENTO', 'CERO' y 'AREA 1906'. Coincide con el promedio de la serie roja del evolutivo. El % se calcula sobre el total de abonados.",
+            comparar=comparar,
+        ),
+        df_sexo_kpi,
+        create_kpi_edad(kpi_actual['edad_promedio'],
+                       tooltip="Edad media de los abonados asistentes."),
+        create_kpi_tardios(
+            kpi_actual['promedio_tarde'], kpi_actual['pct_tarde'],
+            kpi_anterior['promedio_tarde'], kpi_anterior['pct_tarde'],
+            tooltip="Media de abonados que accedieron al estadio después del inicio del partido. Un valor menor indica mayor puntualidad.",
+            comparar=comparar,
+        ),
+    ], className="kpis-row")
+    
+    return kpis
+
+
+def build_fig_grada(df_sector):
+    # =====================================================================
+    # GRÁFICA 1: % Promedio de Asistencia por Grada (pre-calculado)
+    # =====================================================================
+    promedio_sector = df_sector.sort_values('pct_asistencia', ascending=False)
+    
+    fig1 = go.Figure()
+    fig1.add_trace(go.Bar(
+        x=promedio_sector['sector'],
+        y=promedio_sector['pct_asistencia'],
+        marker_color='#18395c',
+        text=[f"{format_with_dots(a)}<br>{v:.1f}%" for a, v in zip(promedio_sector['asistentes'], promedio_sector['pct_asistencia'])],
+        textposition='outside',
+        textfont=dict(color='#333', size=11, family='Montserrat', weight='bold')
+    ))
+    max_y_grada = promedio_sector['pct_asistencia'].max() * 1.3 if len(promedio_sector) > 0 else 100
+    fig1.update_layout(
+        height=280,
+        margin=dict(t=10, b=40, l=10, r=10),
+        xaxis=dict(tickfont=dict(size=10, family='Montserrat', weight='bold')),
+        yaxis=dict(visible=False, range=[0, max_y_grada])
+    )
+    
+    return fig1
+
+
+@registrar_panel("asistencia.grada")
+def panel_grada(temp):
+    df_sector = get_pre_asistencia_sector()
+    return construir_figura(build_fig_grada, df_sector[df_sector['temporada'] == temp])
+
+
+def build_fig_consecutiva(df_consecutiva):
+    # =====================================================================
+    # GRÁFICA 2: Abonados con Asistencia Consecutiva (pre-calculado)
+    # =====================================================================
+    rivales_list = df_consecutiva['t2_name'].tolist()
+    results_list = df_consecutiva['result'].tolist()
+    abonados_consecutivos = df_consecutiva['abonados_consecutivos'].tolist()
+    
+    fig2 = go.Figure()
+    fig2.add_trace(go.Bar(
+        x=list(range(len(rivales_list))),
+        y=abonados_consecutivos,
+        marker_color='#18395c',
+        text=[format_with_dots(v) for v in abonados_consecutivos],
+        textposition='outside',
+        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold')
+    ))
+    
+    # Eje X con escudos en el mismo formato que el evolutivo (fig3):
+    # y_pos=-0.09 (cerca del borde inferior), tamaño y márgenes uniformes.
+    escudos_images_f2, result_shapes_f2 = create_escudos_with_result(
+        rivales_list, results_list
+    )
+
+    max_y = max(abonados_consecutivos) * 1.2 if abonados_consecutivos else 100
+    fig2.update_layout(
+        height=410,                         # +10px sobre el evolutivo
+        margin=dict(b=60, t=20, l=40, r=20),  # +10px de espacio inferior
+        images=escudos_images_f2,
+        shapes=result_shapes_f2,
+        xaxis=dict(
+            tickmode='array',
+            tickvals=list(range(len(rivales_list))),
+            ticktext=['' for _ in rivales_list],
+            showticklabels=False,
+            range=[-0.5, len(rivales_list) - 0.5] if rivales_list else [0, 1]
+        ),
+        yaxis=dict(title='Abonados Consecutivos', range=[0, max_y])
+    )
+    
+    return fig2
+
+
+@registrar_panel("asistencia.consecutiva")
+def panel_consecutiva(temp):
+    df_consecutiva = get_pre_asistencia_consecutiva()
+    return construir_figura(build_fig_consecutiva,
+                            df_consecutiva[df_consecutiva['temporada'] == temp])
+
+
+def build_fig_evolutivo(df_partido):
+    # =====================================================================
+    # GRÁFICA 3: Espectadores Totales vs Abonados (pre-calculado)
+    # =====================================================================
+    datos_grafica = df_partido.sort_values('schedule')
+    rivales_g3 = datos_grafica['t2_name'].tolist()
+    results_g3 = datos_grafica['result'].tolist()
+    
+    fig3 = go.Figure()
+    fig3.add_trace(go.Scatter(
+        x=list(range(len(rivales_g3))),
+        y=datos_grafica['total_espectadores'],
+        mode='lines+markers+text',
+        name='Espectadores Totales',
+        line=dict(color='#3498db', width=2),
+        marker=dict(size=8),
+        text=[format_with_dots(v) for v in datos_grafica['total_espectadores']],
+        textposition='top center',
+        textfont=dict(size=9, color='#3498db', weight='bold')
+    ))
+    fig3.add_trace(go.Scatter(
+        x=list(range(len(rivales_g3))),
+        y=datos_grafica['abonados_asistentes'],
+        mode='lines+markers+text',
+        name='Abonados Asistentes',
+        line=dict(color='#e74c3c', width=2),
+        marker=dict(size=8),
+        text=[format_with_dots(v) for v in datos_grafica['abonados_asistentes']],
+        textposition='bottom center',
+        textfont=dict(size=9, color='#e74c3c', weight='bold')
+    ))
+    
+    escudos_g3, result_shapes_g3 = create_escudos_with_result(rivales_g3, results_g3)
+    
+    fig3.update_layout(
+        height=410,
+        margin=dict(b=70, t=20, l=40, r=20),  # +20px abajo para escudos
+        images=escudos_g3,
+        shapes=result_shapes_g3,
+        showlegend=False,
+        xaxis=dict(
+            tickmode='array',
+            tickvals=list(range(len(rivales_g3))),
+            ticktext=['' for _ in rivales_g3],
+            showticklabels=False,
+            range=[-0.5, len(rivales_g3) - 0.5] if rivales_g3 else [0, 1]
+        ),
+        yaxis=dict(title='Personas')
+    )
+    
+    return fig3
+
+
+@registrar_panel("asistencia.evolutivo")
+def panel_evolutivo(temp):
+    df_partido = get_pre_asistencia_partido()
+    return construir_figura(build_fig_evolutivo, df_partido[df_partido['temporada'] == temp])
+
+
+def build_fig_edad(df_edad):
+    # =====================================================================
+    # GRÁFICA 4: Promedio de Abonados Asistentes por Edad (pre-calculado)
+    # =====================================================================
+    promedio_edad = df_edad
+    
+    fig4 = go.Figure()
+    fig4.add_trace(go.Bar(
+        x=promedio_edad['grupo_edad'],
+        y=promedio_edad['asistentes'],
+        marker_color='#18395c',
+        text=[f"{format_with_dots(v)}<br>({p:.1f}%)" for v, p in zip(promedio_edad['asistentes'], promedio_edad['pct'])],
+        textposition='outside',
+        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold')
+    ))
+    max_y_edad = promedio_edad['asistentes'].max() * 1.35 if len(promedio_edad) > 0 else 100
+    fig4.update_layout(
+        height=280,
+        margin=dict(t=10, b=40, l=10, r=10),
+        xaxis=dict(tickfont=dict(size=10, family='Montserrat', weight='bold')),
+        yaxis=dict(visible=False, range=[0, max_y_edad])
+    )
+
+    return fig4
+
+
+@registrar_panel("asistencia.edad")
+def panel_edad(temp):
+    df_edad = get_pre_asistencia_edad()
+    return construir_figura(build_fig_edad, df_edad[df_edad['temporada'] == temp])
+
+
+def build_fig_espectadores(df_partido):
+    # =====================================================================
+    # GRÁFICA 5: Espectadores por Partido (barras con escudos en X).
+    # Comparte el orden y los escudos del evolutivo. La columna mostrada
+    # (`total_espectadores`) coincide con la serie azul del evolutivo y
+    # su promedio aritmético simple es exactamente el KPI homónimo.
+    # =====================================================================
+    datos_g5 = df_partido.sort_values('schedule')
+    rivales_g5 = datos_g5['t2_name'].tolist()
+    results_g5 = datos_g5['result'].tolist()
+    espectadores_vals = datos_g5['total_espectadores'].tolist()
+
+    fig5 = go.Figure()
+    fig5.add_trace(go.Bar(
+        x=list(range(len(rivales_g5))),
+        y=espectadores_vals,
+        marker_color='#3498db',
+        text=[format_with_dots(v) for v in espectadores_vals],
+        textposition='outside',
+        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold'),
+        hovertemplate='<b>Espectadores: %{y:,.0f}</b><extra></extra>',
+    ))
+
+    escudos_g5, result_shapes_g5 = create_escudos_with_result(rivales_g5, results_g5)
+    max_y_g5 = max(espectadores_vals) * 1.15 if espectadores_vals else 100
+
+    fig5.update_layout(
+        height=410,
+        margin=dict(b=70, t=20, l=40, r=20),
+        images=escudos_g5,
+        shapes=result_shapes_g5,
+        xaxis=dict(
+            tickmode='array',
+            tickvals=list(range(len(rivales_g5))),
+            ticktext=['' for _ in rivales_g5],
+            showticklabels=False,
+            range=[-0.5, len(rivales_g5) - 0.5] if rivales_g5 else [0, 1]
+        ),
+        yaxis=dict(showticklabels=False, range=[0, max_y_g5])
+    )
+
+    return fig5
+
+
+@registrar_panel("asistencia.espectadores")
+def panel_espectadores(temp):
+    df_partido = get_pre_asistencia_partido()
+    return construir_figura(build_fig_espectadores, df_partido[df_partido['temporada'] == temp])
+
+
+COLORES_SECTOR = ['#18395c', '#3498db', '#2ecc71', '#f39c12', '#e74c3c', '#9b59b6', '#95a5a6']
+
+
+def _ids_temporada(temp):
+    df_partido = get_pre_asistencia_partido()
+    return df_partido.loc[df_partido['temporada'] == temp, 'id_partido'].tolist()
+
+
+def build_fig_llegadas(curva_sector):
+    # =====================================================================
+    # GRÁFICA 6: Curva de llegada (media por partido cada 5 min, por grada)
+    # =====================================================================
+    fig = go.Figure()
+    if curva_sector.empty:
+        fig.update_layout(annotations=[{"text": "Sin datos", "showarrow": False}], height=320)
+        return fig
+
+    minutos = [int(m) for m in curva_sector.columns]
+    centros = [m + llegadas.ANCHO_MINUTOS / 2 for m in minutos]
+    etiquetas = [llegadas.etiqueta_cubeta(m) for m in minutos]
+    for i, (sector, fila) in enumerate(curva_sector.iterrows()):
+        fig.add_trace(go.Bar(
+            x=centros, y=fila.to_numpy(), name=str(sector), width=llegadas.ANCHO_MINUTOS * 0.9,
+            marker_color=COLORES_SECTOR[i % len(COLORES_SECTOR)],
+            customdata=etiquetas,
+            hovertemplate=f'<b>{sector}</b><br>%{{customdata}}: %{{y:,.0f}} abonados<extra></extra>',
+        ))
+    total = curva_sector.sum(axis=0).to_numpy()
+    acumulado = total.cumsum() / total.sum() * 100 if total.sum() > 0 else total
+    fig.add_trace(go.Scatter(
+        x=[m + llegadas.ANCHO_MINUTOS for m in minutos], y=acumulado, name='% acumulado',
+        yaxis='y2', mode='lines', line=dict(color='#333', width=2),
+        hovertemplate='%{y:.1f}% dentro<extra></extra>',
+    ))
+    tarde = total[[m >= 0 for m in minutos]].sum() / total.sum() * 100 if total.sum() > 0 else 0
+    fig.update_layout(
+        height=320,
+        barmode='stack',
+        bargap=0,
+        margin=dict(t=30, b=40, l=40, r=40),
+        xaxis=dict(title=dict(text="Minutos respecto al inicio", font=dict(size=10)),
+                   tickfont=dict(size=10, family='Montserrat'), dtick=15, zeroline=False),
+        yaxis=dict(tickfont=dict(size=10), gridcolor='#eee'),
+        yaxis2=dict(overlaying='y', side='right', range=[0, 105], showgrid=False,
+                    ticksuffix='%', tickfont=dict(size=10)),
+        legend=dict(orientation='h', y=1.12, x=0.5, xanchor='center', font=dict(size=10)),
+        shapes=[dict(type='line', x0=0, x1=0, y0=0, y1=1, yref='paper',
+                     line=dict(color='#e74c3c', width=1.5, dash='dash'))],
+        annotations=[dict(x=0, y=1, yref='paper', xanchor='left', yanchor='bottom',
+                          text=f" Inicio · después: {tarde:.1f}%", showarrow=False,
+                          font=dict(size=10, color='#e74c3c'))],
+    )
+    return fig
+
+
+def build_fig_accesos(curva_localidad):
+    # =====================================================================
+    # GRÁFICA 7: Pico de llegadas por acceso (localidad del abono)
+    # =====================================================================
+    fig = go.Figure()
+    if curva_localidad.empty:
+        fig.update_layout(annotations=[{"text": "Sin datos", "showarrow": False}], height=320)
+        return fig
+
+    pico = curva_localidad.max(axis=1)
+    minuto_pico = curva_localidad.idxmax(axis=1)
+    total = curva_localidad.sum(axis=1)
+    orden = pico.sort_values().tail(15).index
+    fig.add_trace(go.Bar(
+        x=pico[orden], y=[str(l) for l in orden], orientation='h',
+        marker_color='#18395c',
+        text=[f"{format_with_dots(round(v))} · {llegadas.etiqueta_cubeta(m)}"
+              for v, m in zip(pico[orden], minuto_pico[orden])],
+        textposition='outside',
+        textfont=dict(color='#333', size=10, family='Montserrat'),
+        hovertext=[f"<b>{l}</b><br>Pico: {format_with_dots(round(pico[l]))} abonados en 5 min"
+                   f"<br>Franja: {llegadas.etiqueta_cubeta(minuto_pico[l])}"
+                   f"<br>Abonados por partido: {format_with_dots(round(total[l]))}" for l in orden],
+        hoverinfo='text',
+    ))
+    fig.update_layout(
+        height=max(320, len(orden) * 22),
+        margin=dict(t=10, b=20, l=130, r=40),
+        xaxis=dict(showticklabels=False, range=[0, pico.max() * 1.6]),
+        yaxis=dict(tickfont=dict(size=10, family='Montserrat')),
+    )
+    return fig
+
+
+@registrar_panel("asistencia.llegadas")
+def panel_llegadas(temp):
+    curva_sector, _ = llegadas.curva(_ids_temporada(temp), por="sector")
+    return construir_figura(build_fig_llegadas, curva_sector)
+
+
+@registrar_panel("asistencia.accesos")
+def panel_accesos(temp):
+    curva_localidad, _ = llegadas.curva(_ids_temporada(temp), por="localidad")
+    return construir_figura(build_fig_accesos, curva_localidad)
+
+
 @callback(
     Output("content-asistencia", "children"),
     Input("content-asistencia", "id"),
     Input("temp-store-asistencia", "data"),
+    **segundo_plano.opciones("progreso-asistencia"),
 )
+@presupuesto(PRESUPUESTO_PAGINA)
+@con_marca_datos
 def update_page(_, temp_seleccionada):
     """Actualiza todas las gráficas con datos pre-calculados.
 
-    `temp_seleccionada` viene del toggle Temporada 24/25.
+    `temp_seleccionada` viene del toggle Temporada 24/25. Cada bloque es un
+    panel independiente; los que no terminan dentro del plazo de render se
+    muestran con un marcador y se completan después.
     """
+    temp = temp_seleccionada or 'actual'
     try:
-        df_kpis = get_pre_asistencia_kpis()
-        df_sector = get_pre_asistencia_sector()
-        df_consecutiva = get_pre_asistencia_consecutiva()
-        df_partido_full = get_pre_asistencia_partido()
-        df_edad = get_pre_asistencia_edad()
-
-        temp = temp_seleccionada or 'actual'
-        es_anterior = (temp == 'anterior')
-
-        if df_kpis.empty:
-            empty_fig = go.Figure()
-            empty_fig.update_layout(
-                annotations=[{"text": "No hay datos disponibles. Ejecuta sync_data.py primero.", "showarrow": False}]
-            )
-            return create_page_content([], empty_fig, empty_fig, empty_fig, empty_fig, empty_fig)
-
-        # Filtrar todas las tablas a la temporada seleccionada.
-        # Mantenemos `df_partido_anterior` aparte para calcular comparativas
-        # de los KPIs derivados de la gráfica del evolutivo.
-        df_sector = df_sector[df_sector['temporada'] == temp]
-        df_consecutiva = df_consecutiva[df_consecutiva['temporada'] == temp]
-        df_partido = df_partido_full[df_partido_full['temporada'] == temp]
-        df_partido_anterior = (df_partido_full[df_partido_full['temporada'] == 'anterior']
-                                if not es_anterior else pd.DataFrame())
-        df_edad = df_edad[df_edad['temporada'] == temp]
-
-        # =====================================================================
-        # KPIs (pre-calculados; en modo anterior se omite la comparativa)
-        # =====================================================================
-        kpi_sel = df_kpis[df_kpis['temporada'] == temp]
-        kpi_otra = df_kpis[df_kpis['temporada'] == ('anterior' if not es_anterior else 'actual')]
-        if kpi_sel.empty:
-            empty_fig = go.Figure()
-            empty_fig.update_layout(
-                annotations=[{"text": f"Sin datos KPI para temporada {('24/25' if es_anterior else '25/26')}",
-                              "showarrow": False}]
-            )
-            return create_page_content([], empty_fig, empty_fig, empty_fig, empty_fig, empty_fig)
-        kpi_actual = kpi_sel.iloc[0]
-        # Cuando se muestra temp anterior, no hay comparativa: usamos zeros como anterior
-        if es_anterior or kpi_otra.empty:
-            kpi_anterior = pd.Series({
-                'promedio_asistentes': 0, 'pct_asistencia': 0,
-                'edad_promedio': 0, 'promedio_tarde': 0, 'pct_tarde': 0,
-                'male_count': 0, 'female_count': 0,
-                'male_pct': 0.0, 'female_pct': 0.0,
-                'total_abonados': 0,
-            })
-        else:
-            kpi_anterior = kpi_otra.iloc[0]
-
-        # =====================================================================
-        # PROMEDIOS POR PARTIDO — calculados desde df_partido para garantizar
-        # que coincidan exactamente con los valores que se muestran en las
-        # gráficas "Evolutivo de Asistencia ABANCA - Riazor" y "Espectadores
-        # por Partido". El usuario que sume manualmente los valores y divida
-        # entre N partidos obtiene EXACTAMENTE el valor del KPI.
-        # =====================================================================
-        n_partidos_actual = len(df_partido)
-        promedio_asistentes_actual = (df_partido['abonados_asistentes'].mean()
-                                       if n_partidos_actual > 0 else 0)
-        promedio_espectadores_actual = (df_partido['total_espectadores'].mean()
-                                          if n_partidos_actual > 0 else 0)
-
-        n_partidos_ant = len(df_partido_anterior)
-        promedio_asistentes_ant = (df_partido_anterior['abonados_asistentes'].mean()
-                                    if n_partidos_ant > 0 else 0)
-        promedio_espectadores_ant = (df_partido_anterior['total_espectadores'].mean()
-                                       if n_partidos_ant > 0 else 0)
-
-        # Pct asistencia recalculado a partir del nuevo promedio
-        # (pre_asistencia_kpis.total_abonados sigue siendo la población base)
-        total_abonados_actual = kpi_actual.get('total_abonados', 0) or 0
-        pct_actual = ((promedio_asistentes_actual / total_abonados_actual * 100)
-                       if total_abonados_actual > 0 else 0)
-
-        total_abonados_ant = kpi_anterior.get('total_abonados', 0) or 0
-        pct_ant = ((promedio_asistentes_ant / total_abonados_ant * 100)
-                    if total_abonados_ant > 0 else 0)
-        
-        # KPI tooltip helpers
-        TT_sexo = "Distribución por género de los abonados asistentes al estadio."
-
-        # Crear KPI de sexo manualmente desde datos pre-calculados
-        sexo_lbl = ["Sexo de los Abonados", _kpi_tooltip(TT_sexo)]
-        sexo_label_div = html.Div(sexo_lbl, className="kpi-label-top",
-                                  style={"display": "flex", "alignItems": "center",
-                                         "justifyContent": "center", "gap": "5px"})
-        df_sexo_kpi = html.Div([
-            sexo_label_div,
-            html.Div([
-                html.Div([
-                    html.Span(format_with_dots(kpi_actual['male_count']), style={"fontSize": "1.2rem", "fontWeight": "700", "color": "#2c5282"}),
-                    html.Span(f" ({kpi_actual['male_pct']:.1f}%)", style={"fontSize": "0.8rem", "fontWeight": "600", "color": "#2c5282"}),
-                    html.Div("Masculino", style={"fontSize": "0.65rem", "color": "#666", "marginTop": "2px"}),
-                ], style={"display": "inline-block", "textAlign": "center", "marginRight": "15px"}),
-                html.Div([
-                    html.Span(format_with_dots(kpi_actual['female_count']), style={"fontSize": "1.2rem", "fontWeight": "700", "color": "#FFB5C0"}),
-                    html.Span(f" ({kpi_actual['female_pct']:.1f}%)", style={"fontSize": "0.8rem", "fontWeight": "600", "color": "#FFB5C0"}),
-                    html.Div("Femenino", style={"fontSize": "0.65rem", "color": "#666", "marginTop": "2px"}),
-                ], style={"display": "inline-block", "textAlign": "center"}),
-            ], style={"display": "flex", "justifyContent": "center", "gap": "10px"}),
-        ], className="kpi-card")
-        
-        comparar = not es_anterior
-        kpis = html.Div([
-            create_kpi_espectadores(
-                promedio_espectadores_actual, promedio_espectadores_ant,
-                tooltip="Media de espectadores totales por partido (abonados asistentes + entradas vendidas + invitaciones). Coincide exactamente con el promedio de la serie azul del evolutivo y de la gráfica 'Espectadores por Partido'.",
-                comparar=comparar,
-            ),
-            create_kpi_abonados(
-                promedio_asistentes_actual, pct_actual,
-                promedio_asistentes_ant, pct_ant,
-                tooltip="Media de abonados que accedieron al estadio por partido (registro de tornos). Se excluyen abonos 'SIN ASIENTO', 'CERO' y 'AREA 1906'. Coincide con el promedio de la serie roja del evolutivo. El % se calcula sobre el total de abonados.",
-                comparar=comparar,
-            ),
-            df_sexo_kpi,
-            create_kpi_edad(kpi_actual['edad_promedio'],
-                           tooltip="Edad media de los abonados asistentes."),
-            create_kpi_tardios(
-                kpi_actual['promedio_tarde'], kpi_actual['pct_tarde'],
-                kpi_anterior['promedio_tarde'], kpi_anterior['pct_tarde'],
-                tooltip="Media de abonados que accedieron al estadio después del inicio del partido. Un valor menor indica mayor puntualidad.",
-                comparar=comparar,
-            ),
-        ], className="kpis-row")
-        
-        # =====================================================================
-        # GRÁFICA 1: % Promedio de Asistencia por Grada (pre-calculado)
-        # =====================================================================
-        promedio_sector = df_sector.sort_values('pct_asistencia', ascending=False)
-        
-        fig1 = go.Figure()
-        fig1.add_trace(go.Bar(
-            x=promedio_sector['sector'],
-            y=promedio_sector['pct_asistencia'],
-            marker_color='#18395c',
-            text=[f"{format_with_dots(a)}<br>{v:.1f}%" for a, v in zip(promedio_sector['asistentes'], promedio_sector['pct_asistencia'])],
-            textposition='outside',
-            textfont=dict(color='#333', size=11, family='Montserrat', weight='bold')
-        ))
-        max_y_grada = promedio_sector['pct_asistencia'].max() * 1.3 if len(promedio_sector) > 0 else 100
-        fig1.update_layout(
-            height=280,
-            margin=dict(t=10, b=40, l=10, r=10),
-            xaxis=dict(tickfont=dict(size=10, family='Montserrat', weight='bold')),
-            yaxis=dict(visible=False, range=[0, max_y_grada])
-        )
-        
-        # =====================================================================
-        # GRÁFICA 2: Abonados con Asistencia Consecutiva (pre-calculado)
-        # =====================================================================
-        rivales_list = df_consecutiva['t2_name'].tolist()
-        results_list = df_consecutiva['result'].tolist()
-        abonados_consecutivos = df_consecutiva['abonados_consecutivos'].tolist()
-        
-        fig2 = go.Figure()
-        fig2.add_trace(go.Bar(
-            x=list(range(len(rivales_list))),
-            y=abonados_consecutivos,
-            marker_color='#18395c',
-            text=[format_with_dots(v) for v in abonados_consecutivos],
-            textposition='outside',
-            textfont=dict(color='#333', size=10, family='Montserrat', weight='bold')
-        ))
-        
-        # Eje X con escudos en el mismo formato que el evolutivo (fig3):
-        # y_pos=-0.09 (cerca del borde inferior), tamaño y márgenes uniformes.
-        escudos_images_f2, result_shapes_f2 = create_escudos_with_result(
-            rivales_list, results_list
-        )
-
-        max_y = max(abonados_consecutivos) * 1.2 if abonados_consecutivos else 100
-        fig2.update_layout(
-            height=410,                         # +10px sobre el evolutivo
-            margin=dict(b=60, t=20, l=40, r=20),  # +10px de espacio inferior
-            images=escudos_images_f2,
-            shapes=result_shapes_f2,
-            xaxis=dict(
-                tickmode='array',
-                tickvals=list(range(len(rivales_list))),
-                ticktext=['' for _ in rivales_list],
-                showticklabels=False,
-                range=[-0.5, len(rivales_list) - 0.5] if rivales_list else [0, 1]
-            ),
-            yaxis=dict(title='Abonados Consecutivos', range=[0, max_y])
-        )
-        
-        # =====================================================================
-        # GRÁFICA 3: Espectadores Totales vs Abonados (pre-calculado)
-        # =====================================================================
-        datos_grafica = df_partido.sort_values('schedule')
-        rivales_g3 = datos_grafica['t2_name'].tolist()
-        results_g3 = datos_grafica['result'].tolist()
-        
-        fig3 = go.Figure()
-        fig3.add_trace(go.Scatter(
-            x=list(range(len(rivales_g3))),
-            y=datos_grafica['total_espectadores'],
-            mode='lines+markers+text',
-            name='Espectadores Totales',
-            line=dict(color='#3498db', width=2),
-            marker=dict(size=8),
-            text=[format_with_dots(v) for v in datos_grafica['total_espectadores']],
-            textposition='top center',
-            textfont=dict(size=9, color='#3498db', weight='bold')
-        ))
-        fig3.add_trace(go.Scatter(
-            x=list(range(len(rivales_g3))),
-            y=datos_grafica['abonados_asistentes'],
-            mode='lines+markers+text',
-            name='Abonados Asistentes',
-            line=dict(color='#e74c3c', width=2),
-            marker=dict(size=8),
-            text=[format_with_dots(v) for v in datos_grafica['abonados_asistentes']],
-            textposition='bottom center',
-            textfont=dict(size=9, color='#e74c3c', weight='bold')
-        ))
-        
-        escudos_g3, result_shapes_g3 = create_escudos_with_result(rivales_g3, results_g3)
-        
-        fig3.update_layout(
-            height=410,
-            margin=dict(b=70, t=20, l=40, r=20),  # +20px abajo para escudos
-            images=escudos_g3,
-            shapes=result_shapes_g3,
-            showlegend=False,
-            xaxis=dict(
-                tickmode='array',
-                tickvals=list(range(len(rivales_g3))),
-                ticktext=['' for _ in rivales_g3],
-                showticklabels=False,
-                range=[-0.5, len(rivales_g3) - 0.5] if rivales_g3 else [0, 1]
-            ),
-            yaxis=dict(title='Personas')
-        )
-        
-        # =====================================================================
-        # GRÁFICA 4: Promedio de Abonados Asistentes por Edad (pre-calculado)
-        # =====================================================================
-        promedio_edad = df_edad
-        
-        fig4 = go.Figure()
-        fig4.add_trace(go.Bar(
-            x=promedio_edad['grupo_edad'],
-            y=promedio_edad['asistentes'],
-            marker_color='#18395c',
-            text=[f"{format_with_dots(v)}<br>({p:.1f}%)" for v, p in zip(promedio_edad['asistentes'], promedio_edad['pct'])],
-            textposition='outside',
-            textfont=dict(color='#333', size=10, family='Montserrat', weight='bold')
-        ))
-        max_y_edad = promedio_edad['asistentes'].max() * 1.35 if len(promedio_edad) > 0 else 100
-        fig4.update_layout(
-            height=280,
-            margin=dict(t=10, b=40, l=10, r=10),
-            xaxis=dict(tickfont=dict(size=10, family='Montserrat', weight='bold')),
-            yaxis=dict(visible=False, range=[0, max_y_edad])
-        )
-
-        # =====================================================================
-        # GRÁFICA 5: Espectadores por Partido (barras con escudos en X).
-        # Comparte el orden y los escudos del evolutivo. La columna mostrada
-        # (`total_espectadores`) coincide con la serie azul del evolutivo y
-        # su promedio aritmético simple es exactamente el KPI homónimo.
-        # =====================================================================
-        datos_g5 = df_partido.sort_values('schedule')
-        rivales_g5 = datos_g5['t2_name'].tolist()
-        results_g5 = datos_g5['result'].tolist()
-        espectadores_vals = datos_g5['total_espectadores'].tolist()
-
-        fig5 = go.Figure()
-        fig5.add_trace(go.Bar(
-            x=list(range(len(rivales_g5))),
-            y=espectadores_vals,
-            marker_color='#3498db',
-            text=[format_with_dots(v) for v in espectadores_vals],
-            textposition='outside',
-            textfont=dict(color='#333', size=10, family='Montserrat', weight='bold'),
-            hovertemplate='<b>Espectadores: %{y:,.0f}</b><extra></extra>',
-        ))
-
-        escudos_g5, result_shapes_g5 = create_escudos_with_result(rivales_g5, results_g5)
-        max_y_g5 = max(espectadores_vals) * 1.15 if espectadores_vals else 100
-
-        fig5.update_layout(
-            height=410,
-            margin=dict(b=70, t=20, l=40, r=20),
-            images=escudos_g5,
-            shapes=result_shapes_g5,
-            xaxis=dict(
-                tickmode='array',
-                tickvals=list(range(len(rivales_g5))),
-                ticktext=['' for _ in rivales_g5],
-                showticklabels=False,
-                range=[-0.5, len(rivales_g5) - 0.5] if rivales_g5 else [0, 1]
-            ),
-            yaxis=dict(showticklabels=False, range=[0, max_y_g5])
-        )
-
-        return create_page_content(kpis, fig1, fig2, fig3, fig4, fig5)
+        p = renderizar({
+            "kpis": ("asistencia.kpis", (temp,)),
+            "grada": ("asistencia.grada", (temp,)),
+            "consecutiva": ("asistencia.consecutiva", (temp,)),
+            "evolutivo": ("asistencia.evolutivo", (temp,)),
+            "edad": ("asistencia.edad", (temp,)),
+            "espectadores": ("asistencia.espectadores", (temp,)),
+            "llegadas": ("asistencia.llegadas", (temp,)),
+            "accesos": ("asistencia.accesos", (temp,)),
+        })
+        return create_page_content(p["kpis"], p["grada"], p["consecutiva"],
+                                   p["evolutivo"], p["edad"], p["espectadores"],
+                                   p["llegadas"], p["accesos"])
 
     except Exception as e:
         print(f"Error en asistencia: {e}")
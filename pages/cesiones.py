@@ -11,7 +11,9 @@ import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
 from database import get_pre_cesiones_partido, get_pre_cesiones_recaudacion, get_pre_cesiones_sector
-from components import temporada_toggle
+import escudos
+from components import temporada_toggle, con_marca_datos, figura_por_categoria
+from metricas import PRESUPUESTO_PAGINA, presupuesto
 
 dash.register_page(__name__, path="/estadio/cesiones", name="Cesiones")
 
@@ -19,6 +21,12 @@ dash.register_page(__name__, path="/estadio/cesiones", name="Cesiones")
 INICIO_TEMP_ACTUAL = datetime(2025, 8, 1)
 INICIO_TEMP_ANTERIOR = datetime(2024, 8, 1)
 
+DIAS_ES = {
+    'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
+    'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
+}
+ORDEN_DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
 # Mapeo de nombres de equipos a archivos de escudos
 ESCUDOS_MAP = {
     'Albacete': 'Albacete BP.png',
@@ -96,10 +104,10 @@ ESCUDOS_MAP = {
 
 
 def get_escudo_path(team_name):
-    """Obtiene la ruta del escudo para un equipo."""
+    """Obtiene la URL del escudo (variante optimizada) para un equipo."""
     escudo_file = ESCUDOS_MAP.get(team_name)
     if escudo_file:
-        return f"/assets/Escudos/{escudo_file}"
+        return escudos.url(escudo_file)
     return None
 
 
@@ -335,6 +343,8 @@ def create_page_content(kpis, fig_recaudacion, fig1, fig2, fig3):
     Input("content-cesiones", "id"),
     Input("temp-store-cesiones", "data"),
 )
+@presupuesto(PRESUPUESTO_PAGINA)
+@con_marca_datos
 def update_graphs(_, temp_seleccionada):
     """Actualiza todas las gráficas con datos pre-calculados.
 
@@ -480,90 +490,15 @@ def update_graphs(_, temp_seleccionada):
     )
     
     # Gráfica 2: Promedio por día de la semana
-    dias_traduccion = {
-        'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
-        'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
-    }
     df_partido = df_partido.copy()
-    df_partido['dia_semana_es'] = df_partido['dia_semana'].map(dias_traduccion)
-    
-    df_partido_dia = df_partido.groupby('dia_semana_es').agg({
-        'vendidas': 'mean',
-        'id_partido': 'count',
-        't2_name': lambda x: list(x)
-    }).reset_index()
-    df_partido_dia.columns = ['dia_semana', 'promedio_vendidas', 'num_partidos', 'rivales']
-    
-    orden_dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    df_partido_dia['dia_semana'] = pd.Categorical(df_partido_dia['dia_semana'], categories=orden_dias, ordered=True)
-    df_partido_dia = df_partido_dia.sort_values('dia_semana').dropna()
-    
-    hover_dia = [
-        f"<b>{d}</b><br>Promedio: {format_number(p)}<br>Partidos: {int(n)} ({', '.join(r)})"
-        for d, p, n, r in zip(
-            df_partido_dia['dia_semana'].astype(str),
-            df_partido_dia['promedio_vendidas'],
-            df_partido_dia['num_partidos'],
-            df_partido_dia['rivales'],
-        )
-    ]
-    
-    fig2 = go.Figure()
-    fig2.add_trace(go.Bar(
-        x=df_partido_dia['dia_semana'].astype(str),
-        y=df_partido_dia['promedio_vendidas'],
-        marker_color='#18395c',
-        text=[f"{format_number(v)}" for v in df_partido_dia['promedio_vendidas']],
-        textposition='outside',
-        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold'),
-        hovertext=hover_dia,
-        hoverinfo='text',
-    ))
-    max_y_dia = df_partido_dia['promedio_vendidas'].max() * 1.25
-    fig2.update_layout(
-        height=200,
-        margin=dict(t=30, b=30, l=20, r=20),
-        xaxis=dict(type='category', tickfont=dict(size=10, family='Montserrat', weight='bold')),
-        yaxis=dict(showticklabels=False, range=[0, max_y_dia])
-    )
-    
+    df_partido['dia_semana_es'] = df_partido['dia_semana'].map(DIAS_ES)
+    fig2 = figura_por_categoria(df_partido, 'dia_semana_es', 'vendidas', orden=ORDEN_DIAS,
+                                formato=format_number)
+
     # Gráfica 3: Promedio por hora del partido
-    df_hora_agg = df_partido.groupby('hora_exacta').agg({
-        'vendidas': 'mean',
-        'id_partido': 'count',
-        't2_name': lambda x: list(x)
-    }).reset_index()
-    df_hora_agg.columns = ['hora', 'promedio_vendidas', 'num_partidos', 'rivales']
-    
-    hover_hora = [
-        f"<b>Hora: {h}</b><br>Promedio: {format_number(p)}<br>Partidos: {int(n)} ({', '.join(r)})"
-        for h, p, n, r in zip(
-            df_hora_agg['hora'],
-            df_hora_agg['promedio_vendidas'],
-            df_hora_agg['num_partidos'],
-            df_hora_agg['rivales'],
-        )
-    ]
-    
-    fig3 = go.Figure()
-    fig3.add_trace(go.Bar(
-        x=df_hora_agg['hora'],
-        y=df_hora_agg['promedio_vendidas'],
-        marker_color='#18395c',
-        text=[f"{format_number(v)}" for v in df_hora_agg['promedio_vendidas']],
-        textposition='outside',
-        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold'),
-        hovertext=hover_hora,
-        hoverinfo='text',
-    ))
-    max_y_hora = df_hora_agg['promedio_vendidas'].max() * 1.25
-    fig3.update_layout(
-        height=200,
-        margin=dict(t=30, b=30, l=20, r=20),
-        xaxis=dict(tickfont=dict(size=10, family='Montserrat', weight='bold')),
-        yaxis=dict(showticklabels=False, range=[0, max_y_hora])
-    )
-    
+    fig3 = figura_por_categoria(df_partido, 'hora_exacta', 'vendidas', formato=format_number,
+                                etiqueta='Hora: ')
+
     # Gráfica Recaudación: Recaudación por cesiones por partido (con escudos).
     # Reutiliza df_rec_actual ya cargado al inicio del callback (misma fuente
     # que el KPI "Recaudación Total" para garantizar consistencia visual).
@@ -13,6 +13,9 @@ from database import (
     get_pre_deportiendas_por_tienda, get_pre_deportiendas_top_productos,
     get_pre_deportiendas_producto_tienda, get_pre_deportiendas_canal,
 )
+import escudos
+from components import con_marca_datos, figura_por_categoria
+from metricas import PRESUPUESTO_PAGINA, presupuesto
 
 dash.register_page(__name__, path="/deportiendas", name="Dépor Tiendas")
 
@@ -50,7 +53,7 @@ ESCUDOS_MAP = {
 
 def get_escudo_path(team_name):
     f = ESCUDOS_MAP.get(team_name)
-    return f"/assets/Escudos/{f}" if f else None
+    return escudos.url(f) if f else None
 
 
 def fmt(val):
@@ -237,134 +240,34 @@ def build_fig_canal(df_canal):
     return fig
 
 
-def build_fig_dia_semana(df_matchday):
-    """Barras agrupadas 24/25 vs 25/26: promedio ventas matchday Riazor por día."""
-    df = df_matchday.copy()
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    df['dow'] = df['fecha'].dt.dayofweek
-    # Agrupar L/M/X/J (0-3) como Intersemanales
-    df['categoria'] = df['dow'].apply(lambda d: 'Intersemanales' if d <= 3 else
-                                       {4: 'Viernes', 5: 'Sábado', 6: 'Domingo'}[d])
-    cat_order = ['Intersemanales', 'Viernes', 'Sábado', 'Domingo']
-
-    # Recoger rivales por (temporada, categoria)
-    rivals_map = df.groupby(['temporada', 'categoria'])['rival'].apply(list).to_dict()
-
-    grouped = df.groupby(['temporada', 'categoria']).agg(
-        total=('ventas_riazor', 'sum'),
-        n_partidos=('ventas_riazor', 'count'),
-    ).reset_index()
-    grouped['promedio'] = (grouped['total'] / grouped['n_partidos']).round(0)
-
-    actual = grouped[grouped['temporada'] == 'actual']
-    anterior = grouped[grouped['temporada'] == 'anterior']
+# Día de la semana (0=lunes) -> categoría; L/M/X/J se agrupan como Intersemanales
+CATEGORIA_DIA = {0: 'Intersemanales', 1: 'Intersemanales', 2: 'Intersemanales',
+                 3: 'Intersemanales', 4: 'Viernes', 5: 'Sábado', 6: 'Domingo'}
+ORDEN_CATEGORIAS_DIA = ['Intersemanales', 'Viernes', 'Sábado', 'Domingo']
 
-    present_cats = [c for c in cat_order if c in actual['categoria'].values or c in anterior['categoria'].values]
 
-    def get_vals(sub, cats, temp):
-        m = sub.set_index('categoria')
-        promedios = [m.loc[c, 'promedio'] if c in m.index else 0 for c in cats]
-        ns = [int(m.loc[c, 'n_partidos']) if c in m.index else 0 for c in cats]
-        totales = [m.loc[c, 'total'] if c in m.index else 0 for c in cats]
-        rivales = [', '.join(rivals_map.get((temp, c), [])) for c in cats]
-        return promedios, ns, totales, rivales
-
-    p_ant, n_ant, t_ant, r_ant = get_vals(anterior, present_cats, 'anterior')
-    p_act, n_act, t_act, r_act = get_vals(actual, present_cats, 'actual')
+def _fig_matchday_por_categoria(df, categoria, orden=None, titulo_x=None):
+    """Barras agrupadas 24/25 vs 25/26 del promedio de ventas Riazor por `categoria`."""
+    return figura_por_categoria(
+        df, categoria, 'ventas_riazor', orden=orden, temporada='temporada', rival='rival',
+        formato=fmt, sufijo='€', mostrar_total=True, redondear=True, tamano_texto=9,
+        height=350, margin=dict(t=10, b=30, l=20, r=20),
+        xaxis=dict(type='category', tickfont=dict(size=11, weight='normal'), title=titulo_x),
+    )
 
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        name='24/25', x=present_cats, y=p_ant,
-        marker_color='#3498db',
-        text=[fmt(v) + '€' if v > 0 else '' for v in p_ant],
-        textposition='outside',
-        textfont=dict(color='#333', size=9, family='Montserrat', weight='bold'),
-        hovertext=[f"<b>{c} (24/25)</b><br>Promedio: {fmt(p)}€<br>Partidos: {n} ({r})<br>Total: {fmt(t)}€"
-                   for c, p, n, t, r in zip(present_cats, p_ant, n_ant, t_ant, r_ant)],
-        hoverinfo='text',
-    ))
-    fig.add_trace(go.Bar(
-        name='25/26', x=present_cats, y=p_act,
-        marker_color='#18395c',
-        text=[fmt(v) + '€' if v > 0 else '' for v in p_act],
-        textposition='outside',
-        textfont=dict(color='#333', size=9, family='Montserrat', weight='bold'),
-        hovertext=[f"<b>{c} (25/26)</b><br>Promedio: {fmt(p)}€<br>Partidos: {n} ({r})<br>Total: {fmt(t)}€"
-                   for c, p, n, t, r in zip(present_cats, p_act, n_act, t_act, r_act)],
-        hoverinfo='text',
-    ))
 
-    max_y = max(max(p_ant + [0]), max(p_act + [0])) * 1.25
-    fig.update_layout(
-        barmode='group', height=350, margin=dict(t=10, b=30, l=20, r=20),
-        xaxis=dict(tickfont=dict(size=11, family='Montserrat')),
-        yaxis=dict(showticklabels=False, range=[0, max_y]),
-        showlegend=False,
-    )
-    return fig
+def build_fig_dia_semana(df_matchday):
+    """Barras agrupadas 24/25 vs 25/26: promedio ventas matchday Riazor por día."""
+    df = df_matchday.copy()
+    df['categoria'] = pd.to_datetime(df['fecha']).dt.dayofweek.map(CATEGORIA_DIA)
+    return _fig_matchday_por_categoria(df, 'categoria', ORDEN_CATEGORIAS_DIA)
 
 
 def build_fig_franja_horaria(df_matchday):
     """Barras agrupadas 24/25 vs 25/26: promedio ventas matchday Riazor por franja horaria."""
     df = df_matchday.copy()
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    df['hora'] = df['fecha'].apply(lambda x: x.strftime('%H:%M'))
-
-    # Recoger rivales por (temporada, hora)
-    rivals_map = df.groupby(['temporada', 'hora'])['rival'].apply(list).to_dict()
-
-    grouped = df.groupby(['temporada', 'hora']).agg(
-        total=('ventas_riazor', 'sum'),
-        n_partidos=('ventas_riazor', 'count'),
-    ).reset_index()
-    grouped['promedio'] = (grouped['total'] / grouped['n_partidos']).round(0)
-
-    actual = grouped[grouped['temporada'] == 'actual'].sort_values('hora')
-    anterior = grouped[grouped['temporada'] == 'anterior'].sort_values('hora')
-
-    all_hours = sorted(set(actual['hora'].tolist() + anterior['hora'].tolist()))
-
-    def get_vals(sub, hours, temp):
-        m = sub.set_index('hora')
-        promedios = [m.loc[h, 'promedio'] if h in m.index else 0 for h in hours]
-        ns = [int(m.loc[h, 'n_partidos']) if h in m.index else 0 for h in hours]
-        totales = [m.loc[h, 'total'] if h in m.index else 0 for h in hours]
-        rivales = [', '.join(rivals_map.get((temp, h), [])) for h in hours]
-        return promedios, ns, totales, rivales
-
-    p_ant, n_ant, t_ant, r_ant = get_vals(anterior, all_hours, 'anterior')
-    p_act, n_act, t_act, r_act = get_vals(actual, all_hours, 'actual')
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        name='24/25', x=all_hours, y=p_ant,
-        marker_color='#3498db',
-        text=[fmt(v) + '€' if v > 0 else '' for v in p_ant],
-        textposition='outside',
-        textfont=dict(color='#333', size=9, family='Montserrat', weight='bold'),
-        hovertext=[f"<b>{h} (24/25)</b><br>Promedio: {fmt(p)}€<br>Partidos: {n} ({r})<br>Total: {fmt(t)}€"
-                   for h, p, n, t, r in zip(all_hours, p_ant, n_ant, t_ant, r_ant)],
-        hoverinfo='text',
-    ))
-    fig.add_trace(go.Bar(
-        name='25/26', x=all_hours, y=p_act,
-        marker_color='#18395c',
-        text=[fmt(v) + '€' if v > 0 else '' for v in p_act],
-        textposition='outside',
-        textfont=dict(color='#333', size=9, family='Montserrat', weight='bold'),
-        hovertext=[f"<b>{h} (25/26)</b><br>Promedio: {fmt(p)}€<br>Partidos: {n} ({r})<br>Total: {fmt(t)}€"
-                   for h, p, n, t, r in zip(all_hours, p_act, n_act, t_act, r_act)],
-        hoverinfo='text',
-    ))
-
-    max_y = max(max(p_ant + [0]), max(p_act + [0])) * 1.25
-    fig.update_layout(
-        barmode='group', height=350, margin=dict(t=10, b=30, l=20, r=20),
-        xaxis=dict(tickfont=dict(size=11, family='Montserrat'), title='Hora de Inicio'),
-        yaxis=dict(showticklabels=False, range=[0, max_y]),
-        showlegend=False,
-    )
-    return fig
+    df['hora'] = pd.to_datetime(df['fecha']).dt.strftime('%H:%M')
+    return _fig_matchday_por_categoria(df, 'hora', titulo_x='Hora de Inicio')
 
 
 def build_fig_matchday(df_matchday_actual):
@@ -476,6 +379,8 @@ def create_kpi_comparativa(valor_actual, valor_anterior, label, small_title=Fals
     Output("content-deportiendas", "children"),
     Input("content-deportiendas", "id"),
 )
+@presupuesto(PRESUPUESTO_PAGINA)
+@con_marca_datos
 def update_page(_):
     try:
         df_kpis = get_pre_deportiendas_kpis()
@@ -11,7 +11,10 @@ import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime, date
 from database import get_pre_entradas_partido, get_pre_entradas_sector
-from components import temporada_toggle
+import escudos
+from components import temporada_toggle, con_marca_datos, figura_por_categoria
+from metricas import PRESUPUESTO_PAGINA, presupuesto
+from jornadas import comparables
 
 dash.register_page(__name__, path="/estadio/entradas", name="Entradas")
 
@@ -19,6 +22,12 @@ dash.register_page(__name__, path="/estadio/entradas", name="Entradas")
 INICIO_TEMP_ACTUAL = datetime(2025, 8, 1)
 INICIO_TEMP_ANTERIOR = datetime(2024, 8, 1)
 
+DIAS_ES = {
+    'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
+    'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
+}
+ORDEN_DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
 # Mapeo de nombres de equipos a archivos de escudos
 ESCUDOS_MAP = {
     'Albacete': 'Albacete BP.png',
@@ -96,10 +105,10 @@ ESCUDOS_MAP = {
 
 
 def get_escudo_path(team_name):
-    """Obtiene la ruta del escudo para un equipo."""
+    """Obtiene la URL del escudo (variante optimizada) para un equipo."""
     escudo_file = ESCUDOS_MAP.get(team_name)
     if escudo_file:
-        return f"/assets/Escudos/{escudo_file}"
+        return escudos.url(escudo_file)
     return None
 
 
@@ -327,6 +336,8 @@ def create_page_content(kpis, fig1, fig2, fig3, fig4):
     Input("content-entradas", "id"),
     Input("temp-store-entradas", "data"),
 )
+@presupuesto(PRESUPUESTO_PAGINA)
+@con_marca_datos
 def update_page(_, temp_seleccionada):
     """Actualiza todas las gráficas con datos pre-calculados.
 
@@ -345,12 +356,11 @@ def update_page(_, temp_seleccionada):
 
     df_partido = df_all[df_all['temporada'] == temp].sort_values('schedule')
     # Comparativa justa: cuando el toggle está inactivo (modo 25/26), comparamos
-    # solo con los primeros N partidos de 24/25 (los equivalentes en jornada).
+    # solo con las mismas jornadas de 24/25 (ver `jornadas`).
     # Cuando el toggle está activo (modo 24/25), df_partido ya contiene los 21
     # partidos completos de la temporada cerrada.
     if not es_anterior:
-        df_partido_ant_full = df_all[df_all['temporada'] == 'anterior'].sort_values('schedule')
-        df_partido_ant = df_partido_ant_full.head(len(df_partido))
+        df_partido_ant = comparables(df_all)[1].sort_values('schedule')
     else:
         df_partido_ant = pd.DataFrame()
 
@@ -469,90 +479,15 @@ def update_page(_, temp_seleccionada):
     )
     
     # Gráfica 2: Promedio por día de la semana
-    dias_traduccion = {
-        'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
-        'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
-    }
     df_partido = df_partido.copy()
-    df_partido['dia_semana_es'] = df_partido['dia_semana'].map(dias_traduccion)
-    
-    df_partido_dia = df_partido.groupby('dia_semana_es').agg({
-        'n_publico': 'mean',
-        'id_partido': 'count',
-        't2_name': lambda x: list(x)
-    }).reset_index()
-    df_partido_dia.columns = ['dia_semana', 'promedio_vendidas', 'num_partidos', 'rivales']
-    
-    orden_dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    df_partido_dia['dia_semana'] = pd.Categorical(df_partido_dia['dia_semana'], categories=orden_dias, ordered=True)
-    df_partido_dia = df_partido_dia.sort_values('dia_semana').dropna()
-    
-    hover_dia = [
-        f"<b>{d}</b><br>Promedio: {format_number(p)}<br>Partidos: {int(n)} ({', '.join(r)})"
-        for d, p, n, r in zip(
-            df_partido_dia['dia_semana'].astype(str),
-            df_partido_dia['promedio_vendidas'],
-            df_partido_dia['num_partidos'],
-            df_partido_dia['rivales'],
-        )
-    ]
-    
-    fig2 = go.Figure()
-    fig2.add_trace(go.Bar(
-        x=df_partido_dia['dia_semana'].astype(str),
-        y=df_partido_dia['promedio_vendidas'],
-        marker_color='#18395c',
-        text=[f"{format_number(v)}" for v in df_partido_dia['promedio_vendidas']],
-        textposition='outside',
-        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold'),
-        hovertext=hover_dia,
-        hoverinfo='text',
-    ))
-    max_y_dia = df_partido_dia['promedio_vendidas'].max() * 1.25
-    fig2.update_layout(
-        height=200,
-        margin=dict(t=30, b=30, l=20, r=20),
-        xaxis=dict(type='category', tickfont=dict(size=10, family='Montserrat', weight='bold')),
-        yaxis=dict(showticklabels=False, range=[0, max_y_dia])
-    )
-    
+    df_partido['dia_semana_es'] = df_partido['dia_semana'].map(DIAS_ES)
+    fig2 = figura_por_categoria(df_partido, 'dia_semana_es', 'n_publico', orden=ORDEN_DIAS,
+                                formato=format_number)
+
     # Gráfica 3: Promedio por hora del partido
-    df_hora_agg = df_partido.groupby('hora_exacta').agg({
-        'n_publico': 'mean',
-        'id_partido': 'count',
-        't2_name': lambda x: list(x)
-    }).reset_index()
-    df_hora_agg.columns = ['hora', 'promedio_vendidas', 'num_partidos', 'rivales']
-    
-    hover_hora = [
-        f"<b>Hora: {h}</b><br>Promedio: {format_number(p)}<br>Partidos: {int(n)} ({', '.join(r)})"
-        for h, p, n, r in zip(
-            df_hora_agg['hora'],
-            df_hora_agg['promedio_vendidas'],
-            df_hora_agg['num_partidos'],
-            df_hora_agg['rivales'],
-        )
-    ]
-    
-    fig3 = go.Figure()
-    fig3.add_trace(go.Bar(
-        x=df_hora_agg['hora'],
-        y=df_hora_agg['promedio_vendidas'],
-        marker_color='#18395c',
-        text=[f"{format_number(v)}" for v in df_hora_agg['promedio_vendidas']],
-        textposition='outside',
-        textfont=dict(color='#333', size=10, family='Montserrat', weight='bold'),
-        hovertext=hover_hora,
-        hoverinfo='text',
-    ))
-    max_y_hora = df_hora_agg['promedio_vendidas'].max() * 1.25
-    fig3.update_layout(
-        height=200,
-        margin=dict(t=30, b=30, l=20, r=20),
-        xaxis=dict(tickfont=dict(size=10, family='Montserrat', weight='bold')),
-        yaxis=dict(showticklabels=False, range=[0, max_y_hora])
-    )
-    
+    fig3 = figura_por_categoria(df_partido, 'hora_exacta', 'n_publico', formato=format_number,
+                                etiqueta='Hora: ')
+
     # Gráfica 4: Recaudación por partido (con escudos)
     hover_recaudacion = build_sector_hover(match_ids, 'recaudacion')
     
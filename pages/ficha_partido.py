@@ -11,7 +11,7 @@ from dash import html, dcc, callback, Output, Input
 import pandas as pd
 from datetime import datetime
 
-from database import get_ficha_partido, get_ficha_rivales_temp_actual
+import cache_ficha
 from components import build_escudos_nav, get_escudo_path
 
 dash.register_page(
@@ -126,7 +126,7 @@ def _build_ficha(row, df_rivales):
         +------------+-----------+-----------------+
     """
     rival = row['t2_name']
-    escudo = get_escudo_path(rival)
+    escudo = get_escudo_path(rival, "ficha")
 
     # ---- Banda central IDENTIDAD (horizontal: escudo | info | resultado) ----
     res = row.get('result') or ""
@@ -274,18 +274,13 @@ def render_ficha(store_data, session):
     except (TypeError, ValueError):
         return _layout_no_disponible("ID de partido no válido.")
 
-    # Cargar datos
+    # Cargar datos (caché por temporada; los vecinos se precargan en segundo plano)
     try:
-        df = get_ficha_partido(id_partido_int)
+        contenido = cache_ficha.get_layout(id_partido_int, _build_ficha)
     except Exception as e:
         return _layout_no_disponible(f"Error cargando ficha: {e}")
 
-    if df.empty:
+    if contenido is None:
         return _layout_no_disponible()
 
-    try:
-        df_rivales = get_ficha_rivales_temp_actual()
-    except Exception:
-        df_rivales = pd.DataFrame()
-
-    return _build_ficha(df.iloc[0], df_rivales)
+    return contenido
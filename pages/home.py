@@ -9,9 +9,9 @@ import pandas as pd
 from database import (
     get_pre_entradas_partido, get_pre_hosteleria_partido,
     get_pre_deportiendas_kpis, get_museo_kpis,
-    get_ficha_rivales_temp_actual,
 )
 from components import build_escudos_nav
+import cache_ficha
 
 dash.register_page(__name__, path="/", name="Inicio")
 
@@ -163,7 +163,7 @@ def update_home_cards(session):
     escudos_block = []
     if is_global:
         try:
-            df_rivales = get_ficha_rivales_temp_actual()
+            df_rivales = cache_ficha.get_rivales()
             escudos_block = [build_escudos_nav(df_rivales, layout="grid",
                                                title="FICHA POST PARTIDO")]
         except Exception as e:
@@ -6,9 +6,14 @@ Con filtro por hora de inicio del partido.
 """
 
 import dash
-from dash import html, dcc, callback, Output, Input, State, ctx, no_update
+from dash import html, dcc, callback, Output, Input, State, ctx, no_update, Patch
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 import pandas as pd
+import hashlib
+import json
+import time
 from datetime import datetime
 from database import (
     get_pre_hosteleria_partido, get_pre_hosteleria_producto,
@@ -16,6 +21,14 @@ from database import (
     get_pre_hosteleria_producto_cantina,
     get_pre_asistencia_partido,
 )
+import directo
+import escudos
+import figuras
+from figuras import figuras_compactas
+from components import con_marca_datos, figura_por_categoria, indicador_progreso
+from metricas import PRESUPUESTO_INTERACCION, PRESUPUESTO_PAGINA, presupuesto
+import segundo_plano
+from jornadas import comparables, comparar_alineados
 
 dash.register_page(__name__, path="/hosteleria", name="DeporHosteleria")
 
@@ -40,6 +53,11 @@ BEBIDAS_KEYWORDS = [
     'fanta', 'gintonic', 'nestea', 'ron', 'tónica', 'zumo',
 ]
 EXCLUIDOS_KEYWORDS = ['vaso depor', 'bufanda']
+# Productos que no salen en el top 5 del hover de cada cantina ni en el
+# desglose de productos de una barra/palco ("solidario" cubre también
+# "Vaso Dépor Solidario")
+EXCLUIR_TOP_CANTINA = 'vaso depor|bufanda'
+EXCLUIR_DESGLOSE_STORE = 'solidario|bufanda'
 
 # Agrupación de nombres de producto duplicados
 PRODUCT_NAME_MAP = {
@@ -128,11 +146,11 @@ ESCUDOS_MAP = {
 }
 
 
-def get_escudo_path(team_name):
-    """Obtiene la ruta del escudo para un equipo."""
+def get_escudo_path(team_name, tamano="grafica"):
+    """Obtiene la URL del escudo (variante optimizada) para un equipo."""
     escudo_file = ESCUDOS_MAP.get(team_name)
     if escudo_file:
-        return f"/assets/Escudos/{escudo_file}"
+        return escudos.url(escudo_file, tamano)
     return None
 
 
@@ -330,12 +348,15 @@ def create_section_header():
 
 
 def create_sub_tabs():
-    """Crea la botonera secundaria: EVOLUTIVO | MÉTODOS DE PAGO | DESGLOSE DE VENTAS."""
+    """Crea la botonera secundaria: EVOLUTIVO | MÉTODOS DE PAGO | DESGLOSE DE VENTAS
+    (| EN DIRECTO si `directo.ACTIVO`)."""
     sub_tabs = [
         {"id": "btn-sub-EVOLUTIVO",  "label": "EVOLUTIVO"},
         {"id": "btn-sub-METODOS",    "label": "MÉTODOS DE PAGO"},
         {"id": "btn-sub-DESGLOSE",   "label": "DESGLOSE DE VENTAS"},
     ]
+    if directo.ACTIVO:
+        sub_tabs.append({"id": "btn-sub-DIRECTO", "label": "EN DIRECTO"})
     return html.Div([
         html.Button(
             tab["label"],
@@ -352,6 +373,8 @@ layout = html.Div([
     dcc.Store(id="hosteleria-franja-store", data="GLOBAL"),
     dcc.Store(id="hosteleria-selected-partidos", data=[]),
     dcc.Store(id="hosteleria-sub-tab-store", data="EVOLUTIVO"),
+    # Versión de las opciones del modal ya enviadas al navegador
+    dcc.Store(id="hosteleria-modal-version", data=None),
     # Sub-tabs de contenido
     html.Div(create_sub_tabs(), style={"padding": "0 0 4px 0"}),
     # Modal de selección de partidos
@@ -370,7 +393,21 @@ layout = html.Div([
                     ),
                 ]),
                 html.Div(id="modal-hosteleria-body", className="modal-body", children=[
-                    dcc.Checklist(id="modal-checklist", options=[], value=[]),
+                    html.Div(id="modal-hosteleria-msg"),
+                    dcc.Checklist(
+                        id="modal-checklist",
+                        options=[],
+                        value=[],
+                        inputStyle={
+                            "marginRight": "10px", "width": "18px", "height": "18px",
+                            "accentColor": "#1a3a5c", "cursor": "pointer", "flexShrink": "0",
+                        },
+                        labelStyle={
+                            "display": "flex", "alignItems": "center", "padding": "8px 6px",
+                            "cursor": "pointer", "borderBottom": "1px solid #f0f0f0",
+                            "width": "100%",
+                        },
+                    ),
                 ]),
                 html.Div(className="modal-footer", children=[
                     html.Button(
@@ -389,6 +426,7 @@ layout = html.Div([
             ]),
         ],
     ),
+    indicador_progreso("progreso-hosteleria"),
     dcc.Loading(
         id="loading-hosteleria",
         type="default",
@@ -673,7 +711,7 @@ def _get_top_products_per_cantina(df_prod_cantina, store_name, hora_filter=None,
         else:
             df = df[df['hora_exacta'] == hora_filter]
     df['product_name'] = df['product_name'].apply(normalizar_producto)
-    df = df[~df['product_name'].str.lower().str.contains('vaso depor|bufanda', na=False)]
+    df = df[~df['product_name'].str.lower().str.contains(EXCLUIR_TOP_CANTINA, na=False)]
     agg = df.groupby('product_name')['cantidad'].sum().nlargest(top_n)
     if agg.empty:
         return 'Sin datos'
@@ -765,10 +803,7 @@ def build_fig_productos_por_store(df_prod_cantina, n_partidos, store_name, hora_
         return fig
 
     df['product_name'] = df['product_name'].apply(normalizar_producto)
-    # Excluir productos no relevantes.
-    # "solidario" cubre también "Vaso Dépor Solidario" (el filtro anterior
-    # buscaba la substring exacta "vaso solidario" y no atrapaba esa variante).
-    df = df[~df['product_name'].str.lower().str.contains('solidario|bufanda', na=False)]
+    df = df[~df['product_name'].str.lower().str.contains(EXCLUIR_DESGLOSE_STORE, na=False)]
 
     agg = df.groupby('product_name').agg(
         cantidad=('cantidad', 'sum'),
@@ -907,80 +942,22 @@ def build_fig_comestibles(df_producto, hora_filter=None, n_partidos=1, df_prod_c
 
 def build_fig_recaudacion_media_hora(df_actual):
     """Gráfica GLOBAL: recaudación media por hora de inicio."""
-    rivals_map = df_actual.groupby('hora_exacta')['t2_name'].apply(list).to_dict()
-
-    agg = df_actual.groupby('hora_exacta').agg(
-        recaudacion_media=('recaudacion_total', 'mean'),
-        n_partidos=('id_partido', 'nunique'),
-        pedidos_medio=('n_pedidos', 'mean'),
-        ticket_medio=('ticket_medio', 'mean'),
-    ).reset_index().sort_values('hora_exacta')
-
-    colores = ['#f39c12' if v == agg['recaudacion_media'].max() else '#18395c' for v in agg['recaudacion_media']]
-
-    hover_texts = [
-        f"<b>Hora: {h}</b><br>Recaudación media: {fmt(r)}€<br>"
-        f"Partidos: {int(n)} ({', '.join(rivals_map.get(h, []))})"
-        for h, r, n in zip(agg['hora_exacta'], agg['recaudacion_media'], agg['n_partidos'])
-    ]
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=agg['hora_exacta'],
-        y=agg['recaudacion_media'],
-        marker_color=colores,
-        text=[fmt(v) + '€' for v in agg['recaudacion_media']],
-        textposition='outside',
-        textfont=dict(color='#333', size=11, family='Montserrat', weight='bold'),
-        hovertext=hover_texts,
-        hoverinfo='text',
-    ))
-    max_y = agg['recaudacion_media'].max() * 1.15 if len(agg) > 0 else 100
-    fig.update_layout(
-        height=350,
-        margin=dict(t=10, b=30, l=20, r=20),
-        xaxis=dict(tickfont=dict(size=12, family='Montserrat')),
-        yaxis=dict(showticklabels=False, range=[0, max_y])
+    return figura_por_categoria(
+        df_actual, 'hora_exacta', 'recaudacion_total', formato=fmt, sufijo='€',
+        etiqueta='Hora: ', etiqueta_valor='Recaudación media', resaltar_max=True,
+        margen_y=1.15, tamano_texto=11, height=350, margin=dict(t=10, b=30, l=20, r=20),
+        xaxis=dict(tickfont=dict(size=12, weight='normal')),
     )
-    return fig
 
 
 def build_fig_ticket_medio_hora(df_actual):
     """Gráfica GLOBAL: ticket medio por hora de inicio."""
-    rivals_map = df_actual.groupby('hora_exacta')['t2_name'].apply(list).to_dict()
-
-    agg = df_actual.groupby('hora_exacta').agg(
-        ticket_medio=('ticket_medio', 'mean'),
-        n_partidos=('id_partido', 'nunique'),
-    ).reset_index().sort_values('hora_exacta')
-
-    colores = ['#f39c12' if v == agg['ticket_medio'].max() else '#18395c' for v in agg['ticket_medio']]
-
-    hover_texts = [
-        f"<b>Hora: {h}</b><br>Ticket medio: {v:.2f}€<br>"
-        f"Partidos: {int(n)} ({', '.join(rivals_map.get(h, []))})"
-        for h, v, n in zip(agg['hora_exacta'], agg['ticket_medio'], agg['n_partidos'])
-    ]
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=agg['hora_exacta'],
-        y=agg['ticket_medio'],
-        marker_color=colores,
-        text=[f"{v:.2f}€" for v in agg['ticket_medio']],
-        textposition='outside',
-        textfont=dict(color='#333', size=11, family='Montserrat', weight='bold'),
-        hovertext=hover_texts,
-        hoverinfo='text',
-    ))
-    max_y = agg['ticket_medio'].max() * 1.15 if len(agg) > 0 else 20
-    fig.update_layout(
-        height=350,
-        margin=dict(t=10, b=30, l=20, r=20),
-        xaxis=dict(tickfont=dict(size=12, family='Montserrat')),
-        yaxis=dict(showticklabels=False, range=[0, max_y])
+    return figura_por_categoria(
+        df_actual, 'hora_exacta', 'ticket_medio', formato=lambda v: f"{v:.2f}", sufijo='€',
+        etiqueta='Hora: ', etiqueta_valor='Ticket medio', resaltar_max=True,
+        margen_y=1.15, tamano_texto=11, height=350, margin=dict(t=10, b=30, l=20, r=20),
+        xaxis=dict(tickfont=dict(size=12, weight='normal')),
     )
-    return fig
 
 
 def build_fig_ticket_medio_metodo(df_metodo_actual):
@@ -1111,6 +1088,36 @@ def build_metodos_content(fig_ticket_metodo, fig_pct_metodo):
     ], className="page-content-container")
 
 
+def _datos_desglose(df_cantina, df_prod_cantina, hora_filter, top_n=10):
+    """Contenido de `desglose-data-store`: solo lo que leen sus callbacks.
+
+    El filtro de franja ya va aplicado (el store lleva hora_filter 'GLOBAL'),
+    los partidos se suman por barra/palco y de cada una se guardan solo los
+    productos que pueden salir en su hover (top 5) o en su desglose (`top_n`).
+    """
+    def en_franja(df):
+        if hora_filter and hora_filter != 'GLOBAL' and 'hora_exacta' in df.columns:
+            horas = hora_filter if isinstance(hora_filter, list) else [hora_filter]
+            df = df[df['hora_exacta'].isin(horas)]
+        return df[df['store_name'].str.startswith(('Barra', 'Palco'))]
+
+    cantina = en_franja(df_cantina).groupby(['store_id', 'store_name'], as_index=False)['recaudacion'].sum()
+    pc = en_franja(df_prod_cantina)
+    pc = (pc.assign(product_name=pc['product_name'].map(normalizar_producto))
+            .groupby(['store_name', 'product_name'], as_index=False)[['cantidad', 'recaudacion']].sum()
+            .sort_values(['cantidad', 'product_name'], ascending=[False, True]))
+    nombres = pc['product_name'].str.lower()
+    conservar = pd.Series(False, index=pc.index)
+    for excluir in (EXCLUIR_TOP_CANTINA, EXCLUIR_DESGLOSE_STORE):
+        top = pc[~nombres.str.contains(excluir, na=False)].groupby('store_name').head(top_n)
+        conservar[top.index] = True
+    return {
+        "df_cantina": cantina.to_dict('records'),
+        "df_prod_cantina": pc[conservar].to_dict('records'),
+        "hora_filter": 'GLOBAL',
+    }
+
+
 def build_desglose_content(fig_productos, desglose_data):
     """Sub-tab DESGLOSE DE VENTAS: Productos (top) + toggle Barras/Palcos (izquierda) + productos de la
     barra/palco clicada (derecha).
@@ -1119,7 +1126,7 @@ def build_desglose_content(fig_productos, desglose_data):
     los datos almacenados en el `dcc.Store` de la propia sección.
     """
     return html.Div([
-        # Store con los DataFrames filtrados (df_cantina, df_prod_cantina) + hora_filter + n_partidos
+        # Store de `_datos_desglose` + n_partidos
         dcc.Store(id="desglose-data-store", data=desglose_data),
         html.Div([
             # Top 10 productos (full width)
@@ -1170,61 +1177,131 @@ def build_desglose_content(fig_productos, desglose_data):
     ], className="page-content-container")
 
 
+# Gráficas de la sub-tab EN DIRECTO: (id, título, clase de la tarjeta)
+DIRECTO_GRAFICAS = [
+    ("directo-graph-productos", "Top 10 Productos más Vendidos", "graph-card full-width"),
+    ("directo-graph-barras", "Recaudación por Barra", "graph-card graph-card--scrollable"),
+    ("directo-graph-palcos", "Recaudación por Palco", "graph-card graph-card--scrollable"),
+    ("directo-graph-ticket", "Ticket Medio por Método de Pago", "graph-card"),
+    ("directo-graph-pct", "% Facturación por Método de Pago", "graph-card"),
+]
+
+
+def build_directo_content():
+    """Sub-tab EN DIRECTO: esqueleto que rellena y actualiza `directo_actualizar`
+    cada `directo.INTERVALO_SEGUNDOS`."""
+    tarjetas = [
+        html.Div([
+            html.H4(titulo),
+            dcc.Graph(id=gid, figure=go.Figure(), config={'displayModeBar': False}),
+        ], className=clase)
+        for gid, titulo, clase in DIRECTO_GRAFICAS
+    ]
+    return html.Div([
+        # [id_partido, versión del acumulado] que ya tiene este navegador
+        dcc.Store(id="directo-version", data=None),
+        dcc.Interval(id="directo-intervalo", interval=int(directo.INTERVALO_SEGUNDOS * 1000)),
+        html.Div(id="directo-cabecera", className="kpi-previous",
+                 style={"textAlign": "center", "marginBottom": "6px"}),
+        html.Div(id="directo-kpis", className="kpis-container", children=loading_component()),
+        html.Div([
+            html.Div(tarjetas[:1], className="graphs-row"),
+            html.Div(tarjetas[1:3], className="graphs-row"),
+            html.Div(tarjetas[3:], className="graphs-row"),
+        ], className="graphs-container"),
+    ], className="page-content-container")
+
+
 # =============================================================================
 # CALLBACKS
 # =============================================================================
 
 FRANJA_BTNS = ["btn-franja-GLOBAL", "btn-franja-INDIVIDUAL", "btn-franja-MEDIODIA", "btn-franja-TARDE", "btn-franja-NOCHE"]
 SUB_TAB_BTNS = ["btn-sub-EVOLUTIVO", "btn-sub-METODOS", "btn-sub-DESGLOSE"]
+if directo.ACTIVO:
+    SUB_TAB_BTNS.append("btn-sub-DIRECTO")
+
+
+# Opciones del modal de partidos: se calculan una vez por versión de los datos
+# y se reutilizan entre aperturas y usuarios durante MODAL_TTL_SEGUNDOS. Un
+# error solo se recuerda MODAL_REINTENTO_SEGUNDOS: la siguiente apertura
+# pasado ese tiempo vuelve a consultar.
+MODAL_TTL_SEGUNDOS = 300
+MODAL_REINTENTO_SEGUNDOS = 10
+_modal_cache = {"vence": 0.0, "version": None, "options": [], "error": None}
+
+
+def _build_modal_options(df):
+    """Opciones del checklist (escudo + rival + fecha) para los partidos de la temporada actual."""
+    df = df.copy()
+    df['schedule'] = pd.to_datetime(df['schedule'], errors='coerce')
+    df_actual = df[df['temporada'] == 'actual'].sort_values('schedule')
+    options = []
+    for row in df_actual.itertuples(index=False):
+        fecha = row.schedule.strftime('%d/%m/%Y')
+        hora = row.schedule.strftime('%H:%M')
+        dia_raw = str(getattr(row, 'dia_semana', ''))
+        dia = DIAS_ES.get(dia_raw, dia_raw)
+        escudo_path = get_escudo_path(row.t2_name, "icono")
+        label = html.Div([
+            html.Img(src=escudo_path, className="match-escudo") if escudo_path
+                else html.Div(style={"width": "30px", "flexShrink": "0"}),
+            html.Div([
+                html.Span(row.t2_name, className="match-rival-name"),
+                html.Span(f"{dia}  ·  {fecha}  ·  {hora}", className="match-details"),
+            ], className="match-info"),
+        ], style={"display": "flex", "alignItems": "center", "gap": "10px"})
+        options.append({"label": label, "value": int(row.id_partido)})
+    # Huella estable entre workers (hash() de Python cambia por proceso)
+    huella = df_actual[['id_partido', 't2_name', 'schedule']].astype(str).to_csv(index=False)
+    version = hashlib.md5(huella.encode()).hexdigest()
+    return options, version
+
+
+def _modal_options():
+    """Devuelve (options, version, error) desde la caché, recargando si ha vencido."""
+    if time.time() >= _modal_cache["vence"]:
+        try:
+            options, version = _build_modal_options(get_pre_hosteleria_partido())
+            _modal_cache.update(options=options, version=version, error=None,
+                                vence=time.time() + MODAL_TTL_SEGUNDOS)
+        except Exception as e:
+            _modal_cache.update(options=[], version=None, error=str(e),
+                                vence=time.time() + MODAL_REINTENTO_SEGUNDOS)
+    return _modal_cache["options"], _modal_cache["version"], _modal_cache["error"]
 
 
 @callback(
-    Output("modal-hosteleria-body", "children"),
+    Output("modal-checklist", "options"),
+    Output("modal-checklist", "value"),
+    Output("hosteleria-modal-version", "data"),
+    Output("modal-hosteleria-msg", "children"),
     Input("modal-hosteleria-overlay", "className"),
     State("hosteleria-selected-partidos", "data"),
+    State("hosteleria-modal-version", "data"),
     prevent_initial_call=True,
 )
-def populate_modal(class_name, current_selection):
-    """Rellena la lista de partidos en el modal cada vez que se abre."""
+@presupuesto(PRESUPUESTO_PAGINA)
+def populate_modal(class_name, current_selection, version_cliente):
+    """Rellena la lista de partidos del modal al abrirlo.
+
+    Las opciones salen de la caché del servidor y solo se envían si el
+    navegador no tiene ya la versión vigente; en caso contrario la respuesta
+    se limita a la selección actual.
+    """
     if not class_name or "visible" not in class_name:
-        return no_update
-    try:
-        df = get_pre_hosteleria_partido()
-        df['schedule'] = pd.to_datetime(df['schedule'], errors='coerce')
-        df_actual = df[df['temporada'] == 'actual'].sort_values('schedule')
-        if df_actual.empty:
-            return html.P("No hay partidos disponibles.", style={"color": "#888", "padding": "10px"})
-        options = []
-        for _, row in df_actual.iterrows():
-            fecha = row['schedule'].strftime('%d/%m/%Y')
-            hora = row['schedule'].strftime('%H:%M')
-            dia = DIAS_ES.get(str(row.get('dia_semana', '')), str(row.get('dia_semana', '')))
-            escudo_path = get_escudo_path(row['t2_name'])
-            label = html.Div([
-                html.Img(src=escudo_path, className="match-escudo") if escudo_path
-                    else html.Div(style={"width": "30px", "flexShrink": "0"}),
-                html.Div([
-                    html.Span(row['t2_name'], className="match-rival-name"),
-                    html.Span(f"{dia}  ·  {fecha}  ·  {hora}", className="match-details"),
-                ], className="match-info"),
-            ], style={"display": "flex", "alignItems": "center", "gap": "10px"})
-            options.append({"label": label, "value": int(row['id_partido'])})
-        return dcc.Checklist(
-            id="modal-checklist",
-            options=options,
-            value=list(current_selection) if current_selection else [],
-            inputStyle={
-                "marginRight": "10px", "width": "18px", "height": "18px",
-                "accentColor": "#1a3a5c", "cursor": "pointer", "flexShrink": "0",
-            },
-            labelStyle={
-                "display": "flex", "alignItems": "center", "padding": "8px 6px",
-                "cursor": "pointer", "borderBottom": "1px solid #f0f0f0",
-                "width": "100%",
-            },
-        )
-    except Exception as e:
-        return html.P(f"Error cargando partidos: {e}", style={"color": "red", "padding": "10px"})
+        return no_update, no_update, no_update, no_update
+    options, version, error = _modal_options()
+    if error:
+        return [], [], None, html.P(f"Error cargando partidos: {error}",
+                                    style={"color": "red", "padding": "10px"})
+    if not options:
+        return [], [], version, html.P("No hay partidos disponibles.",
+                                       style={"color": "#888", "padding": "10px"})
+    value = list(current_selection) if current_selection else []
+    if version == version_cliente:
+        return no_update, value, no_update, no_update
+    return options, value, version, None
 
 
 @callback(
@@ -1287,6 +1364,7 @@ def update_sub_tab(*args):
         "btn-sub-EVOLUTIVO": "EVOLUTIVO",
         "btn-sub-METODOS": "METODOS",
         "btn-sub-DESGLOSE": "DESGLOSE",
+        "btn-sub-DIRECTO": "DIRECTO",
     }
     selected = mapping.get(trigger, "EVOLUTIVO")
     classes = [
@@ -1301,13 +1379,19 @@ def update_sub_tab(*args):
     Input("hosteleria-franja-store", "data"),
     Input("hosteleria-selected-partidos", "data"),
     Input("hosteleria-sub-tab-store", "data"),
+    **segundo_plano.opciones("progreso-hosteleria"),
 )
+@presupuesto(PRESUPUESTO_PAGINA)
+@con_marca_datos
 def update_page(franja_selected, selected_partidos, sub_tab):
     """Actualiza el contenido según la franja, partidos y sub-tab seleccionados."""
     if franja_selected is None:
         franja_selected = "GLOBAL"
     if sub_tab is None:
         sub_tab = "EVOLUTIVO"
+    if sub_tab == "DIRECTO":
+        # Los datos llegan después, por `directo_actualizar`
+        return build_directo_content()
 
     try:
         df_partido = get_pre_hosteleria_partido()
@@ -1331,8 +1415,8 @@ def update_page(franja_selected, selected_partidos, sub_tab):
         except Exception:
             df_asistencia = pd.DataFrame()
 
-        df_actual = df_partido[df_partido['temporada'] == 'actual'].sort_values('schedule')
-        df_anterior = df_partido[df_partido['temporada'] == 'anterior']
+        df_actual, df_anterior = comparables(df_partido)
+        df_actual = df_actual.sort_values('schedule')
 
         if df_actual.empty:
             return html.Div("No hay datos para la temporada actual.")
@@ -1450,16 +1534,19 @@ def update_page(franja_selected, selected_partidos, sub_tab):
             ], className="kpis-row")
         else:
             # GLOBAL KPIs con comparativa temporada anterior
-            total_pedidos = df_actual['n_pedidos'].sum()
-            total_recaudacion = df_actual['recaudacion_total'].sum()
+            # Temporada anterior limitada a las mismas jornadas (ver `jornadas`)
+            comp = comparar_alineados(df_actual, df_anterior, {
+                'total_pedidos': ('n_pedidos', 'sum'),
+                'total_recaudacion': ('recaudacion_total', 'sum'),
+                'promedio_pedidos': ('n_pedidos', 'mean'),
+                'recaudacion_promedio': ('recaudacion_total', 'mean'),
+            })
+            total_pedidos, total_pedidos_ant = comp.loc['total_pedidos']
+            total_recaudacion, total_recaudacion_ant = comp.loc['total_recaudacion']
+            promedio_pedidos, promedio_pedidos_ant = comp.loc['promedio_pedidos']
+            recaudacion_promedio, recaudacion_promedio_ant = comp.loc['recaudacion_promedio']
             ticket_medio = total_recaudacion / total_pedidos if total_pedidos > 0 else 0
-            promedio_pedidos = df_actual['n_pedidos'].mean()
-            recaudacion_promedio = df_actual['recaudacion_total'].mean()
-            total_pedidos_ant = df_anterior['n_pedidos'].sum()
-            total_recaudacion_ant = df_anterior['recaudacion_total'].sum()
             ticket_medio_ant = total_recaudacion_ant / total_pedidos_ant if total_pedidos_ant > 0 else 0
-            promedio_pedidos_ant = df_anterior['n_pedidos'].mean() if len(df_anterior) > 0 else 0
-            recaudacion_promedio_ant = df_anterior['recaudacion_total'].mean() if len(df_anterior) > 0 else 0
             ingreso_asist, ingreso_asist_ant = 0, 0
             if not df_asistencia.empty:
                 df_m = df_actual.merge(
@@ -1505,19 +1592,8 @@ def update_page(franja_selected, selected_partidos, sub_tab):
 
         elif sub_tab == "DESGLOSE":
             fig_prod = build_fig_productos(df_prod_f, hora_filter, df_pc_f)
-            # Guardar en el Store solo los registros relevantes (Barra/Palco) para no
-            # serializar 14k filas innecesarias de df_prod_cantina.
-            df_pc_relev = df_pc_f[
-                df_pc_f['store_name'].str.startswith(('Barra', 'Palco'))
-            ].copy()
-            hora_val = hora_filter if hora_filter else 'GLOBAL'
-            # hora_filter puede ser str o list; list es JSON-serializable
-            desglose_data = {
-                "df_cantina": df_cant_f.to_dict('records'),
-                "df_prod_cantina": df_pc_relev.to_dict('records'),
-                "n_partidos": int(n_partidos),
-                "hora_filter": hora_val,
-            }
+            desglose_data = dict(_datos_desglose(df_cant_f, df_pc_f, hora_filter),
+                                 n_partidos=int(n_partidos))
             return build_desglose_content(fig_prod, desglose_data)
 
         else:
@@ -1557,6 +1633,8 @@ _PLACEHOLDER_STYLE = {"textAlign": "center", "padding": "140px 20px",
     Input("desglose-data-store", "data"),
     prevent_initial_call='initial_duplicate',
 )
+@presupuesto(PRESUPUESTO_INTERACCION)
+@figuras_compactas
 def desglose_toggle_store_type(n_barra, n_palco, data):
     """Maneja el toggle Barras/Palcos y la carga inicial del gráfico principal.
 
@@ -1603,6 +1681,8 @@ def desglose_toggle_store_type(n_barra, n_palco, data):
     State("desglose-data-store", "data"),
     prevent_initial_call=True,
 )
+@presupuesto(PRESUPUESTO_INTERACCION)
+@figuras_compactas
 def desglose_show_products_on_click(click_data, data):
     """Al hacer clic sobre una barra/palco del gráfico principal, muestra a la
     derecha el desglose de productos vendidos en esa barra/palco."""
@@ -1627,3 +1707,132 @@ def desglose_show_products_on_click(click_data, data):
         f"Unidades Vendidas en {store_name}",
         _NOTE_VISIBLE,
     )
+
+
+# =============================================================================
+# CALLBACK DE LA SUB-TAB "EN DIRECTO"
+# =============================================================================
+# El primer disparo del intervalo dibuja las figuras completas; los siguientes
+# solo envían un Patch con los arrays de datos y el rango de los ejes de cada
+# gráfica cuya estructura (resto de la figura) no ha cambiado. La versión es
+# el nº de líneas sumadas del acumulado: si el worker no va por delante del
+# navegador (otro worker ya le dio datos más nuevos) no se envía nada.
+
+_directo_salida = {"clave": None, "valor": None}
+
+# Lo que cambia entre lecturas: arrays de cada traza y rangos de los ejes
+DIRECTO_ARRAYS = ("x", "y", "text", "hovertext", "values", "labels", "customdata")
+DIRECTO_EJES = ("xaxis", "yaxis")
+
+
+def _kpi_directo(valor, label, formato="numero", decimals=0):
+    """Tarjeta KPI sin comparativa para la sub-tab EN DIRECTO."""
+    texto = f"{fmt(valor, decimals)}€" if formato == "euros" else fmt(valor, decimals)
+    return html.Div([
+        html.Div(label, className="kpi-label-top",
+                 style={"display": "flex", "alignItems": "center", "justifyContent": "center"}),
+        html.Div(html.Span(texto, className="kpi-value kpi-value-neutral"),
+                 style={"display": "flex", "alignItems": "baseline", "justifyContent": "center"}),
+        html.Div("En directo", className="kpi-previous"),
+    ], className="kpi-card")
+
+
+def _figuras_directo(tablas):
+    """Figuras de `DIRECTO_GRAFICAS` a partir de las tablas de `directo.Acumulado`."""
+    cantina, prod_cantina, metodo = tablas["cantina"], tablas["producto_cantina"], tablas["metodo"]
+    return [
+        build_fig_productos(tablas["producto"], None, prod_cantina),
+        build_fig_promedio_stores(cantina, 1, 'Barra', None, prod_cantina),
+        build_fig_promedio_stores(cantina, 1, 'Palco', None, prod_cantina),
+        build_fig_ticket_medio_metodo(metodo),
+        build_fig_metodo_pago_pie(metodo),
+    ]
+
+
+def _estructura_figura(fig):
+    """Firma de `fig` (dict) sin `DIRECTO_ARRAYS` ni los rangos de `DIRECTO_EJES`:
+    si coincide con la de la figura del navegador, basta `_parche_figura`."""
+    trazas = [{k: None if k in DIRECTO_ARRAYS else v for k, v in traza.items()}
+              for traza in fig["data"]]
+    layout = dict(fig["layout"])
+    for eje in DIRECTO_EJES:
+        if isinstance(layout.get(eje), dict) and "range" in layout[eje]:
+            layout[eje] = dict(layout[eje], range=None)
+    contenido = json.dumps([trazas, layout], sort_keys=True, cls=PlotlyJSONEncoder)
+    return hashlib.sha1(contenido.encode()).hexdigest()[:12]
+
+
+def _parche_figura(fig):
+    """Patch con los arrays de datos de cada traza y los rangos de los ejes de `fig`."""
+    parche = Patch()
+    for i, traza in enumerate(fig["data"]):
+        for clave in DIRECTO_ARRAYS:
+            if clave in traza:
+                parche["data"][i][clave] = traza[clave]
+    for eje in DIRECTO_EJES:
+        rango = fig["layout"].get(eje, {}).get("range")
+        if rango is not None:
+            parche["layout"][eje]["range"] = rango
+    return parche
+
+
+def _salida_directo(partido, version, tablas):
+    """(cabecera, kpis, figuras, firmas) de una versión; se construyen una vez
+    por worker. Las figuras van ya compactadas, como dict."""
+    clave = (partido["id_partido"], version)
+    if _directo_salida["clave"] == clave:
+        return _directo_salida["valor"]
+    kpis = tablas["kpis"]
+    ultima = pd.to_datetime(kpis["ultima_venta"], errors="coerce")
+    cabecera = (f"EN DIRECTO · {partido['t1_name']} - {partido['t2_name']}"
+                + (f" · última venta {ultima:%H:%M:%S}" if pd.notna(ultima) else " · sin ventas todavía")
+                + f" · se actualiza cada {directo.INTERVALO_SEGUNDOS:g} s")
+    pedidos = kpis["pedidos"]
+    tarjetas = html.Div([
+        _kpi_directo(kpis["recaudacion"], "Recaudación", "euros"),
+        _kpi_directo(pedidos, "Pedidos"),
+        _kpi_directo(kpis["recaudacion"] / pedidos if pedidos else 0, "Ticket Medio", "euros", decimals=2),
+        _kpi_directo(kpis["unidades"], "Unidades Vendidas"),
+    ], className="kpis-row")
+    figs = [figuras.compactar_figura(f) if figuras.ACTIVO else f.to_plotly_json()
+            for f in _figuras_directo(tablas)]
+    valor = (cabecera, tarjetas, figs, [_estructura_figura(f) for f in figs])
+    _directo_salida.update(clave=clave, valor=valor)
+    return valor
+
+
+@callback(
+    [Output("directo-cabecera", "children"), Output("directo-kpis", "children")]
+    + [Output(gid, "figure") for gid, _, _ in DIRECTO_GRAFICAS]
+    + [Output("directo-version", "data")],
+    Input("directo-intervalo", "n_intervals"),
+    State("directo-version", "data"),
+)
+@presupuesto(PRESUPUESTO_PAGINA)
+def directo_actualizar(_, version_cliente):
+    """Lee las ventas nuevas del partido en curso y actualiza la sub-tab EN DIRECTO."""
+    sin_figuras = [no_update] * len(DIRECTO_GRAFICAS)
+    try:
+        partido = directo.partido_en_curso()
+        if partido is None:
+            if version_cliente == [None, 0]:
+                raise PreventUpdate
+            return ["No hay ningún partido en curso.", html.Div()] + sin_figuras + [[None, 0]]
+
+        id_partido = int(partido["id_partido"])
+        version, tablas = directo.actualizar(id_partido).tablas()
+        mismo_partido = version_cliente is not None and version_cliente[0] == id_partido
+        if mismo_partido and version_cliente[1] >= version:
+            raise PreventUpdate   # al día, o este worker va por detrás del navegador
+
+        cabecera, kpis, figs, firmas = _salida_directo(partido, version, tablas)
+        previas = version_cliente[2] if mismo_partido else [None] * len(figs)
+        figs = [_parche_figura(f) if firma == previa else f
+                for f, firma, previa in zip(figs, firmas, previas)]
+        return [cabecera, kpis] + figs + [[id_partido, version, firmas]]
+
+    except PreventUpdate:
+        raise
+    except Exception as e:
+        print(f"Error en hosteleria (directo): {e}")
+        return [f"Modo en directo no disponible: {e}", no_update] + sin_figuras + [no_update]
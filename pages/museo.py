@@ -11,9 +11,15 @@ import pandas as pd
 import numpy as np
 from database import (
     get_museo_kpis, get_museo_diario, get_museo_producto,
-    get_museo_horario, get_museo_dia_semana, get_museo_canal,
+    get_museo_horario, get_museo_canal,
     get_museo_metodo_pago, get_museo_heatmap, get_museo_partidos_local,
 )
+import escudos
+from components import con_marca_datos, indicador_progreso
+from metricas import PRESUPUESTO_PAGINA, presupuesto
+import segundo_plano
+from paneles import registrar_panel, renderizar
+from procesos import construir_figura
 
 dash.register_page(__name__, path="/museo", name="Museo RCD")
 
@@ -74,10 +80,10 @@ ESCUDOS_MAP = {
 
 
 def get_escudo_path(team_name):
-    """Obtiene la ruta del escudo para un equipo."""
+    """Obtiene la URL del escudo (variante optimizada) para un equipo."""
     escudo_file = ESCUDOS_MAP.get(team_name)
     if escudo_file:
-        return f"/assets/Escudos/{escudo_file}"
+        return escudos.url(escudo_file)
     return None
 
 
@@ -140,6 +146,7 @@ layout = html.Div([
     html.Div([
         html.Div("MUSEO RCD", className="section-title"),
     ], className="section-header"),
+    indicador_progreso("progreso-museo"),
     dcc.Loading(
         id="loading-museo",
         type="default",
@@ -461,6 +468,63 @@ def build_fig_metodo_pago(df_metodo):
     return fig
 
 
+# =============================================================================
+# PANELES
+# =============================================================================
+# Cada panel carga sus propias tablas, de modo que una tabla lenta solo
+# retrasa su gráfica (ver `paneles`); la figura se construye en el pool de
+# procesos (ver `procesos`).
+
+@registrar_panel("museo.kpis")
+def panel_kpis():
+    df_kpis = get_museo_kpis()
+    if df_kpis.empty:
+        return html.Div("No hay datos disponibles. Ejecuta sync_data.py --museo primero.",
+                        style={"textAlign": "center", "padding": "40px", "color": "#999"})
+    kpi = df_kpis.iloc[0]
+    return html.Div([
+        create_kpi_simple(float(kpi['ingresos_netos']), "Ingresos Totales", "euros",
+                          tooltip="Ingresos netos totales de pedidos completados en el museo."),
+        create_kpi_simple(int(kpi['total_entradas']), "Entradas Vendidas",
+                          tooltip="Número total de entradas vendidas (pedidos completados)."),
+        create_kpi_simple(float(kpi['ticket_medio']), "Ticket Medio", "euros",
+                          tooltip="Importe medio por pedido completado: Ingresos ÷ Pedidos completados."),
+        create_kpi_simple(float(kpi['entradas_por_pedido']), "Entradas / Pedido", "decimal",
+                          tooltip="Media de entradas por cada pedido completado."),
+    ], className="kpis-row")
+
+
+@registrar_panel("museo.evolucion")
+def panel_evolucion():
+    return construir_figura(build_fig_evolucion_diaria, get_museo_diario(),
+                            get_museo_partidos_local())
+
+
+@registrar_panel("museo.producto")
+def panel_producto():
+    return construir_figura(build_fig_producto, get_museo_producto())
+
+
+@registrar_panel("museo.canal")
+def panel_canal():
+    return construir_figura(build_fig_canal, get_museo_canal())
+
+
+@registrar_panel("museo.metodo")
+def panel_metodo():
+    return construir_figura(build_fig_metodo_pago, get_museo_metodo_pago())
+
+
+@registrar_panel("museo.horarios")
+def panel_horarios():
+    return construir_figura(build_fig_top_horarios, get_museo_horario())
+
+
+@registrar_panel("museo.heatmap")
+def panel_heatmap():
+    return construir_figura(build_fig_heatmap, get_museo_heatmap())
+
+
 # =============================================================================
 # CALLBACK
 # =============================================================================
@@ -468,36 +532,21 @@ def build_fig_metodo_pago(df_metodo):
 @callback(
     Output("content-museo", "children"),
     Input("content-museo", "id"),
+    **segundo_plano.opciones("progreso-museo"),
 )
+@presupuesto(PRESUPUESTO_PAGINA)
+@con_marca_datos
 def update_page(_):
     try:
-        df_kpis = get_museo_kpis()
-        df_diario = get_museo_diario()
-        df_producto = get_museo_producto()
-        df_horario = get_museo_horario()
-        df_dia_semana = get_museo_dia_semana()
-        df_canal = get_museo_canal()
-        df_metodo = get_museo_metodo_pago()
-        df_heatmap = get_museo_heatmap()
-        df_partidos = get_museo_partidos_local()
-
-        if df_kpis.empty:
-            return html.Div("No hay datos disponibles. Ejecuta sync_data.py --museo primero.",
-                           style={"textAlign": "center", "padding": "40px", "color": "#999"})
-
-        kpi = df_kpis.iloc[0]
-
-        # --- KPI Cards ---
-        kpis_row = html.Div([
-            create_kpi_simple(float(kpi['ingresos_netos']), "Ingresos Totales", "euros",
-                              tooltip="Ingresos netos totales de pedidos completados en el museo."),
-            create_kpi_simple(int(kpi['total_entradas']), "Entradas Vendidas",
-                              tooltip="Número total de entradas vendidas (pedidos completados)."),
-            create_kpi_simple(float(kpi['ticket_medio']), "Ticket Medio", "euros",
-                              tooltip="Importe medio por pedido completado: Ingresos ÷ Pedidos completados."),
-            create_kpi_simple(float(kpi['entradas_por_pedido']), "Entradas / Pedido", "decimal",
-                              tooltip="Media de entradas por cada pedido completado."),
-        ], className="kpis-row")
+        p = renderizar({
+            "kpis": ("museo.kpis", ()),
+            "evolucion": ("museo.evolucion", ()),
+            "producto": ("museo.producto", ()),
+            "canal": ("museo.canal", ()),
+            "metodo": ("museo.metodo", ()),
+            "horarios": ("museo.horarios", ()),
+            "heatmap": ("museo.heatmap", ()),
+        })
 
         # --- Leyenda evolución diaria (solo Ingresos + Día de partido tras
         # eliminar la serie de Entradas para que la gráfica se enfoque en
@@ -512,25 +561,15 @@ def update_page(_):
             html.Span("Día de partido", style={"fontSize": "11px", "fontFamily": FONT}),
         ], style={"display": "flex", "alignItems": "center", "justifyContent": "center", "marginBottom": "4px"})
 
-        # --- Build charts ---
-        fig_evolucion = build_fig_evolucion_diaria(df_diario, df_partidos)
-        fig_producto = build_fig_producto(df_producto)
-        fig_heatmap = build_fig_heatmap(df_heatmap)
-        fig_horarios = build_fig_top_horarios(df_horario)
-        fig_canal = build_fig_canal(df_canal)
-        fig_metodo = build_fig_metodo_pago(df_metodo)
-
-        graph_cfg = {'displayModeBar': False}
-
         return html.Div([
-            kpis_row,
+            p["kpis"],
             html.Div([
                 # Row 1: Evolución diaria
                 html.Div([
                     html.Div([
                         html.H4("Evolución Diaria de Ingresos y Entradas"),
                         legend_evolucion,
-                        dcc.Graph(figure=fig_evolucion, config=graph_cfg),
+                        p["evolucion"],
                     ], className="graph-card full-width"),
                 ], className="graphs-row"),
 
@@ -538,15 +577,15 @@ def update_page(_):
                 html.Div([
                     html.Div([
                         html.H4("Distribución por Tipo de Tour"),
-                        dcc.Graph(figure=fig_producto, config=graph_cfg),
+                        p["producto"],
                     ], className="graph-card"),
                     html.Div([
                         html.H4("Canal de Venta"),
-                        dcc.Graph(figure=fig_canal, config=graph_cfg),
+                        p["canal"],
                     ], className="graph-card"),
                     html.Div([
                         html.H4("Método de Pago"),
-                        dcc.Graph(figure=fig_metodo, config=graph_cfg),
+                        p["metodo"],
                     ], className="graph-card"),
                 ], className="graphs-row"),
 
@@ -554,11 +593,11 @@ def update_page(_):
                 html.Div([
                     html.Div([
                         html.H4("Top Horarios más Demandados"),
-                        dcc.Graph(figure=fig_horarios, config=graph_cfg),
+                        p["horarios"],
                     ], className="graph-card"),
                     html.Div([
                         html.H4("Mapa de Calor según Hora y Día"),
-                        dcc.Graph(figure=fig_heatmap, config=graph_cfg),
+                        p["heatmap"],
                     ], className="graph-card"),
                 ], className="graphs-row"),
 
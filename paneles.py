@@ -0,0 +1,259 @@
+"""
+Paneles con plazo (renderizado parcial)
+=======================================
+Cada gráfica/bloque de una página se declara como un panel independiente
+(`@registrar_panel`) que carga sus datos y construye su figura. El callback de
+la página llama a `renderizar`, que lanza los paneles en paralelo y espera
+como mucho `PLAZO_RENDER_SEGUNDOS`:
+
+    - los paneles terminados se devuelven ya construidos;
+    - los que no llegan se sustituyen por un marcador con un dcc.Interval que
+      consulta `completar_panel` hasta que el resultado está listo.
+
+Las consultas de cada panel se ejecutan con `database.plazo(PLAZO_PANEL_SEGUNDOS)`,
+que se traslada a MySQL como MAX_EXECUTION_TIME.
+
+El marcador lleva el nombre del panel y sus argumentos, así que si la
+consulta de relleno llega a otro worker de gunicorn este lo calcula por su
+cuenta (normalmente desde la caché de `database`). Como el id lo devuelve el
+navegador, va firmado con HMAC (`PANELES_SECRETO`, o un secreto aleatorio
+compartido por los workers en `.paneles_secreto`): solo se calculan paneles
+que emitió el servidor. Como mucho `MAX_PENDIENTES` paneles en espera por
+proceso.
+
+Dentro de un background callback (`segundo_plano.en_trabajo()`) no se difiere
+nada: el proceso del trabajo termina al devolver y sus pendientes se
+perderían, así que se espera a todos los paneles.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import plotly.graph_objects as go
+from dash import html, dcc, callback, Output, Input, State, MATCH, no_update
+
+import database
+import figuras
+import segundo_plano
+
+PLAZO_RENDER_SEGUNDOS = float(os.environ.get("PLAZO_RENDER_SEGUNDOS", "4"))
+PLAZO_PANEL_SEGUNDOS = float(os.environ.get("PLAZO_PANEL_SEGUNDOS", "60"))
+INTERVALO_MS = 1000
+
+PANEL_HILOS = int(os.environ.get("PANEL_HILOS", "8"))
+MAX_PENDIENTES = 256
+FICHERO_SECRETO = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".paneles_secreto")
+
+_executor = ThreadPoolExecutor(max_workers=PANEL_HILOS, thread_name_prefix="panel")
+_paneles = {}
+_pendientes = {}
+_lock = threading.Lock()
+
+
+def _leer_secreto():
+    """Secreto de firma: `PANELES_SECRETO` o, si no se define, uno aleatorio
+    creado una vez en `FICHERO_SECRETO` (0600) para todos los workers."""
+    if os.environ.get("PANELES_SECRETO"):
+        return os.environ["PANELES_SECRETO"].encode()
+    try:
+        fd = os.open(FICHERO_SECRETO, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    with open(FICHERO_SECRETO) as f:
+        secreto = f.read().strip()
+    if not secreto:  # otro worker lo está escribiendo
+        time.sleep(0.1)
+        with open(FICHERO_SECRETO) as f:
+            secreto = f.read().strip()
+    return secreto.encode()
+
+
+_secreto = None
+
+
+def _firma(contenido):
+    global _secreto
+    if _secreto is None:
+        _secreto = _leer_secreto()
+    return hmac.new(_secreto, contenido.encode(), hashlib.sha256).hexdigest()
+
+
+def _clave_firmada(token, nombre, args):
+    contenido = json.dumps([token, nombre, list(args)])
+    return json.dumps([contenido, _firma(contenido)])
+
+
+def _leer_clave(clave):
+    """(token, nombre, args) de una clave de marcador, o None si la firma no cuadra."""
+    try:
+        contenido, firma = json.loads(clave)
+        if not hmac.compare_digest(_firma(contenido), str(firma)):
+            return None
+        token, nombre, args = json.loads(contenido)
+        return token, nombre, tuple(args)
+    except (TypeError, ValueError):
+        return None
+
+
+def _reiniciar_tras_fork():
+    """En un hijo (background callbacks) el executor heredado cuenta hilos
+    ociosos que no existen y no llegaría a ejecutar los paneles."""
+    global _executor, _lock
+    _executor = ThreadPoolExecutor(max_workers=PANEL_HILOS, thread_name_prefix="panel")
+    _lock = threading.Lock()
+    _pendientes.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def registrar_panel(nombre):
+    """Decorador: registra la función que construye el panel `nombre`.
+
+    La función recibe argumentos serializables en JSON y devuelve un
+    componente Dash, una figura Plotly o el dict de `procesos.construir_figura`.
+    """
+    def decorator(func):
+        _paneles[nombre] = func
+        return func
+    return decorator
+
+
+def _ejecutar_panel(nombre, args):
+    """Construye el panel con plazo propio; devuelve (resultado, marca de datos)."""
+    database.iniciar_marca_datos()
+    with database.plazo(PLAZO_PANEL_SEGUNDOS):
+        resultado = _paneles[nombre](*args)
+    return resultado, database.marca_datos()
+
+
+def _a_componente(resultado, config_grafica):
+    if isinstance(resultado, go.Figure):
+        return dcc.Graph(figure=figuras.compactar(resultado), config=config_grafica)
+    if isinstance(resultado, dict):  # ya serializada (`procesos.construir_figura`)
+        return dcc.Graph(figure=resultado, config=config_grafica)
+    return resultado
+
+
+def _panel_error(e):
+    print(f"Error en panel: {e}")
+    return html.Div(f"Error: {e}", className="panel-diferido-error")
+
+
+def _marcador(clave):
+    return html.Div([
+        html.Div(
+            html.Div([
+                html.Div(className="loading-spinner"),
+                html.Div("Cargando datos...", className="loading-text"),
+            ], className="loading-container"),
+            id={"type": "panel-diferido", "clave": clave},
+        ),
+        dcc.Interval(id={"type": "panel-diferido-intervalo", "clave": clave},
+                     interval=INTERVALO_MS,
+                     max_intervals=int(PLAZO_PANEL_SEGUNDOS * 1000 / INTERVALO_MS) + 1),
+    ])
+
+
+def _purgar_pendientes():
+    """Descarta los pendientes caducados; devuelve si queda sitio para otro."""
+    limite = time.time() - 2 * PLAZO_PANEL_SEGUNDOS
+    for token in [t for t, (_, creado, _) in _pendientes.items() if creado < limite]:
+        _pendientes.pop(token, None)
+    return len(_pendientes) < MAX_PENDIENTES
+
+
+def renderizar(paneles, config_grafica=None, plazo=None):
+    """Construye en paralelo los paneles `{slot: (nombre, args)}`.
+
+    Devuelve `{slot: componente}`; los que no terminan en `plazo` segundos
+    (por defecto PLAZO_RENDER_SEGUNDOS) se devuelven como marcador diferido.
+    En un background callback se espera a todos.
+    """
+    config_grafica = config_grafica or {'displayModeBar': False}
+    plazo = PLAZO_RENDER_SEGUNDOS if plazo is None else plazo
+    if segundo_plano.en_trabajo():
+        plazo = None
+    futuros = {slot: _executor.submit(_ejecutar_panel, nombre, tuple(args))
+               for slot, (nombre, args) in paneles.items()}
+    wait(futuros.values(), timeout=plazo)
+
+    salida = {}
+    for slot, futuro in futuros.items():
+        nombre, args = paneles[slot]
+        if futuro.done():
+            try:
+                resultado, ts = futuro.result()
+                if ts is not None:
+                    database.anotar_marca(ts)
+                salida[slot] = _a_componente(resultado, config_grafica)
+            except Exception as e:
+                salida[slot] = _panel_error(e)
+            continue
+        token = uuid.uuid4().hex
+        with _lock:
+            hay_sitio = _purgar_pendientes()
+            if hay_sitio:
+                _pendientes[token] = (futuro, time.time(), config_grafica)
+        if not hay_sitio:
+            # Demasiados paneles en espera: este se espera aquí
+            try:
+                resultado, _ = futuro.result(timeout=PLAZO_PANEL_SEGUNDOS)
+                salida[slot] = _a_componente(resultado, config_grafica)
+            except Exception as e:
+                salida[slot] = _panel_error(e)
+            continue
+        salida[slot] = _marcador(_clave_firmada(token, nombre, args))
+    return salida
+
+
+@callback(
+    Output({"type": "panel-diferido", "clave": MATCH}, "children"),
+    Output({"type": "panel-diferido-intervalo", "clave": MATCH}, "disabled"),
+    Input({"type": "panel-diferido-intervalo", "clave": MATCH}, "n_intervals"),
+    State({"type": "panel-diferido-intervalo", "clave": MATCH}, "id"),
+    State({"type": "panel-diferido-intervalo", "clave": MATCH}, "max_intervals"),
+    prevent_initial_call=True,
+)
+def completar_panel(n_intervals, id_intervalo, max_intervals):
+    """Sustituye el marcador por el panel cuando su resultado está listo."""
+    leida = _leer_clave(id_intervalo["clave"])
+    if leida is None or leida[1] not in _paneles:
+        return _panel_error("panel desconocido"), True
+    token, nombre, args = leida
+    with _lock:
+        entrada = _pendientes.get(token)
+        if entrada is None:
+            if not _purgar_pendientes():
+                return no_update, False   # lleno: se reintenta en el siguiente intervalo
+            # Marcador emitido por otro worker: calcular el panel aquí
+            entrada = (_executor.submit(_ejecutar_panel, nombre, args),
+                       time.time(), {'displayModeBar': False})
+            _pendientes[token] = entrada
+
+    futuro, _, config_grafica = entrada
+    if not futuro.done():
+        if n_intervals and n_intervals >= max_intervals:
+            with _lock:
+                _pendientes.pop(token, None)
+            return html.Div("Datos no disponibles (tiempo agotado).",
+                            className="panel-diferido-error"), True
+        return no_update, False
+
+    with _lock:
+        _pendientes.pop(token, None)
+    try:
+        resultado, _ = futuro.result()
+        return _a_componente(resultado, config_grafica), True
+    except Exception as e:
+        return _panel_error(e), True
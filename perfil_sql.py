@@ -0,0 +1,178 @@
+"""
+Perfilado de consultas SQL
+==========================
+`database.query_to_df` informa aquí de cada sentencia ejecutada:
+
+    db_ms     → ejecución en MySQL + transferencia de filas (execute/fetchall)
+    df_ms     → construcción del DataFrame a partir de las filas
+    filas     → filas devueltas
+    bytes     → memoria del DataFrame resultante: `memory_usage(deep=True)`
+                (recorre cada cadena) solo en las sentencias lentas; en las
+                demás, la estimación barata sin `deep` (objetos = punteros)
+    origen    → página o módulo que lanzó la consulta
+
+Las sentencias se agrupan por su forma normalizada (literales sustituidos por
+`?`) y de cada una se guarda una ventana deslizante de latencias para p50/p95.
+Las que superan `SLOW_QUERY_MS` (por defecto 500 ms) se escriben en el logger
+`dash_negocio.slow_queries` (stderr o el fichero de `SLOW_QUERY_LOG`) y se
+conservan las últimas en memoria para la página de administración.
+
+Como las métricas de callbacks, los datos son por proceso.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("dash_negocio.slow_queries")
+
+UMBRAL_LENTA_MS = float(os.environ.get("SLOW_QUERY_MS", "500"))
+VENTANA = 500          # latencias guardadas por sentencia
+MAX_LENTAS = 200       # entradas del log de lentas en memoria
+
+_lock = threading.Lock()
+_stats = {}
+_lentas = deque(maxlen=MAX_LENTAS)
+
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_ESPACIOS = re.compile(r"\s+")
+_RE_TABLA = re.compile(r"\bFROM\s+`?(\w+)`?", re.IGNORECASE)
+
+
+def _configurar_logger():
+    if logger.handlers:
+        return
+    ruta = os.environ.get("SLOW_QUERY_LOG")
+    handler = logging.FileHandler(ruta, encoding="utf-8") if ruta else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_configurar_logger()
+
+
+def normalizar(sql):
+    """Forma canónica de la sentencia: sin literales y con espacios colapsados."""
+    sql = str(sql)
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    return _RE_ESPACIOS.sub(" ", sql).strip()
+
+
+def tabla_principal(sql):
+    """Primera tabla del FROM (para agrupar visualmente en la página de admin)."""
+    m = _RE_TABLA.search(str(sql))
+    return m.group(1) if m else "?"
+
+
+def origen_llamada():
+    """Página (`pages.*`) o módulo externo a la capa de datos que lanzó la query."""
+    frame = sys._getframe(1)
+    primero = None
+    while frame is not None:
+        modulo = frame.f_globals.get("__name__", "")
+        if modulo.startswith("pages."):
+            return modulo[len("pages."):]
+        if primero is None and modulo not in (__name__, "database", "metricas"):
+            primero = modulo
+        frame = frame.f_back
+    return primero or "desconocido"
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+def registrar(sql, db_s, df_s, filas, n_bytes, origen):
+    """Acumula una ejecución y la escribe en el log si supera el umbral."""
+    clave = normalizar(sql)
+    total_ms = (db_s + df_s) * 1000
+    with _lock:
+        s = _stats.get(clave)
+        if s is None:
+            s = _stats[clave] = {
+                "tabla": tabla_principal(clave),
+                "count": 0, "total_ms": 0.0, "db_ms": 0.0, "df_ms": 0.0,
+                "max_ms": 0.0, "filas": 0, "bytes": 0, "lentas": 0,
+                "origenes": {},
+                "ventana": deque(maxlen=VENTANA),
+            }
+        s["count"] += 1
+        s["total_ms"] += total_ms
+        s["db_ms"] += db_s * 1000
+        s["df_ms"] += df_s * 1000
+        s["max_ms"] = max(s["max_ms"], total_ms)
+        s["filas"] += filas
+        s["bytes"] += n_bytes
+        s["origenes"][origen] = s["origenes"].get(origen, 0) + 1
+        s["ventana"].append(total_ms)
+
+        if total_ms < UMBRAL_LENTA_MS:
+            return
+        s["lentas"] += 1
+        entrada = {
+            "evento": "slow_query",
+            "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "origen": origen,
+            "tabla": s["tabla"],
+            "total_ms": round(total_ms, 1),
+            "db_ms": round(db_s * 1000, 1),
+            "df_ms": round(df_s * 1000, 1),
+            "filas": filas,
+            "bytes": n_bytes,
+            "sql": clave[:500],
+        }
+        _lentas.append(entrada)
+    logger.info(json.dumps(entrada, ensure_ascii=False))
+
+
+def top(n=20, orden="total_ms"):
+    """Las `n` sentencias con mayor valor en `orden` (total_ms, p95_ms, bytes…)."""
+    with _lock:
+        filas = []
+        for sql, s in _stats.items():
+            ventana = list(s["ventana"])
+            filas.append({
+                "sql": sql,
+                "tabla": s["tabla"],
+                "count": s["count"],
+                "total_ms": s["total_ms"],
+                "media_ms": s["total_ms"] / s["count"],
+                "p50_ms": _percentil(ventana, 50),
+                "p95_ms": _percentil(ventana, 95),
+                "max_ms": s["max_ms"],
+                "db_ms": s["db_ms"],
+                "df_ms": s["df_ms"],
+                "filas_media": s["filas"] / s["count"],
+                "bytes_media": s["bytes"] / s["count"],
+                "bytes": s["bytes"],
+                "lentas": s["lentas"],
+                "origenes": dict(s["origenes"]),
+            })
+    filas.sort(key=lambda f: f.get(orden, 0), reverse=True)
+    return filas[:n]
+
+
+def lentas_recientes(n=50):
+    """Últimas entradas del log de consultas lentas (más reciente primero)."""
+    with _lock:
+        return list(_lentas)[::-1][:n]
+
+
+def reiniciar():
+    """Vacía las estadísticas del proceso."""
+    with _lock:
+        _stats.clear()
+        _lentas.clear()
@@ -0,0 +1,155 @@
+"""
+Construcción de figuras en procesos
+===================================
+Los paneles de `paneles.renderizar` corren en hilos: las consultas (E/S) se
+solapan, pero construir las figuras Plotly es CPU pura y con el GIL los
+`build_fig_*` de asistencia (5) y museo (6) se ejecutan uno detrás de otro.
+`construir_figura(build_fig, *dfs)` lleva la construcción a un pool
+persistente de procesos:
+
+    - El hilo del panel carga sus datos y espera el resultado sin ocupar el
+      GIL, así que el render de la página tiende al de la figura más lenta.
+    - El proceso construye la figura y la devuelve ya compactada
+      (`figuras.compactar_figura`), como dict: ni validar de nuevo la figura
+      en el worker ni compactarla allí.
+    - Los procesos se crean con `fork` a partir del worker de gunicorn con
+      las páginas ya importadas (`precalentar`, desde `arranque` antes de
+      que el worker atienda peticiones): la función se envía por referencia
+      y los DataFrames de entrada, tablas agregadas de pocos KB, con pickle.
+    - Nunca se hace `fork` desde un hilo de petición: si el pool no existe
+      en este proceso (hijo de un fork, no precalentado) o se rompe (p. ej.
+      un proceso muerto por memoria), las figuras se construyen en línea
+      hasta que el worker se reinicie.
+    - Cada proceso termina solo si muere el que lo creó (reinicio del
+      worker).
+    - Dentro de un background callback (`segundo_plano.en_trabajo()`) las
+      figuras se construyen en línea: el trabajo ya es un proceso propio y
+      un pool por trabajo supondría hasta `FIGURAS_PROCESOS` forks por render.
+
+`FIGURAS_PROCESOS` fija el tamaño del pool (por defecto un proceso por CPU,
+hasta 4); con 1 CPU o `FIGURAS_PROCESOS=0`, o donde no existe `fork`
+(Windows), las figuras se construyen en el hilo del panel como antes.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import plotly.graph_objects as go
+
+import figuras
+import segundo_plano
+
+
+def _cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+_POR_DEFECTO = min(4, _cpus()) if _cpus() > 1 else 0
+PROCESOS = int(os.environ.get("FIGURAS_PROCESOS", str(_POR_DEFECTO)))
+
+_lock = threading.Lock()
+_estado = {"pool": None, "pid": None}
+
+
+def _contexto():
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:  # Windows: solo spawn, que reimportaría las páginas
+        return None
+
+
+# =============================================================================
+# PROCESO DEL POOL
+# =============================================================================
+
+def _vigilar_padre(pid):
+    """Inicializador de cada proceso: salir si el proceso que lo creó muere."""
+    def vigilar():
+        while os.getppid() == pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=vigilar, daemon=True, name="vigilar-padre").start()
+
+
+def _construir(build_fig, args):
+    figura = build_fig(*args)
+    if isinstance(figura, go.Figure):
+        return figuras.compactar_figura(figura) if figuras.ACTIVO else figura.to_plotly_json()
+    return figura
+
+
+# =============================================================================
+# POOL DEL WORKER
+# =============================================================================
+
+def _pool():
+    """Pool creado por `precalentar` en este proceso, o None (no se crea aquí)."""
+    if segundo_plano.en_trabajo():
+        return None
+    with _lock:
+        return _estado["pool"] if _estado["pid"] == os.getpid() else None
+
+
+def _descartar(pool):
+    with _lock:
+        if _estado["pool"] is pool:
+            _estado["pool"] = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _reiniciar_tras_fork():
+    """El pool heredado es del padre: el hijo construye en línea."""
+    global _lock
+    _lock = threading.Lock()
+    _estado.update(pool=None, pid=None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def construir_figura(build_fig, *args):
+    """`build_fig(*args)` en el pool de procesos.
+
+    Devuelve el dict de la figura compactada, o la figura tal cual si no hay
+    pool o el pool se ha roto (p. ej. un proceso muerto por memoria); en ese
+    caso se construye aquí y el pool no se recrea.
+    `build_fig` debe ser una función de módulo (se envía por referencia).
+    """
+    pool = _pool()
+    if pool is None:
+        return build_fig(*args)
+    try:
+        return pool.submit(_construir, build_fig, args).result()
+    except BrokenProcessPool:
+        print("Aviso: pool de figuras roto; las figuras se construyen en línea")
+        _descartar(pool)
+        return build_fig(*args)
+
+
+def _nada():
+    return os.getpid()
+
+
+def precalentar():
+    """Crea el pool y sus procesos (con `fork` se lanzan todos a la vez).
+
+    Llamar una vez al arrancar, con las páginas ya importadas y antes de
+    atender peticiones: los procesos heredan los módulos de `pages/` y el
+    `fork` no coincide con hilos de petición en marcha.
+    """
+    contexto = _contexto()
+    if PROCESOS <= 0 or contexto is None or _pool() is not None:
+        return
+    pid = os.getpid()
+    pool = ProcessPoolExecutor(max_workers=PROCESOS, mp_context=contexto,
+                               initializer=_vigilar_padre, initargs=(pid,))
+    pool.submit(_nada).result()
+    with _lock:
+        _estado.update(pool=pool, pid=pid)
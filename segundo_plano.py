@@ -0,0 +1,112 @@
+"""
+Callbacks en segundo plano
+==========================
+Los renders pesados (DESGLOSE de hostelería, asistencia, museo) se ejecutan
+como background callbacks de Dash en lugar de ocupar uno de los 8 threads
+de gunicorn durante segundos:
+
+    - La petición inicial solo encola el trabajo y el navegador consulta el
+      resultado cada `INTERVALO_MS`; los threads quedan libres para los
+      callbacks ligeros (`toggle_login`, botones de franja...).
+    - El trabajo corre en un proceso aparte (`DiskcacheManager`), así que
+      tampoco compite por el GIL del worker.
+    - El resultado se guarda en disco por entradas del callback y ventana de
+      `SEGUNDO_PLANO_CACHE_SEGUNDOS`: renders idénticos (mismo filtro, otro
+      usuario u otro worker) se calculan una vez y los siguientes se sirven
+      de la caché sin lanzar proceso.
+    - Mientras corre, la página muestra el indicador `indicador_progreso`.
+    - Dentro del proceso del trabajo `en_trabajo()` es True: `paneles` espera
+      a todos los paneles en vez de diferirlos (el proceso termina al
+      devolver y sus paneles pendientes se perderían).
+
+Requiere `dash[diskcache]` (diskcache, multiprocess, psutil). Si no está
+instalado los callbacks se ejecutan en línea como antes.
+Carpeta de la caché: `SEGUNDO_PLANO_DIR` (por defecto `.segundo_plano/`).
+"""
+
+import os
+import time
+
+from dash import Output
+
+from database import SWR_FRESCURA_SEGUNDOS
+
+try:
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:  # opcional: sin diskcache los callbacks van en línea
+    diskcache = None
+    DiskcacheManager = object
+
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+DIR_CACHE = os.environ.get("SEGUNDO_PLANO_DIR", os.path.join(DIR_BASE, ".segundo_plano"))
+CACHE_SEGUNDOS = float(os.environ.get("SEGUNDO_PLANO_CACHE_SEGUNDOS", str(SWR_FRESCURA_SEGUNDOS)))
+INTERVALO_MS = 300
+
+VISIBLE = {"display": "flex"}
+OCULTO = {"display": "none"}
+
+
+_en_trabajo = False
+
+
+def en_trabajo():
+    """True dentro del proceso de un background callback."""
+    return _en_trabajo
+
+
+def _marcar_trabajo(job_fn):
+    """Envuelve `job_fn` para que el proceso hijo sepa que es un trabajo."""
+    def trabajo(*args):
+        global _en_trabajo
+        _en_trabajo = True
+        return job_fn(*args)
+    return trabajo
+
+
+def _ventana():
+    """Ventana de frescura: parte de la clave de caché de cada resultado."""
+    return int(time.time() // CACHE_SEGUNDOS)
+
+
+class GestorCacheado(DiskcacheManager):
+    """DiskcacheManager que no lanza proceso si el resultado ya está en caché.
+
+    Dash arranca siempre un proceso y, en la primera consulta, lo mata si el
+    resultado ya estaba; aquí se devuelve directamente sin `job`.
+    """
+
+    def call_job_fn(self, key, job_fn, args, context):
+        if self.result_ready(key):
+            return None
+        return super().call_job_fn(key, _marcar_trabajo(job_fn), args, context)
+
+    def job_running(self, job):
+        return job is not None and super().job_running(job)
+
+
+def _crear_gestor():
+    if diskcache is None:
+        print("Aviso: diskcache no instalado; los renders pesados se ejecutan en línea")
+        return None
+    return GestorCacheado(diskcache.Cache(DIR_CACHE), cache_by=[_ventana],
+                          expire=int(2 * CACHE_SEGUNDOS))
+
+
+gestor = _crear_gestor()
+
+
+def opciones(indicador):
+    """kwargs de `@callback` para ejecutarlo en segundo plano.
+
+    `indicador` es el id del `indicador_progreso` de la página, que se
+    muestra mientras el trabajo está en curso. Sin gestor devuelve {}.
+    """
+    if gestor is None:
+        return {}
+    return {
+        "background": True,
+        "manager": gestor,
+        "interval": INTERVALO_MS,
+        "running": [(Output(indicador, "style"), VISIBLE, OCULTO)],
+    }